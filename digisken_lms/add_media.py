@@ -0,0 +1,53 @@
+import argparse
+import os
+import shutil
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask_backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from app.catalog import CatalogStore, init_catalog
+from app.db import ConnectionPool
+from app.media import MEDIA_KINDS, guess_content_type, media_kind
+from config.config import Config
+
+INSTANCE_DIR = os.path.join(BACKEND_DIR, 'instance')
+
+parser = argparse.ArgumentParser(description='Attach a video, PDF or other file to a lesson')
+parser.add_argument('lesson_id', type=int)
+parser.add_argument('file')
+parser.add_argument('--title', help='defaults to the file name')
+parser.add_argument('--kind', choices=MEDIA_KINDS, help='defaults from the MIME type')
+parser.add_argument('--position', type=int, default=0)
+parser.add_argument('--db', default=Config.LMS_DATABASE or os.path.join(INSTANCE_DIR, 'lms_catalog.db'))
+parser.add_argument('--media-root', default=Config.MEDIA_ROOT or os.path.join(INSTANCE_DIR, 'media'))
+args = parser.parse_args()
+
+pool = ConnectionPool(args.db, size=1)
+with pool.connection() as conn:
+    init_catalog(conn, seed=False)
+    catalog = CatalogStore(conn)
+    if catalog.get_lesson(args.lesson_id, fields=['id']) is None:
+        sys.exit(f'✗ Lesson {args.lesson_id} does not exist')
+
+    # Stored under the media root; the database keeps the relative path
+    name = os.path.basename(args.file)
+    relative_path = os.path.join('lessons', str(args.lesson_id), name)
+    target = os.path.join(args.media_root, relative_path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if os.path.abspath(args.file) != os.path.abspath(target):
+        shutil.copyfile(args.file, target)
+
+    content_type = guess_content_type(name)
+    media_id = catalog.add_media(
+        args.lesson_id,
+        args.kind or media_kind(content_type),
+        args.title or name,
+        relative_path,
+        content_type,
+        os.path.getsize(target),
+        position=args.position,
+    )
+print(f'✓ Media {media_id} ({content_type}) added to lesson {args.lesson_id}: /api/lms/media/{media_id}')
+
+pool.close()
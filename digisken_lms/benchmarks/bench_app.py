@@ -0,0 +1,36 @@
+"""
+DigiSken LMS - Shared benchmark fixture
+Builds the production app in process on throwaway databases, with cheap
+bcrypt, the fake SMS provider and no maintenance sweeper; each benchmark
+passes only the settings it changes and seeds its own data.
+"""
+
+import os
+import sys
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flask_backend')
+if BACKEND not in sys.path:
+    sys.path.insert(0, BACKEND)
+
+DEFAULT_SETTINGS = {
+    'BCRYPT_ROUNDS': '4',
+    'SMS_PROVIDER': 'fake',
+    'MAINTENANCE_INTERVAL': '0',
+    'METRICS_ENABLED': 'false',
+}
+
+
+def create_bench_app(tmp, **settings):
+    """``create_app('production')`` with AUTH_DATABASE/LMS_DATABASE in ``tmp``.
+
+    Config is read from the environment, so ``settings`` (environment
+    variable names, string values) override DEFAULT_SETTINGS there.
+    """
+    os.environ.update({
+        'AUTH_DATABASE': os.path.join(tmp, 'auth.db'),
+        'LMS_DATABASE': os.path.join(tmp, 'lms.db'),
+        **DEFAULT_SETTINGS,
+        **settings,
+    })
+    from app import create_app
+    return create_app('production')
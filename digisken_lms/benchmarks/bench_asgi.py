@@ -0,0 +1,184 @@
+"""
+DigiSken LMS - Flask (WSGI) vs async (ASGI) auth throughput
+Runs the same register -> login -> verify-otp -> verify-session -> logout
+flows against the Flask app (one thread per in-flight request, like a
+gunicorn gthread worker) and the async app (one event loop, like a
+uvicorn worker) in this process, at the same concurrency, and compares
+throughput and latency.
+
+Both apps use the same settings on separate throwaway databases. To
+compare real servers instead, run bench_auth_flow.py --url against
+gunicorn (wsgi:app) and uvicorn (asgi:app) in turn.
+
+Usage:
+    python benchmarks/bench_asgi.py --users 200 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_auth_flow import (ENDPOINTS, PASSWORD, OtpReader, Recorder, build_app, print_results,
+                             run_user, summarize)
+
+
+class AsgiClient:
+    """Calls an ASGI app directly, without a server or sockets"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def post(self, path, payload):
+        body = json.dumps(payload).encode('utf-8')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'POST', 'scheme': 'http', 'path': path, 'raw_path': path.encode('ascii'),
+            'query_string': b'', 'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode('ascii'))],
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        response = {'body': b''}
+
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            else:
+                response['body'] += message.get('body', b'')
+
+        await self.app(scope, receive, send)
+        return response['status'], json.loads(response['body'] or b'{}')
+
+
+class AsyncRecorder(Recorder):
+    """Recorder whose calls (and 503 backoff) run on the event loop"""
+
+    async def acall(self, client, name, payload, expect):
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            status, data = await client.post(f'/api/{name}', payload)
+            if status != 503 or attempt == self.max_retries:
+                break
+            with self.lock:
+                self.shed[name] += 1
+            await asyncio.sleep(0.01 * 2 ** attempt * random.uniform(0.5, 1.5))
+        elapsed = (time.perf_counter() - start) * 1000
+        ok = status == expect
+        with self.lock:
+            self.samples[name].append(elapsed)
+            if not ok:
+                self.errors[name] += 1
+        return data if ok else None
+
+
+async def run_user_async(client, otp_reader, recorder, phone_number):
+    credentials = {'phone_number': phone_number, 'password': PASSWORD}
+    if await recorder.acall(client, 'register', credentials, 201) is None:
+        return
+    if await recorder.acall(client, 'login', credentials, 200) is None:
+        return
+    otp = await asyncio.to_thread(otp_reader.read, phone_number)
+    if otp is None:
+        with recorder.lock:
+            recorder.errors['verify-otp'] += 1
+        return
+    data = await recorder.acall(client, 'verify-otp', {'phone_number': phone_number, 'otp': otp}, 200)
+    if data is None:
+        return
+    token = {'session_token': data['session_token']}
+    await recorder.acall(client, 'verify-session', token, 200)
+    await recorder.acall(client, 'logout', token, 200)
+
+
+def phone_numbers(count):
+    base = random.randrange(10 ** 6) * 10 ** 4
+    return [f'+1{base + i:010d}' for i in range(count)]
+
+
+def run_flask(app, database, users, concurrency):
+    from bench_auth_flow import InProcessClient
+
+    otp_reader = OtpReader(database)
+    recorder = Recorder()
+    local = threading.local()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(run_user, local, lambda: InProcessClient(app), otp_reader,
+                                       recorder, phone) for phone in phone_numbers(users)]:
+            future.result()
+    return recorder, time.perf_counter() - start
+
+
+async def lifespan(app, event, queue, done):
+    await queue.put({'type': f'lifespan.{event}'})
+    message = await done.get()
+    assert message['type'] == f'lifespan.{event}.complete', message
+
+
+async def run_asgi(app, database, users, concurrency):
+    queue, done = asyncio.Queue(), asyncio.Queue()
+    server = asyncio.create_task(app({'type': 'lifespan', 'asgi': {'version': '3.0'}}, queue.get, done.put))
+    await lifespan(app, 'startup', queue, done)
+
+    client = AsgiClient(app)
+    otp_reader = OtpReader(database)
+    recorder = AsyncRecorder()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(phone_number):
+        async with semaphore:
+            await run_user_async(client, otp_reader, recorder, phone_number)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(limited(phone) for phone in phone_numbers(users)))
+    elapsed = time.perf_counter() - start
+
+    await lifespan(app, 'shutdown', queue, done)
+    await server
+    return recorder, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=100, help='auth flows per mode')
+    parser.add_argument('--concurrency', type=int, default=16, help='flows in flight per mode')
+    parser.add_argument('--bcrypt-rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        flask_app, flask_db = build_app(tmp, args.bcrypt_rounds)
+        from app.async_auth import create_asgi_app
+        asgi_db = os.path.join(tmp, 'asgi.db')
+        asgi_app = create_asgi_app(config=dict(flask_app.config, AUTH_DATABASE=asgi_db))
+
+        print(f'=== Flask (threads, concurrency {args.concurrency}) ===')
+        recorder, flask_elapsed = run_flask(flask_app, flask_db, args.users, args.concurrency)
+        services = flask_app.extensions['auth']
+        services.shutdown()
+        services.db_pool.close()
+        print_results(summarize(recorder, flask_elapsed), flask_elapsed, args.users)
+
+        print(f'\n=== ASGI (event loop, concurrency {args.concurrency}) ===')
+        recorder, asgi_elapsed = asyncio.run(run_asgi(asgi_app, asgi_db, args.users, args.concurrency))
+        asgi_app.services.db_pool.close()
+        asgi_results = summarize(recorder, asgi_elapsed)
+        print_results(asgi_results, asgi_elapsed, args.users)
+
+    errors = sum(asgi_results[name]['errors'] for name in ENDPOINTS)
+    print(f'\nASGI/Flask flow throughput: {flask_elapsed / asgi_elapsed:.2f}x')
+    if errors:
+        print(f'✗ {errors} ASGI requests failed')
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""
+DigiSken LMS - Auth flow load test
+Drives register -> login -> verify-otp -> verify-session -> logout for many
+users at a fixed concurrency and reports p50/p95/p99 latency, throughput
+and error rate per endpoint. OTPs are read back from the SMS outbox, so no
+real SMS is ever sent.
+
+By default the app runs in-process on a throwaway database (fake SMS
+provider, rate limits off). With --url it targets a running server
+instead; --db must then point at that server's AUTH_DATABASE and the
+server should run with RATE_LIMIT_ENABLED=false.
+
+A baseline file records a known-good run; --baseline compares against it
+and exits non-zero when an endpoint's p95 or error rate regresses.
+
+Usage:
+    python benchmarks/bench_auth_flow.py --users 200 --concurrency 16
+    python benchmarks/bench_auth_flow.py --save-baseline benchmarks/auth_flow_baseline.json
+    python benchmarks/bench_auth_flow.py --baseline benchmarks/auth_flow_baseline.json
+    python benchmarks/bench_auth_flow.py --url http://localhost:5000 --db digisken_lms.db
+"""
+
+import argparse
+import http.client
+import json
+import math
+import platform
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_app import create_bench_app  # also puts flask_backend on sys.path
+
+ENDPOINTS = ('register', 'login', 'verify-otp', 'verify-session', 'logout')
+PASSWORD = 'Bench@Pass1'
+OTP_PATTERN = re.compile(r'\b(\d{6})\b')
+
+
+class InProcessClient:
+    """Flask test client; one per worker thread"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def post(self, path, payload):
+        response = self.client.post(path, json=payload)
+        return response.status_code, response.get_json(silent=True) or {}
+
+
+class HttpClient:
+    """Keep-alive HTTP client for a running server; one per worker thread"""
+
+    def __init__(self, url):
+        parts = urllib.parse.urlsplit(url)
+        connection_cls = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_cls(parts.netloc, timeout=30)
+        self.prefix = parts.path.rstrip('/')
+
+    def post(self, path, payload):
+        body = json.dumps(payload)
+        try:
+            self.connection.request('POST', self.prefix + path, body=body,
+                                    headers={'Content-Type': 'application/json'})
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            raise
+        try:
+            return response.status, json.loads(data or b'{}')
+        except ValueError:
+            return response.status, {}
+
+
+class OtpReader:
+    """Reads the code of the latest SMS queued for a phone number"""
+
+    def __init__(self, database, timeout=5.0):
+        self.database = database
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def read(self, phone_number):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = sqlite3.connect(self.database, timeout=5)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            row = conn.execute(
+                'SELECT body FROM sms_outbox WHERE phone_number = ? ORDER BY id DESC LIMIT 1',
+                (phone_number,)
+            ).fetchone()
+            match = OTP_PATTERN.search(row[0]) if row else None
+            if match:
+                return match.group(1)
+            if time.monotonic() > deadline:
+                return None
+            time.sleep(0.01)
+
+
+class Recorder:
+    """Thread-safe per-endpoint latency, error and load-shedding samples.
+
+    A 503 means the server shed load (e.g. the bcrypt queue is full); like
+    a real client we back off and retry, so latency is end-to-end.
+    """
+
+    max_retries = 8
+
+    def __init__(self):
+        self.samples = {name: [] for name in ENDPOINTS}
+        self.errors = {name: 0 for name in ENDPOINTS}
+        self.shed = {name: 0 for name in ENDPOINTS}
+        self.lock = threading.Lock()
+
+    def call(self, client, name, payload, expect):
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                status, data = client.post(f'/api/{name}', payload)
+            except (OSError, http.client.HTTPException):
+                status, data = None, {}
+            if status != 503 or attempt == self.max_retries:
+                break
+            with self.lock:
+                self.shed[name] += 1
+            time.sleep(0.01 * 2 ** attempt * random.uniform(0.5, 1.5))
+        elapsed = (time.perf_counter() - start) * 1000
+        ok = status == expect
+        with self.lock:
+            self.samples[name].append(elapsed)
+            if not ok:
+                self.errors[name] += 1
+        return data if ok else None
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def run_user(local, make_client, otp_reader, recorder, phone_number):
+    client = getattr(local, 'client', None)
+    if client is None:
+        client = local.client = make_client()
+
+    credentials = {'phone_number': phone_number, 'password': PASSWORD}
+    if recorder.call(client, 'register', credentials, 201) is None:
+        return
+    if recorder.call(client, 'login', credentials, 200) is None:
+        return
+    otp = otp_reader.read(phone_number)
+    if otp is None:
+        with recorder.lock:
+            recorder.errors['verify-otp'] += 1
+        return
+    data = recorder.call(client, 'verify-otp', {'phone_number': phone_number, 'otp': otp}, 200)
+    if data is None:
+        return
+    token = {'session_token': data['session_token']}
+    recorder.call(client, 'verify-session', token, 200)
+    recorder.call(client, 'logout', token, 200)
+
+
+def summarize(recorder, elapsed):
+    results = {}
+    for name in ENDPOINTS:
+        values = sorted(recorder.samples[name])
+        count = len(values)
+        results[name] = {
+            'count': count,
+            'errors': recorder.errors[name],
+            'shed': recorder.shed[name],
+            'error_rate': recorder.errors[name] / count if count else 0.0,
+            'p50': percentile(values, 0.50),
+            'p95': percentile(values, 0.95),
+            'p99': percentile(values, 0.99),
+            'throughput': count / elapsed if elapsed else 0.0,
+        }
+    return results
+
+
+def print_results(results, elapsed, users):
+    print(f"{'endpoint':<16}{'count':>7}{'errors':>8}{'503s':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    for name, stats in results.items():
+        print(f"{name:<16}{stats['count']:>7}{stats['errors']:>8}{stats['shed']:>7}{stats['p50']:>10.2f}"
+              f"{stats['p95']:>10.2f}{stats['p99']:>10.2f}{stats['throughput']:>9.1f}")
+    print(f'\n{users} flows in {elapsed:.2f} s ({users / elapsed:.1f} flows/s)')
+
+
+def compare(results, baseline, tolerance, slack_ms):
+    """Regressions against a baseline: p95 over tolerance, or more errors"""
+    regressions = []
+    for name, base in baseline['endpoints'].items():
+        current = results.get(name)
+        if current is None:
+            continue
+        limit = base['p95'] * (1 + tolerance) + slack_ms
+        if current['p95'] > limit:
+            regressions.append(f"{name}: p95 {current['p95']:.2f} ms > {limit:.2f} ms "
+                               f"(baseline {base['p95']:.2f} ms)")
+        if current['error_rate'] > base['error_rate'] + 0.01:
+            regressions.append(f"{name}: error rate {current['error_rate']:.1%} "
+                               f"(baseline {base['error_rate']:.1%})")
+    return regressions
+
+
+def build_app(tmp, bcrypt_rounds):
+    """In-process app on a throwaway database; config is read from the environment"""
+    app = create_bench_app(tmp, BCRYPT_ROUNDS=str(bcrypt_rounds), RATE_LIMIT_ENABLED='false',
+                           METRICS_ENABLED='true')
+    return app, app.config['AUTH_DATABASE']
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            database = args.db
+            make_client = lambda: HttpClient(args.url)  # noqa: E731
+        else:
+            app, database = build_app(tmp, args.bcrypt_rounds)
+            make_client = lambda: InProcessClient(app)  # noqa: E731
+
+        otp_reader = OtpReader(database)
+        recorder = Recorder()
+        local = threading.local()
+        # Random prefix so repeated runs against one server never collide
+        base = random.randrange(10 ** 6) * 10 ** 4
+        phones = [f'+1{base + i:010d}' for i in range(args.users)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for future in [executor.submit(run_user, local, make_client, otp_reader, recorder, phone)
+                           for phone in phones]:
+                future.result()
+        elapsed = time.perf_counter() - start
+
+        if not args.url:
+            services = app.extensions['auth']
+            services.shutdown()
+            services.db_pool.close()
+
+    results = summarize(recorder, elapsed)
+    print_results(results, elapsed, args.users)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=100, help='auth flows to run')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--url', help='target a running server instead of an in-process app')
+    parser.add_argument('--db', help="the server's AUTH_DATABASE (required with --url)")
+    parser.add_argument('--bcrypt-rounds', type=int, default=10,
+                        help='bcrypt cost for the in-process app')
+    parser.add_argument('--baseline', help='compare against this baseline file')
+    parser.add_argument('--save-baseline', metavar='PATH', help='write this run as a baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed p95 increase over the baseline (fraction)')
+    parser.add_argument('--slack-ms', type=float, default=2.0,
+                        help='absolute p95 slack so tiny baselines do not flap')
+    args = parser.parse_args()
+    if args.url and not args.db:
+        parser.error('--db is required with --url')
+
+    results = run(args)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({
+                'users': args.users,
+                'concurrency': args.concurrency,
+                'bcrypt_rounds': None if args.url else args.bcrypt_rounds,
+                'target': args.url or 'in-process',
+                'python': platform.python_version(),
+                'endpoints': {name: {key: round(stats[key], 3) for key in ('p50', 'p95', 'p99', 'error_rate')}
+                              for name, stats in results.items()},
+            }, f, indent=2)
+            f.write('\n')
+        print(f'Baseline written to {args.save_baseline}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline.get('users'), baseline.get('concurrency')) != (args.users, args.concurrency):
+            print(f"\nWarning: baseline was recorded with --users {baseline.get('users')} "
+                  f"--concurrency {baseline.get('concurrency')}")
+        regressions = compare(results, baseline, args.tolerance, args.slack_ms)
+        if regressions:
+            print('\nRegressions against baseline:')
+            for line in regressions:
+                print(f'  ✗ {line}')
+            sys.exit(1)
+        print('\n✓ No regressions against baseline')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+DigiSken LMS - Lookup latency benchmark
+Times the auth hot-path queries against otp_attempts/sessions as the
+tables grow, with the baseline schema (v1) and with the lookup indexes
+(latest migration), to show indexed latency stays flat.
+
+Usage:
+    python benchmarks/bench_indexes.py
+    python benchmarks/bench_indexes.py --sizes 10000,100000,1000000 --lookups 500
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flask_backend'))
+
+from app.migrations import LATEST_VERSION, migrate  # noqa: E402
+
+QUERIES = {
+    'verify_otp latest code': (
+        '''
+        SELECT otp_code FROM otp_attempts
+        WHERE phone_number = ? AND expires_at > ?
+        ORDER BY created_at DESC LIMIT 1
+        ''',
+        lambda phone, now: (phone, now),
+    ),
+    'rate limit by phone': (
+        'SELECT attempt_count, locked_until FROM otp_attempts WHERE phone_number = ?',
+        lambda phone, now: (phone,),
+    ),
+    'sessions by phone': (
+        'SELECT session_token FROM sessions WHERE phone_number = ?',
+        lambda phone, now: (phone,),
+    ),
+    'expired sessions': (
+        'SELECT id FROM sessions WHERE expires_at < ? LIMIT 100',
+        lambda phone, now: (now,),
+    ),
+}
+
+
+def phone_for(i):
+    return f'+1555{i:07d}'
+
+
+def populate(conn, rows, phones):
+    """Fill otp_attempts and sessions with ``rows`` rows each"""
+    now = datetime.now()
+    batch = 50000
+    for start in range(0, rows, batch):
+        count = min(batch, rows - start)
+        otps = []
+        sessions = []
+        for i in range(start, start + count):
+            phone = phone_for(i % phones)
+            created = now - timedelta(minutes=i % 100000)
+            # Keep ~0.5% live so the hot queries find something
+            live = (i % 200) == 0
+            expires = created + (timedelta(days=400) if live else timedelta(minutes=10))
+            otps.append((phone, f'{i % 1000000:06d}', created.isoformat(' '), expires.isoformat()))
+            sessions.append((phone, f'tok-{i}', created.isoformat(' '), expires.isoformat()))
+        conn.executemany(
+            'INSERT INTO otp_attempts (phone_number, otp_code, created_at, expires_at) VALUES (?, ?, ?, ?)',
+            otps,
+        )
+        conn.executemany(
+            'INSERT INTO sessions (phone_number, session_token, created_at, expires_at) VALUES (?, ?, ?, ?)',
+            sessions,
+        )
+        conn.commit()
+
+
+def time_queries(conn, phones, lookups):
+    """Median latency (microseconds) per query"""
+    now = datetime.now().isoformat()
+    rng = random.Random(42)
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        samples = []
+        for _ in range(lookups):
+            args = params(phone_for(rng.randrange(phones)), now)
+            start = time.perf_counter()
+            conn.execute(sql, args).fetchall()
+            samples.append((time.perf_counter() - start) * 1e6)
+        results[name] = statistics.median(samples)
+    return results
+
+
+def run(sizes, lookups):
+    print(f"{'rows':>10} {'schema':>7}  " + '  '.join(f'{name:>24}' for name in QUERIES))
+    for rows in sizes:
+        phones = max(rows // 5, 1)
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            migrate(conn, target=1)
+            populate(conn, rows, phones)
+
+            for label, target in (('v1', 1), (f'v{LATEST_VERSION}', LATEST_VERSION)):
+                migrate(conn, target=target)
+                timings = time_queries(conn, phones, lookups)
+                print(f'{rows:>10} {label:>7}  ' + '  '.join(
+                    f'{timings[name]:>21.1f} us' for name in QUERIES))
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help='comma-separated row counts per table')
+    parser.add_argument('--lookups', type=int, default=200,
+                        help='lookups timed per query and size')
+    args = parser.parse_args()
+    run([int(s) for s in args.sizes.split(',')], args.lookups)
+
+
+if __name__ == '__main__':
+    main()
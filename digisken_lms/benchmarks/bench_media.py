@@ -0,0 +1,124 @@
+"""
+DigiSken LMS - Lesson media delivery benchmark
+Starts gunicorn on a throwaway catalog with one lesson video and times
+full downloads and random 1 MB range requests (a player seeking), with
+gunicorn's sendfile() on and off, checking every byte.
+
+Usage:
+    python benchmarks/bench_media.py
+    python benchmarks/bench_media.py --size-mb 200 --requests 50
+"""
+
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT, 'flask_backend')
+RANGE_BYTES = 1 << 20
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def fetch(url, headers=None):
+    with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {})) as response:
+        return response.status, response.read()
+
+
+def start_server(env, port, sendfile):
+    command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', '1',
+               '--bind', f'127.0.0.1:{port}', 'wsgi:app']
+    if not sendfile:
+        command.insert(-1, '--no-sendfile')
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            fetch(f'http://127.0.0.1:{port}/api/health')
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('gunicorn did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=20, help='full downloads per mode')
+    parser.add_argument('--ranges', type=int, default=200, help='range requests per mode')
+    args = parser.parse_args()
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        sys.exit('gunicorn is not installed (pip install -r requirements_auth.txt)')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = os.path.join(tmp, 'lesson.mp4')
+        with open(video, 'wb') as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1 << 20))
+        with open(video, 'rb') as f:
+            data = f.read()
+
+        env = dict(os.environ)
+        env.update({
+            'AUTH_DATABASE': os.path.join(tmp, 'auth.db'),
+            'LMS_DATABASE': os.path.join(tmp, 'lms.db'),
+            'MEDIA_ROOT': os.path.join(tmp, 'media'),
+            'BCRYPT_ROUNDS': '4',
+            'SMS_PROVIDER': 'fake',
+            'MAINTENANCE_INTERVAL': '0',
+        })
+        # Seeds the catalog, then attaches the video to lesson 1
+        subprocess.run([sys.executable, '-c', 'from app import create_app; create_app("production")'],
+                       cwd=BACKEND_DIR, env=env, check=True, capture_output=True)
+        subprocess.run([sys.executable, os.path.join(ROOT, 'add_media.py'), '1', video,
+                        '--db', env['LMS_DATABASE'], '--media-root', env['MEDIA_ROOT']],
+                       env=env, check=True, capture_output=True)
+
+        print(f'{args.size_mb} MB video, {args.requests} full downloads, '
+              f'{args.ranges} random {RANGE_BYTES >> 20} MB ranges')
+        print(f"{'mode':<16}{'full MB/s':>12}{'range p50 ms':>15}{'range MB/s':>12}")
+        rng = random.Random(42)
+        for sendfile in (True, False):
+            port = free_port()
+            server = start_server(env, port, sendfile)
+            url = f'http://127.0.0.1:{port}/api/lms/media/1'
+            try:
+                start = time.perf_counter()
+                for _ in range(args.requests):
+                    status, body = fetch(url)
+                    assert status == 200 and body == data
+                full_rate = args.size_mb * args.requests / (time.perf_counter() - start)
+
+                times = []
+                for _ in range(args.ranges):
+                    first = rng.randrange(0, len(data) - RANGE_BYTES)
+                    start = time.perf_counter()
+                    status, body = fetch(url, {'Range': f'bytes={first}-{first + RANGE_BYTES - 1}'})
+                    times.append(time.perf_counter() - start)
+                    assert status == 206 and body == data[first:first + RANGE_BYTES]
+                times.sort()
+                range_rate = args.ranges * RANGE_BYTES / (1 << 20) / sum(times)
+                name = 'sendfile' if sendfile else 'no sendfile'
+                print(f'{name:<16}{full_rate:>12.0f}{times[len(times) // 2] * 1000:>15.2f}{range_rate:>12.0f}')
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+DigiSken LMS - Learner progress ingestion benchmark
+Simulates students heartbeating their video position from many request
+threads and compares writing each event in its own transaction with the
+batching ProgressQueue, then replays every event (an offline client
+resending) to check that duplicates change nothing.
+
+Usage:
+    python benchmarks/bench_progress.py
+    python benchmarks/bench_progress.py --students 5000 --heartbeats 10 --threads 16
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flask_backend'))
+
+from app.catalog import CatalogStore, init_catalog
+from app.db import ConnectionPool
+from app.progress import ProgressQueue, catalog_writer
+
+
+def heartbeats(students, count, lessons, rng):
+    """One position event per request, as a video player sends them"""
+    start = time.time() - count * 10
+    events = []
+    for student in range(students):
+        phone = f'+1555{student:07d}'
+        lesson_id = rng.randint(1, lessons)
+        for beat in range(count):
+            events.append((phone, f'{student}-{beat}', lesson_id, 'position', beat * 10.0, start + beat * 10))
+    rng.shuffle(events)
+    return events
+
+
+def run(events, threads, handle):
+    """Send every event through ``handle`` from ``threads`` threads;
+    returns (seconds, per-request latencies in ms)"""
+    latencies = []
+    chunks = [events[i::threads] for i in range(threads)]
+
+    def worker(chunk):
+        times = []
+        for event in chunk:
+            start = time.perf_counter()
+            handle(event)
+            times.append((time.perf_counter() - start) * 1000)
+        latencies.extend(times)
+
+    workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def snapshot(pool):
+    with pool.connection() as conn:
+        return conn.execute('SELECT * FROM lesson_progress ORDER BY phone_number, lesson_id').fetchall()
+
+
+def fresh_catalog(path, courses, lessons_per_course):
+    pool = ConnectionPool(path, size=32)
+    with pool.connection() as conn:
+        init_catalog(conn, seed=False)
+        conn.executemany('INSERT INTO courses (id, title) VALUES (?, ?)',
+                         [(i, f'Course {i}') for i in range(1, courses + 1)])
+        conn.executemany('INSERT INTO lessons (course_id, position, title) VALUES (?, ?, ?)',
+                         [(course, position, f'Lesson {position}')
+                          for course in range(1, courses + 1) for position in range(1, lessons_per_course + 1)])
+    return pool
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--heartbeats', type=int, default=10, help='position events per student')
+    parser.add_argument('--threads', type=int, default=16, help='concurrent request threads')
+    args = parser.parse_args()
+    rng = random.Random(3)
+    courses, lessons_per_course = 50, 20
+    events = heartbeats(args.students, args.heartbeats, courses * lessons_per_course, rng)
+    print(f'{len(events)} events from {args.students} students, {args.threads} threads')
+    print(f"{'mode':<24}{'events/s':>12}{'request p50 ms':>16}{'p99 ms':>10}{'transactions':>14}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Unbatched: every heartbeat is its own write transaction
+        pool = fresh_catalog(os.path.join(tmp, 'direct.db'), courses, lessons_per_course)
+
+        def direct(event):
+            with pool.connection(immediate=True) as conn:
+                CatalogStore(conn).record_progress([event], time.time())
+
+        seconds, latencies = run(events, args.threads, direct)
+        print(f"{'one transaction/event':<24}{len(events) / seconds:>12.0f}"
+              f"{statistics.median(latencies):>16.3f}{latencies[int(len(latencies) * 0.99)]:>10.3f}"
+              f"{len(events):>14}")
+        expected = snapshot(pool)
+        pool.close()
+
+        # Queued: requests append, one thread writes batches
+        pool = fresh_catalog(os.path.join(tmp, 'queued.db'), courses, lessons_per_course)
+        transactions = []
+        write = catalog_writer(pool, 86400)
+
+        def counted(batch):
+            transactions.append(len(batch))
+            return write(batch)
+
+        queue = ProgressQueue(counted, flush_interval=0.25, max_events=5000, max_pending=len(events) * 2)
+        seconds, latencies = run(events, args.threads, lambda event: queue.append([event]))
+        # Events/s counts the time until the last event is written
+        start = time.perf_counter()
+        queue.close()
+        seconds += time.perf_counter() - start
+        print(f"{'ProgressQueue':<24}{len(events) / seconds:>12.0f}"
+              f"{statistics.median(latencies):>16.3f}{latencies[int(len(latencies) * 0.99)]:>10.3f}"
+              f"{len(transactions):>14}")
+        assert snapshot(pool) == expected, 'batched writes must give the same progress rows'
+
+        # Offline replay: every event again, in another order
+        rng.shuffle(events)
+        applied = queue.applied
+        start = time.perf_counter()
+        queue.append(events)
+        queue.close()
+        replay_ms = (time.perf_counter() - start) * 1000
+        assert queue.applied == applied and snapshot(pool) == expected, 'replayed events must be dropped'
+        print(f'\nReplay of all {len(events)} events: {queue.dropped} dropped as duplicates, '
+              f'progress unchanged ({replay_ms:.0f} ms)')
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+DigiSken LMS - Catalog response benchmark
+Times GET /api/lms/courses (a full page) and reports bytes on the wire
+for each step of the response path: stdlib json, the fast serializer,
+cached serialized responses, and gzip/brotli negotiation.
+
+Usage:
+    python benchmarks/bench_responses.py
+    python benchmarks/bench_responses.py --courses 500 --requests 1000
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+from bench_app import create_bench_app  # also puts flask_backend on sys.path
+
+
+def build_app(tmp, courses):
+    app = create_bench_app(tmp)
+    with app.extensions['catalog_pool'].connection() as conn:
+        conn.executemany('''
+            INSERT INTO courses (title, description, instructor, category, rating, price)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(f'Course {i}', f'Everything about topic {i}, from basics to advanced practice',
+               f'Instructor {i % 40}', f'Category {i % 12}', 4.5, 0) for i in range(courses)])
+    return app
+
+
+def measure(client, url, requests, headers):
+    times = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        times.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.status_code
+    return statistics.median(times), len(response.data), response.headers.get('Content-Encoding', 'identity')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    from flask.json.provider import DefaultJSONProvider
+    from app import responses
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(tmp, args.courses)
+        client = app.test_client()
+        url = '/api/lms/courses?limit=200'
+        cache = app.extensions['response_cache']
+        cache_size = cache.max_entries
+        fast_json = app.json
+
+        modes = [
+            ('stdlib json, no cache', DefaultJSONProvider(app), 0, {}),
+            ('fast json, no cache', fast_json, 0, {}),
+            ('fast json + response cache', fast_json, cache_size, {}),
+            ('+ gzip', fast_json, cache_size, {'Accept-Encoding': 'gzip'}),
+        ]
+        if responses.brotli is not None:
+            modes.append(('+ brotli', fast_json, cache_size, {'Accept-Encoding': 'br, gzip'}))
+
+        print(f"{'mode':<30}{'p50 ms':>10}{'bytes':>10}  encoding")
+        for name, provider, max_entries, headers in modes:
+            app.json = provider
+            cache.max_entries = max_entries
+            p50, size, encoding = measure(client, url, args.requests, headers)
+            print(f'{name:<30}{p50:>10.3f}{size:>10}  {encoding}')
+
+        services = app.extensions['auth']
+        services.shutdown()
+        services.db_pool.close()
+        app.extensions['catalog_pool'].close()
+
+    print(f"\nserializer: {'orjson' if responses.orjson is not None else 'json (orjson not installed)'}")
+
+
+if __name__ == '__main__':
+    main()
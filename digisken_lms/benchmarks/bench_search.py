@@ -0,0 +1,133 @@
+"""
+DigiSken LMS - Catalog search benchmark
+Builds a synthetic catalog (default 2,000 courses x 25 lessons) and times
+ranked FTS5 search against the LIKE scan it replaces, for whole words and
+prefixes. Also times indexing: the initial rebuild and the per-write cost
+the sync triggers add.
+
+Usage:
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py --courses 4000 --lessons 25 --queries 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flask_backend'))
+
+from app.catalog import SEARCH_INDEXES, CatalogStore, init_catalog
+from app.db import ConnectionPool
+
+SYLLABLES = ('ka', 'lo', 'mi', 'tor', 'ven', 'sa', 'ri', 'pol', 'de', 'nu', 'bra', 'gin', 'che', 'fu')
+# Vocabulary with a Zipf-like frequency distribution, like natural text
+VOCABULARY = sorted({a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES})
+WEIGHTS = [1 / rank for rank in range(1, len(VOCABULARY) + 1)]
+
+
+def text(rng, words):
+    return ' '.join(rng.choices(VOCABULARY, WEIGHTS, k=words))
+
+
+def set_sync_triggers(conn, enabled):
+    """Drop the search sync triggers, or recreate them (init_catalog)"""
+    if enabled:
+        init_catalog(conn, seed=False)
+        return
+    for index in SEARCH_INDEXES:
+        for event in ('insert', 'delete', 'update'):
+            conn.execute(f'DROP TRIGGER trg_{index}_{event}')
+
+
+def like_search(conn, word):
+    """Every match, unranked: what filtering the full catalog amounts to"""
+    pattern = f'%{word}%'
+    return conn.execute('''
+        SELECT 'course', id FROM courses WHERE title LIKE ? OR description LIKE ? OR instructor LIKE ?
+        UNION ALL
+        SELECT 'lesson', id FROM lessons WHERE title LIKE ? OR content LIKE ?
+    ''', (pattern, pattern, pattern, pattern, pattern)).fetchall()
+
+
+def timed(fn, queries):
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--courses', type=int, default=2000)
+    parser.add_argument('--lessons', type=int, default=25, help='lessons per course')
+    parser.add_argument('--queries', type=int, default=100)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, 'lms.db'), size=1)
+        with pool.connection() as conn:
+            init_catalog(conn, seed=False)
+            # Load without the sync triggers, then index once (as for an
+            # existing catalog the first time search is deployed)
+            set_sync_triggers(conn, False)
+            conn.executemany('INSERT INTO courses (id, title, description, instructor) VALUES (?, ?, ?, ?)',
+                             [(i, text(rng, 4), text(rng, 20), f'Instructor {i % 300}')
+                              for i in range(1, args.courses + 1)])
+            conn.executemany('INSERT INTO lessons (course_id, position, title, content) VALUES (?, ?, ?, ?)',
+                             [(course, position, text(rng, 5), text(rng, 120))
+                              for course in range(1, args.courses + 1)
+                              for position in range(1, args.lessons + 1)])
+            start = time.perf_counter()
+            init_catalog(conn, seed=False)
+            for index in SEARCH_INDEXES:
+                conn.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+            conn.commit()
+            rebuild_s = time.perf_counter() - start
+
+            lessons = args.courses * args.lessons
+            print(f'{args.courses} courses, {lessons} lessons; index rebuild {rebuild_s:.2f} s')
+
+            catalog = CatalogStore(conn)
+            # Searchable words: neither stop-word frequent nor vanishingly rare
+            common = VOCABULARY[20:500]
+            words = [rng.choice(common) for _ in range(args.queries)]
+            two_words = [f'{rng.choice(common)} {rng.choice(common)}' for _ in range(args.queries)]
+            prefixes = [word[:-1] for word in words]
+            modes = [
+                ('LIKE scan, 1 word', lambda q: like_search(conn, q), words),
+                ('FTS5 ranked, 1 word', lambda q: catalog.search(q, 20), words),
+                ('FTS5 ranked, 2 words', lambda q: catalog.search(q, 20), two_words),
+                ('FTS5 ranked, prefix', lambda q: catalog.search(q, 20), prefixes),
+                ('FTS5 ranked, page 5', lambda q: catalog.search(q, 20, offset=80), words),
+            ]
+            print(f"{'query':<32}{'p50 ms':>10}{'p95 ms':>10}")
+            for name, fn, queries in modes:
+                p50, p95 = timed(fn, queries)
+                print(f'{name:<32}{p50:>10.2f}{p95:>10.2f}')
+
+            def write():
+                start = time.perf_counter()
+                for i in range(200):
+                    conn.execute('UPDATE lessons SET content = ? WHERE id = ?', (text(rng, 120), i + 1))
+                conn.commit()
+                return (time.perf_counter() - start) * 1000 / 200
+
+            set_sync_triggers(conn, False)
+            without = write()
+            set_sync_triggers(conn, True)
+            with_sync = write()
+            print(f'\nLesson update: {without:.3f} ms without the search index, '
+                  f'{with_sync:.3f} ms with it')
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
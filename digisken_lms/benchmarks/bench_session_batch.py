@@ -0,0 +1,96 @@
+"""
+DigiSken LMS - Session validation benchmark
+Compares ways for a gateway or another blueprint to authorize N tokens:
+one POST /api/verify-session per token, a single POST /api/verify-sessions
+for all of them (cold and warm session cache), and the in-process
+require_session decorator on a protected view.
+
+Usage:
+    python benchmarks/bench_session_batch.py
+    python benchmarks/bench_session_batch.py --tokens 256 --rounds 20
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from bench_app import create_bench_app  # also puts flask_backend on sys.path
+
+
+def build_app(tmp):
+    from flask import Blueprint, g, jsonify
+    from app.auth_routes import require_session
+
+    app = create_bench_app(tmp, RATE_LIMIT_ENABLED='false')
+    bench_bp = Blueprint('bench', __name__)
+
+    @bench_bp.route('/bench/protected')
+    @require_session
+    def protected():
+        return jsonify({'phone_number': g.phone_number})
+
+    app.register_blueprint(bench_bp)
+    return app
+
+
+def timed(fn, rounds, clear):
+    times = []
+    for _ in range(rounds):
+        if clear:
+            clear()
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=256)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(tmp)
+        app.config['SESSION_BATCH_MAX_TOKENS'] = max(args.tokens, app.config['SESSION_BATCH_MAX_TOKENS'])
+        services = app.extensions['auth']
+        client = app.test_client()
+
+        expires = datetime.now() + timedelta(days=7)
+        tokens = [f'bench-token-{i}' for i in range(args.tokens)]
+        for i, token in enumerate(tokens):
+            services.stores.sessions.create(f'+1555{i:07d}', token, expires)
+
+        def one_by_one():
+            for token in tokens:
+                assert client.post('/api/verify-session', json={'session_token': token}).status_code == 200
+
+        def batch():
+            response = client.post('/api/verify-sessions', json={'session_tokens': tokens})
+            assert all(result['valid'] for result in response.get_json()['sessions'])
+
+        def protected():
+            for token in tokens:
+                response = client.get('/bench/protected', headers={'Authorization': f'Bearer {token}'})
+                assert response.status_code == 200
+
+        cold = services.session_cache.clear
+        modes = [
+            ('verify-session x N, cold cache', one_by_one, cold),
+            ('verify-sessions, cold cache', batch, cold),
+            ('verify-sessions, warm cache', batch, None),
+            ('require_session x N, cold cache', protected, cold),
+            ('require_session x N, warm cache', protected, None),
+        ]
+        print(f'{args.tokens} tokens, median of {args.rounds} rounds')
+        print(f"{'mode':<36}{'total ms':>10}{'per token us':>15}")
+        for name, fn, clear in modes:
+            total = timed(fn, args.rounds, clear)
+            print(f'{name:<36}{total:>10.2f}{total * 1000 / args.tokens:>15.1f}')
+        services.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+DigiSken LMS - SMS queue load test
+Enqueues a burst of OTP messages into a temporary outbox and drains it
+through the fake provider (no network), reporting enqueue latency,
+delivery throughput and retry counts.
+
+Usage:
+    python benchmarks/bench_sms_queue.py --messages 2000 --senders 4 --latency 0.05 --failure-rate 0.1
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flask_backend'))
+
+from app.db import ConnectionPool  # noqa: E402
+from app.migrations import migrate  # noqa: E402
+from app.sms_queue import FakeProvider, SmsQueue  # noqa: E402
+
+
+def run(messages, senders, latency, failure_rate):
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, 'bench.db'), size=senders + 2)
+        with pool.connection() as conn:
+            migrate(conn)
+
+        provider = FakeProvider(latency=latency, failure_rate=failure_rate, seed=1)
+        queue = SmsQueue(pool.connection, provider, senders=senders,
+                         base_backoff=0.05, max_backoff=0.5, max_attempts=10,
+                         log=lambda message: None)
+
+        enqueue_ms = []
+        start = time.perf_counter()
+        for i in range(messages):
+            t0 = time.perf_counter()
+            queue.enqueue(f'+1555{i:07d}', f'Your DigiSken LMS login code is: {i % 1000000:06d}')
+            enqueue_ms.append((time.perf_counter() - t0) * 1000)
+        enqueued = time.perf_counter() - start
+
+        while queue.delivered + queue.failed < messages:
+            time.sleep(0.05)
+        drained = time.perf_counter() - start
+        queue.stop()
+
+        enqueue_ms.sort()
+        print(f'messages        {messages}')
+        print(f'enqueue p50     {statistics.median(enqueue_ms):.3f} ms')
+        print(f'enqueue p99     {enqueue_ms[int(len(enqueue_ms) * 0.99) - 1]:.3f} ms')
+        print(f'enqueue total   {enqueued:.2f} s')
+        print(f'drain total     {drained:.2f} s ({messages / drained:.0f} msg/s)')
+        print(f'delivered       {queue.delivered}')
+        print(f'failed          {queue.failed}')
+        print(f'retries         {queue.retried}')
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--senders', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='simulated provider latency in seconds')
+    parser.add_argument('--failure-rate', type=float, default=0.05)
+    args = parser.parse_args()
+    run(args.messages, args.senders, args.latency, args.failure_rate)
+
+
+if __name__ == '__main__':
+    main()
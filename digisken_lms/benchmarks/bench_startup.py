@@ -0,0 +1,183 @@
+"""
+DigiSken LMS - Startup benchmark
+Measures what a new worker costs: interpreter + imports of the entry
+point, app construction (schema migrations, catalog, bcrypt calibration)
+and, for a worker forked from a preloaded app, the time to serve its
+first requests. Each figure is the median of --runs fresh interpreters.
+
+The run is checked against a budget file (import/startup ms, and modules
+that must not be imported at startup, e.g. twilio) and exits non-zero
+when it is exceeded.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 9 --budget benchmarks/startup_budget.json
+    python benchmarks/bench_startup.py --importtime     # heaviest imports
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flask_backend')
+DEFAULT_BUDGET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_budget.json')
+
+# Runs in a fresh interpreter; prints one JSON line
+PROBE = r'''
+import json, os, sys, time
+start = time.perf_counter()
+entry = sys.argv[1]
+if entry == 'wsgi':
+    from app import create_app
+else:
+    from app.async_auth import create_asgi_app
+imported = time.perf_counter()
+app = create_app('production') if entry == 'wsgi' else create_asgi_app('production')
+created = time.perf_counter()
+
+
+def first_requests():
+    if entry == 'wsgi':
+        client = app.test_client()
+        client.get('/api/health')
+        client.post('/api/verify-session', json={'session_token': 'startup-probe'})
+        return
+    import asyncio
+
+    async def call(method, path, body):
+        messages = [{'type': 'http.request', 'body': body}]
+
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            pass
+
+        await app({'type': 'http', 'method': method, 'path': path, 'headers': [],
+                   'client': ('127.0.0.1', 1)}, receive, send)
+
+    async def run():
+        await call('GET', '/api/health', b'')
+        await call('POST', '/api/verify-session', b'{"session_token": "startup-probe"}')
+
+    asyncio.run(run())
+
+
+# A worker forked from the preloaded app (gunicorn preload_app)
+read_fd, write_fd = os.pipe()
+pid = os.fork()
+if pid == 0:
+    forked = time.perf_counter()
+    first_requests()
+    os.write(write_fd, str((time.perf_counter() - forked) * 1000).encode())
+    os._exit(0)
+os.waitpid(pid, 0)
+fork_ms = float(os.read(read_fd, 64))
+
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'fork_first_request_ms': fork_ms,
+    'modules': sorted(sys.modules),
+}))
+os._exit(0)
+'''
+
+
+def probe_env(tmp):
+    env = dict(os.environ)
+    env.update({
+        'AUTH_DATABASE': os.path.join(tmp, 'auth.db'),
+        'LMS_DATABASE': os.path.join(tmp, 'lms.db'),
+        'MAINTENANCE_INTERVAL': '0',
+    })
+    # Startup as configured for production: bcrypt is calibrated, not pinned,
+    # and the real SMS provider is selected (but never sends)
+    for name in ('BCRYPT_ROUNDS', 'SMS_PROVIDER', 'DEBUG_MODE'):
+        env.pop(name, None)
+    return env
+
+
+def run_probe(entry, env):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', PROBE, entry], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f'{entry} probe failed:\n{result.stderr}')
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    # Everything up to a running app, interpreter startup included
+    sample['process_ms'] = wall_ms
+    return sample
+
+
+def heaviest_imports(entry, env, count=12):
+    """Top-level packages by cumulative import time (python -X importtime)"""
+    module = 'app' if entry == 'wsgi' else 'app.async_auth'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    totals = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        if '.' not in name:
+            totals[name] = max(totals.get(name, 0), int(cumulative))
+    return sorted(totals.items(), key=lambda item: -item[1])[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--entry', choices=('wsgi', 'asgi', 'both'), default='both')
+    parser.add_argument('--budget', default=DEFAULT_BUDGET, help="budget file ('' to skip the check)")
+    parser.add_argument('--importtime', action='store_true', help='list the heaviest imports')
+    args = parser.parse_args()
+
+    budget = None
+    if args.budget:
+        with open(args.budget) as f:
+            budget = json.load(f)
+
+    entries = ('wsgi', 'asgi') if args.entry == 'both' else (args.entry,)
+    metrics = ('process_ms', 'import_ms', 'create_app_ms', 'fork_first_request_ms')
+    violations = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = probe_env(tmp)
+        print(f"{'entry':<6}" + ''.join(f'{name:>24}' for name in metrics))
+        for entry in entries:
+            samples = [run_probe(entry, env) for _ in range(args.runs)]
+            medians = {name: statistics.median(sample[name] for sample in samples) for name in metrics}
+            print(f'{entry:<6}' + ''.join(f'{medians[name]:>24.1f}' for name in metrics))
+
+            if budget:
+                for name, limit in budget.get(entry, {}).items():
+                    if medians[name] > limit:
+                        violations.append(f'{entry} {name} {medians[name]:.1f} ms > budget {limit} ms')
+                loaded = set(samples[0]['modules'])
+                for module in budget.get('forbidden_modules', ()):
+                    if module in loaded:
+                        violations.append(f'{entry} imports {module} at startup')
+
+            if args.importtime:
+                print(f'  heaviest imports ({entry}):')
+                for name, cumulative in heaviest_imports(entry, env):
+                    print(f'    {name:<24}{cumulative / 1000:>8.1f} ms')
+
+    if violations:
+        print('\nStartup budget exceeded:')
+        for violation in violations:
+            print(f'  ✗ {violation}')
+        sys.exit(1)
+    if budget:
+        print('\n✓ Within the startup budget')
+
+
+if __name__ == '__main__':
+    main()
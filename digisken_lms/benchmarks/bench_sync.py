@@ -0,0 +1,118 @@
+"""
+DigiSken LMS - Catalog delta-sync benchmark
+Compares what an offline client downloads to refresh its copy of the
+catalog: refetching every course and lesson list, a first /sync from
+cursor 0, and delta syncs after a few edits or none (gzip on the wire).
+
+Usage:
+    python benchmarks/bench_sync.py
+    python benchmarks/bench_sync.py --courses 2000 --lessons 25 --edits 50
+"""
+
+import argparse
+import gzip
+import json
+import random
+import tempfile
+import time
+
+from bench_app import create_bench_app  # also puts flask_backend on sys.path
+
+HEADERS = {'Accept-Encoding': 'gzip'}
+
+
+def build_app(tmp, courses, lessons, rng):
+    app = create_bench_app(tmp)
+    words = ('python', 'flask', 'data', 'design', 'lesson', 'project', 'review', 'practice', 'basics')
+    with app.extensions['catalog_pool'].connection() as conn:
+        conn.executemany('INSERT INTO courses (title, description, instructor) VALUES (?, ?, ?)',
+                         [(f'Course {i}', ' '.join(rng.choices(words, k=30)), f'Instructor {i % 50}')
+                          for i in range(courses)])
+        conn.executemany('INSERT INTO lessons (course_id, position, title, content) VALUES (?, ?, ?, ?)',
+                         [(course, position, f'Lesson {position}', ' '.join(rng.choices(words, k=150)))
+                          for course in range(3, courses + 3) for position in range(1, lessons + 1)])
+    return app
+
+
+class Wire:
+    """Test client wrapper counting requests and response bytes"""
+
+    def __init__(self, client):
+        self.client = client
+        self.requests = 0
+        self.bytes = 0
+
+    def get(self, url):
+        """(JSON body, headers) of a GET"""
+        response = self.client.get(url, headers=HEADERS)
+        self.requests += 1
+        self.bytes += len(response.data)
+        data = response.data
+        if response.headers.get('Content-Encoding') == 'gzip':
+            data = gzip.decompress(data)
+        return json.loads(data), response.headers
+
+
+def refetch(wire):
+    """What a client without the change feed does: every course page, then
+    every course's lessons"""
+    course_ids, url = [], '/api/lms/courses?limit=200'
+    while url:
+        courses, headers = wire.get(url)
+        course_ids += [course['id'] for course in courses]
+        cursor = headers.get('X-Next-Cursor')
+        url = f'/api/lms/courses?limit=200&after={cursor}' if cursor else None
+    for course_id in course_ids:
+        wire.get(f'/api/lms/courses/{course_id}/lessons?limit=200')
+
+
+def sync(wire, since):
+    """Follow /sync until "more" is false; returns the new cursor"""
+    while True:
+        body, _ = wire.get(f'/api/lms/sync?since={since}')
+        since = body['cursor']
+        if not body['more']:
+            return since
+
+
+def measure(client, refresh):
+    wire = Wire(client)
+    start = time.perf_counter()
+    result = refresh(wire)
+    return result, (wire.requests, wire.bytes, (time.perf_counter() - start) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--courses', type=int, default=500)
+    parser.add_argument('--lessons', type=int, default=20, help='lessons per course')
+    parser.add_argument('--edits', type=int, default=20, help='lessons edited before the delta sync')
+    args = parser.parse_args()
+    rng = random.Random(11)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(tmp, args.courses, args.lessons, rng)
+        client = app.test_client()
+        rows = []
+        _, stats = measure(client, refetch)
+        rows.append(('Refetch courses + all lessons', stats))
+        cursor, stats = measure(client, lambda wire: sync(wire, 0))
+        rows.append(('First sync (since=0)', stats))
+
+        with app.extensions['catalog_pool'].connection() as conn:
+            ids = [row[0] for row in conn.execute('SELECT id FROM lessons')]
+            for lesson_id in rng.sample(ids, args.edits):
+                conn.execute("UPDATE lessons SET content = content || ' (updated)' WHERE id = ?", (lesson_id,))
+        cursor, stats = measure(client, lambda wire: sync(wire, cursor))
+        rows.append((f'Delta sync after {args.edits} edits', stats))
+        _, stats = measure(client, lambda wire: sync(wire, cursor))
+        rows.append(('Delta sync, nothing changed', stats))
+
+        print(f'{args.courses + 2} courses, {args.courses * args.lessons + 4} lessons')
+        print(f"{'refresh':<34}{'requests':>10}{'KB (gzip)':>12}{'ms':>10}")
+        for name, (requests, size, ms) in rows:
+            print(f'{name:<34}{requests:>10}{size / 1024:>12.1f}{ms:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
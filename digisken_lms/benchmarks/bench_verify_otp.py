@@ -0,0 +1,140 @@
+"""
+DigiSken LMS - OTP verification benchmark and double-use check
+Measures SQL statements and latency per /api/verify-otp call (failed and
+successful attempts), then fires the same correct code from many threads
+at once and checks that exactly one of them gets a session.
+
+Usage:
+    python benchmarks/bench_verify_otp.py --users 200 --threads 8 --rounds 50
+    python benchmarks/bench_verify_otp.py --otp-store memory
+"""
+
+import argparse
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_app import create_bench_app  # also puts flask_backend on sys.path
+
+PASSWORD = 'Bench@Pass1'
+
+
+def build_app(tmp, otp_store='database'):
+    """In-process app with production settings on a throwaway database"""
+    # No SMS senders: every statement counted belongs to a request
+    return create_bench_app(tmp, OTP_STORE=otp_store, SMS_SENDERS='0',
+                            METRICS_ENABLED='true', SLOW_REQUEST_MS='0')
+
+
+class Client:
+    """Test client posing as its own IP so per-IP limits do not interfere"""
+
+    def __init__(self, app, ip):
+        self.client = app.test_client()
+        self.environ = {'REMOTE_ADDR': ip}
+
+    def post(self, path, payload):
+        return self.client.post(path, json=payload, environ_base=self.environ)
+
+
+def statement_count(metrics):
+    return sum(count for labels, (count, _) in metrics.db_seconds.totals().items() if labels[0] == 'auth')
+
+
+def login(client, database, phone_number):
+    """Register/login and return the OTP that was issued"""
+    client.post('/api/register', {'phone_number': phone_number, 'password': PASSWORD})
+    client.post('/api/login', {'phone_number': phone_number, 'password': PASSWORD})
+    # Only a digest is stored; the code itself is in the queued SMS
+    with sqlite3.connect(database) as conn:
+        body = conn.execute(
+            'SELECT body FROM sms_outbox WHERE phone_number = ? ORDER BY id DESC LIMIT 1',
+            (phone_number,)
+        ).fetchone()[0]
+    return re.search(r'code is: (\d{6})', body).group(1)
+
+
+def measure(client, metrics, payload, expect):
+    before = statement_count(metrics)
+    start = time.perf_counter()
+    response = client.post('/api/verify-otp', payload)
+    elapsed = (time.perf_counter() - start) * 1000
+    assert response.status_code == expect, (response.status_code, response.get_json())
+    return statement_count(metrics) - before, elapsed
+
+
+def report(name, samples):
+    statements = [s for s, _ in samples]
+    latency = sorted(ms for _, ms in samples)
+    print(f'{name:<10} statements/call {statistics.mean(statements):5.2f}   '
+          f'p50 {statistics.median(latency):6.3f} ms   '
+          f'p95 {latency[int(len(latency) * 0.95) - 1]:6.3f} ms')
+
+
+def run_latency(app, database, users):
+    metrics = app.extensions['metrics']
+    failed, succeeded = [], []
+    for i in range(users):
+        phone_number = f'+1555{i:07d}'
+        client = Client(app, f'10.0.{i // 250}.{i % 250}')
+        otp = login(client, database, phone_number)
+        wrong = f'{(int(otp) + 1) % 1000000:06d}'
+        failed.append(measure(client, metrics, {'phone_number': phone_number, 'otp': wrong}, 401))
+        succeeded.append(measure(client, metrics, {'phone_number': phone_number, 'otp': otp}, 200))
+    report('wrong code', failed)
+    report('correct', succeeded)
+
+
+def run_race(app, database, threads, rounds):
+    """Same correct code from ``threads`` clients at once; returns double uses"""
+    double_uses = errors = 0
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for r in range(rounds):
+            phone_number = f'+1666{r:07d}'
+            otp = login(Client(app, f'10.1.{r // 250}.{r % 250}'), database, phone_number)
+            clients = [Client(app, f'10.2.{r % 250}.{t}') for t in range(threads)]
+            barrier = threading.Barrier(threads)
+
+            def attempt(client):
+                barrier.wait()
+                return client.post('/api/verify-otp', {'phone_number': phone_number, 'otp': otp}).status_code
+
+            statuses = list(executor.map(attempt, clients))
+            with sqlite3.connect(database) as conn:
+                sessions = conn.execute('SELECT COUNT(*) FROM sessions WHERE phone_number = ?',
+                                        (phone_number,)).fetchone()[0]
+            errors += sum(status not in (200, 401, 429) for status in statuses)
+            if statuses.count(200) != 1 or sessions != 1:
+                double_uses += 1
+                print(f'  round {r}: {statuses.count(200)} successes, {sessions} sessions, statuses {statuses}')
+    print(f'race       {rounds} rounds x {threads} threads: '
+          f'{double_uses} rounds with a reused or lost OTP, {errors} errored requests')
+    return double_uses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--otp-store', choices=('database', 'memory'), default='database')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(tmp, args.otp_store)
+        database = app.config['AUTH_DATABASE']
+        run_latency(app, database, args.users)
+        double_uses = run_race(app, database, args.threads, args.rounds)
+        services = app.extensions['auth']
+        services.shutdown()
+        services.db_pool.close()
+    sys.exit(1 if double_uses else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Files the service worker precaches, relative to the frontend root
+ASSET_PATTERNS = ('index.html', 'login.html', 'digikesen.html', 'manifest.json',
+                  'css/*.css', 'js/*.js', 'icons/*')
+# sw.js carries the manifest between these markers, so its bytes change
+# whenever an asset does and browsers install the new worker
+MARKERS = re.compile(r'(// <asset-manifest>\n).*?(// </asset-manifest>)', re.S)
+
+parser = argparse.ArgumentParser(description='Hash frontend assets into asset-manifest.json and sw.js')
+parser.add_argument('--root', default=ROOT, help='frontend root (served at /)')
+parser.add_argument('--check', action='store_true', help='exit 1 if sw.js is out of date instead of writing')
+args = parser.parse_args()
+
+assets = {}
+for pattern in ASSET_PATTERNS:
+    for path in sorted(glob.glob(os.path.join(args.root, pattern))):
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:16]
+            assets['/' + os.path.relpath(path, args.root).replace(os.sep, '/')] = digest
+version = hashlib.sha256(json.dumps(assets, sort_keys=True).encode()).hexdigest()[:12]
+manifest = {'version': version, 'assets': assets}
+
+sw_path = os.path.join(args.root, 'sw.js')
+with open(sw_path, encoding='utf-8') as f:
+    sw = f.read()
+if not MARKERS.search(sw):
+    sys.exit('✗ sw.js has no // <asset-manifest> block')
+updated = MARKERS.sub(lambda m: m.group(1) + f'const ASSET_MANIFEST = {json.dumps(manifest, indent=2)};\n'
+                      + m.group(2), sw)
+
+if args.check:
+    if updated != sw:
+        sys.exit(f'✗ sw.js is out of date: run python {os.path.basename(__file__)}')
+    print(f'✓ sw.js is up to date (version {version})')
+    sys.exit(0)
+
+with open(sw_path, 'w', encoding='utf-8') as f:
+    f.write(updated)
+with open(os.path.join(args.root, 'asset-manifest.json'), 'w', encoding='utf-8') as f:
+    json.dump(manifest, f, indent=2)
+    f.write('\n')
+print(f'✓ {len(assets)} assets, version {version}: sw.js and asset-manifest.json updated')
@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask_backend'))
+
+from app.bulk_users import (FORMATS, Checkpoint, Progress, detect_format, export_users,
+                            import_users, read_records)
+from app.db import ConnectionPool
+from app.password_hashing import PasswordHasher
+from app.stores import SqliteStores
+
+parser = argparse.ArgumentParser(description='Bulk import/export users')
+parser.add_argument('--db', default='digisken_lms.db')
+parser.add_argument('--postgres', metavar='DSN', help='use this PostgreSQL store instead of --db')
+subparsers = parser.add_subparsers(dest='command', required=True)
+
+import_parser = subparsers.add_parser('import', help='register users from a CSV/JSONL file')
+import_parser.add_argument('file', help='CSV with a phone_number,password header, or JSONL')
+import_parser.add_argument('--format', choices=FORMATS)
+import_parser.add_argument('--batch-size', type=int, default=1000)
+import_parser.add_argument('--workers', type=int, help='hashing processes (default: CPU count)')
+import_parser.add_argument('--rounds', type=int,
+                           help='bcrypt cost (default: calibrated like the server)')
+import_parser.add_argument('--checkpoint', help='progress file (default: <file>.checkpoint)')
+import_parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint')
+import_parser.add_argument('--rejects', help='write rejected records here (default: <file>.rejects.jsonl)')
+
+export_parser = subparsers.add_parser('export', help='stream all users to a CSV/JSONL file')
+export_parser.add_argument('file', help="output path, or '-' for stdout")
+export_parser.add_argument('--format', choices=FORMATS)
+export_parser.add_argument('--with-hashes', action='store_true',
+                           help='include password hashes (for moving users between databases)')
+
+args = parser.parse_args()
+
+if args.postgres:
+    from app.pg_stores import PostgresStores
+    stores = PostgresStores(args.postgres, max_size=1)
+else:
+    stores = SqliteStores(ConnectionPool(args.db, size=1))
+
+if args.command == 'import':
+    stores.init_db()
+
+    fmt = detect_format(args.file, args.format)
+    checkpoint_path = args.checkpoint or f'{args.file}.checkpoint'
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = Checkpoint(checkpoint_path, args.file)
+    if checkpoint.records:
+        print(f'Resuming after {checkpoint.records} records')
+
+    hasher = PasswordHasher(workers=args.workers, max_pending=args.batch_size, rounds=args.rounds)
+    print(f'Hashing with {hasher.workers} processes at cost {hasher.rounds}')
+
+    rejects_path = args.rejects or f'{args.file}.rejects.jsonl'
+    with open(args.file, newline='', encoding='utf-8') as source, \
+            open(rejects_path, 'a' if checkpoint.records else 'w', encoding='utf-8') as rejects:
+        def on_reject(line_number, record, error):
+            # Never write plaintext passwords back to disk
+            record = {key: value for key, value in record.items() if key != 'password'}
+            rejects.write(json.dumps({'line': line_number, 'error': error, 'record': record}) + '\n')
+
+        try:
+            state = import_users(stores.users, hasher, read_records(source, fmt),
+                                 batch_size=args.batch_size, checkpoint=checkpoint,
+                                 on_reject=on_reject, on_batch=Progress())
+        finally:
+            hasher.shutdown()
+
+    print(f"✓ {state['imported']} users imported, {state['existing']} already registered, "
+          f"{state['rejected']} rejected ({state['records']} records)")
+    if state['rejected']:
+        print(f'  Rejected records: {rejects_path}')
+    os.remove(checkpoint_path)
+
+else:
+    fmt = detect_format(args.file, args.format) if args.file != '-' else (args.format or 'jsonl')
+    if args.file == '-':
+        count = export_users(stores.users, sys.stdout, fmt, args.with_hashes)
+    else:
+        with open(args.file, 'w', newline='', encoding='utf-8') as out:
+            count = export_users(stores.users, out, fmt, args.with_hashes)
+    print(f'✓ {count} users exported', file=sys.stderr)
+
+stores.close()
+stores.pool.close()
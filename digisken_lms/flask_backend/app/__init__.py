@@ -1,14 +1,101 @@
+import os
+
 from flask import Flask
 from flask_cors import CORS
 
-def create_app():
+def create_app(config_name=None):
+    from config.config import config
+    
     app = Flask(__name__)
     CORS(app)
     
+    config_name = config_name or os.environ.get('FLASK_CONFIG', 'default')
+    app.config.from_object(config[config_name])
+    if not app.config['LMS_DATABASE']:
+        app.config['LMS_DATABASE'] = os.path.join(app.instance_path, 'lms_catalog.db')
+    if not app.config['MEDIA_ROOT']:
+        app.config['MEDIA_ROOT'] = os.path.join(app.instance_path, 'media')
+    
+    from app import responses
+    responses.init_app(app)
+    
+    metrics = init_metrics(app)
+    init_services(app, metrics)
+    init_catalog_db(app, metrics)
+    init_progress(app, metrics)
+    if metrics:
+        pools = {'auth': app.extensions['auth'].db_pool,
+                 'catalog': app.extensions['catalog_pool']}
+        stores = app.extensions['auth'].stores
+        if stores.backend != 'sqlite':
+            pools[stores.backend] = stores.pool
+        metrics.observe_pools(pools)
+        metrics.observe_services(app.extensions['auth'])
+    
     from app.routes import main_bp
     from app.lms_routes import lms_bp
+    from app.auth_routes import auth_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(lms_bp)
+    app.register_blueprint(auth_bp)
     
     return app
+
+def init_metrics(app):
+    """Request/DB/bcrypt/SMS metrics served at /metrics (None when disabled)"""
+    if not app.config['METRICS_ENABLED']:
+        return None
+    from app.metrics import Metrics
+    
+    metrics = Metrics(slow_request_ms=app.config['SLOW_REQUEST_MS'])
+    metrics.init_app(app)
+    return metrics
+
+def init_services(app, metrics=None):
+    """Build auth services from config and prepare the auth schema.
+
+    Runs once at startup (in the gunicorn master when preloading), so
+    migrations and bcrypt calibration are not repeated by every worker.
+    """
+    from app.auth_routes import rate_limiter
+    from app.services import AuthServices
+    
+    services = AuthServices(app.config, metrics)
+    app.extensions['auth'] = services
+    rate_limiter.init_app(services.rate_limit_backend, enabled=app.config['RATE_LIMIT_ENABLED'])
+    
+    services.init_db()
+    if app.config['BCRYPT_ROUNDS'] is None:
+        print(f"bcrypt cost calibrated to {services.password_hasher.calibrate()} rounds")
+
+def init_catalog_db(app, metrics=None):
+    """Create (and seed) the catalog database if needed"""
+    import sqlite3
+    from app.catalog import init_catalog
+    from app.db import ConnectionPool
+    from app.metrics import connection_factory
+    
+    os.makedirs(os.path.dirname(os.path.abspath(app.config['LMS_DATABASE'])), exist_ok=True)
+    pool = ConnectionPool(
+        app.config['LMS_DATABASE'],
+        size=app.config['DB_POOL_SIZE'],
+        factory=connection_factory(metrics, 'catalog') if metrics else sqlite3.Connection,
+    )
+    app.extensions['catalog_pool'] = pool
+    with pool.connection() as conn:
+        init_catalog(conn)
+
+def init_progress(app, metrics=None):
+    """Queue that batches learner progress writes into the catalog database"""
+    from app.progress import ProgressQueue, catalog_writer
+    
+    queue = ProgressQueue(
+        catalog_writer(app.extensions['catalog_pool'], app.config['PROGRESS_KEY_RETENTION_DAYS'] * 86400),
+        flush_interval=app.config['PROGRESS_FLUSH_INTERVAL_MS'] / 1000.0,
+        max_events=app.config['PROGRESS_FLUSH_MAX_EVENTS'],
+        max_pending=app.config['PROGRESS_MAX_PENDING'],
+    )
+    app.extensions['progress'] = queue
+    if metrics:
+        metrics.observe_progress(queue)
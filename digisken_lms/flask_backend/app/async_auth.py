@@ -0,0 +1,475 @@
+"""
+DigiSken LMS - Async authentication API (ASGI)
+The same /api/* auth contract as auth_routes, served by async handlers:
+store calls run on a thread executor, bcrypt on the hashing process pool and
+SMS through the outbox, so one worker keeps many logins in flight
+"""
+
+import asyncio
+import os
+import random
+import secrets
+import string
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app.auth_routes import (LOGIN_IP, LOGIN_PHONE, REGISTER_IP, RESEND_OTP_IP, RESEND_OTP_PHONE,
+                             SESSION_BATCH_IP, SESSION_IP, VERIFY_OTP_IP, VERIFY_OTP_PHONE,
+                             batch_tokens, session_results)
+from app.password_hashing import HasherBusy
+from app.rate_limiter import RateLimiter, SqliteBackend, phone_digits
+from app.responses import dumps, loads
+from app.services import AuthServices
+from app.session_cache import MISS
+from app.stores import DuplicateUser
+from app.validation import validate_password, validate_phone_number
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+class AsyncDatabase:
+    """Runs blocking store calls on threads sized to the connection pool.
+
+    ``call(fn, ...)`` runs ``fn(...)`` on an executor thread; a function
+    that opens a transaction and makes several store calls in it costs a
+    single hop off the event loop.
+    """
+
+    def __init__(self, pool, workers=None):
+        self.pool = pool
+        self.executor = ThreadPoolExecutor(max_workers=workers or pool.size,
+                                           thread_name_prefix='async-db')
+
+    async def call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class Request:
+    """The parts of an ASGI HTTP request the handlers use"""
+
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope.get('headers', ())}
+        client = scope.get('client')
+        self.client_ip = client[0] if client else 'unknown'
+        self.user_agent = self.headers.get('user-agent', '')[:256] or None
+        self.body = body
+        self._json = MISS
+
+    def json(self):
+        """Parsed JSON object body, or None when absent or malformed"""
+        if self._json is MISS:
+            try:
+                data = loads(self.body) if self.body else None
+            except ValueError:
+                data = None
+            self._json = data if isinstance(data, dict) else None
+        return self._json
+
+    def rate_limit_keys(self):
+        data = self.json() or {}
+        return {'ip': self.client_ip, 'phone': phone_digits(data.get('phone_number'))}
+
+
+def json_response(payload, status=200, headers=None):
+    return status, payload, headers or {}
+
+
+def error(message, status):
+    return json_response({'success': False, 'error': message}, status)
+
+
+def service_busy(e):
+    """503 response asking the client to retry later"""
+    return json_response({'success': False, 'error': 'Server busy, please retry shortly'}, 503,
+                         {'Retry-After': str(e.retry_after)})
+
+
+def too_many_attempts(retry_after):
+    return json_response({'success': False, 'error': 'Too many attempts. Try again later.'}, 429,
+                         {'Retry-After': str(max(1, int(retry_after + 0.999)))})
+
+
+def new_otp():
+    return ''.join(random.choices(string.digits, k=6))
+
+
+class AsyncAuthApp:
+    """ASGI application serving the auth endpoints from an AuthServices.
+
+    Only blocking work leaves the event loop: store calls and rate-limit
+    UPSERTs run on ``AsyncDatabase``, bcrypt on the hasher's process
+    pool (awaited via its futures) and SMS delivery stays on the outbox
+    senders. Session cache hits, signed-token checks and login
+    bookkeeping are in-memory and run inline.
+    """
+
+    def __init__(self, services, rate_limit_enabled=True):
+        self.services = services
+        self.stores = services.stores
+        self.db = AsyncDatabase(services.stores.pool)
+        self.rate_limiter = RateLimiter(services.rate_limit_backend, enabled=rate_limit_enabled)
+        # The memory backend is a dict update; only the SQLite one does I/O
+        self._limits_block = isinstance(services.rate_limit_backend, SqliteBackend)
+        self.routes = {
+            ('POST', '/api/register'): self.register,
+            ('POST', '/api/login'): self.login,
+            ('POST', '/api/verify-otp'): self.verify_otp,
+            ('POST', '/api/resend-otp'): self.resend_otp,
+            ('POST', '/api/verify-session'): self.verify_session,
+            ('POST', '/api/verify-sessions'): self.verify_sessions,
+            ('POST', '/api/logout'): self.logout,
+            ('GET', '/api/health'): self.health,
+        }
+
+    # ---- ASGI plumbing ----
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.services.start_background()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, self.close)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def close(self):
+        """Stop background work, flush buffered writes and release threads"""
+        self.services.shutdown()
+        self.db.close()
+
+    async def http(self, scope, receive, send):
+        body = b''
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if len(body) > MAX_BODY_BYTES:
+                await self.send(send, error('Request body too large', 413))
+                return
+            if not message.get('more_body'):
+                break
+
+        request = Request(scope, body)
+        if request.method == 'OPTIONS':
+            await self.send(send, json_response({}, 200, {
+                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+                'Access-Control-Allow-Headers': request.headers.get(
+                    'access-control-request-headers', 'Content-Type'),
+            }))
+            return
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            allowed = any(path == request.path for _, path in self.routes)
+            await self.send(send, error('Method not allowed' if allowed else 'Not found',
+                                        405 if allowed else 404))
+            return
+        # Background services start with the first request too, for servers
+        # that do not send lifespan events
+        self.services.start_background()
+        try:
+            if request.method == 'POST' and request.json() is None:
+                response = error('Request body must be a JSON object', 400)
+            else:
+                response = await handler(request)
+        except HasherBusy as e:
+            response = service_busy(e)
+        except Exception as e:
+            response = error(str(e), 500)
+        await self.send(send, response)
+
+    @staticmethod
+    async def send(send, response):
+        status, payload, headers = response
+        body = dumps(payload)
+        raw_headers = [(b'content-type', b'application/json'),
+                       (b'content-length', str(len(body)).encode('latin-1')),
+                       (b'cache-control', b'no-store'),
+                       (b'access-control-allow-origin', b'*')]
+        raw_headers.extend((name.lower().encode('latin-1'), value.encode('latin-1'))
+                           for name, value in headers.items())
+        await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    # ---- helpers ----
+
+    async def check_limits(self, request, *rules):
+        """retry_after of the first exhausted rule, or 0"""
+        if not self.rate_limiter.enabled:
+            return 0.0
+        keys = request.rate_limit_keys()
+        if self._limits_block:
+            return await self.db.call(self.rate_limiter.check, rules, keys)
+        return self.rate_limiter.check(rules, keys)
+
+    async def send_sms(self, phone_number, otp_code):
+        """Queue SMS with OTP code; delivery happens on background senders"""
+        await self.db.call(lambda: self.services.sms_queue.enqueue(
+            phone_number,
+            f"Your DigiSken LMS login code is: {otp_code}\n\nValid for 10 minutes.",
+            ttl=timedelta(minutes=10),
+        ))
+        return True
+
+    def generate_session_token(self, phone_number, expires):
+        signer = self.services.session_signer
+        if signer is not None:
+            return signer.issue(phone_number, expires.timestamp())[0]
+        return secrets.token_urlsafe(32)
+
+    async def lookup_sessions(self, session_tokens):
+        """{token: (phone_number, expires_ts) or None}; only tokens not
+        resolved in memory leave the event loop, in one store query"""
+        found, missing = self.services.cached_sessions(session_tokens)
+        if not missing:
+            return found
+        sessions = await self.db.call(self.stores.sessions.get_many, missing)
+        return self.services.cache_sessions(found, missing, sessions)
+
+    async def lookup_session(self, session_token):
+        """Return (phone_number, expires_ts) for a token, or None if unknown"""
+        return (await self.lookup_sessions((session_token,)))[session_token]
+
+    # ---- endpoints ----
+
+    async def register(self, request):
+        retry_after = await self.check_limits(request, REGISTER_IP)
+        if retry_after > 0:
+            return too_many_attempts(retry_after)
+
+        data = request.json()
+        phone_number = str(data.get('phone_number', '')).strip()
+        password = data.get('password', '')
+
+        if not phone_number or not password:
+            return error('Phone and password required', 400)
+        if not validate_phone_number(phone_number):
+            return error('Invalid phone number format', 400)
+        valid, msg = validate_password(password)
+        if not valid:
+            return error(msg, 400)
+
+        if await self.db.call(self.stores.users.exists, phone_number):
+            return error('Phone number already registered', 400)
+
+        password_hash = await asyncio.wrap_future(self.services.password_hasher.hash_async(password))
+
+        try:
+            await self.db.call(self.stores.users.create, phone_number, password_hash, True)
+        except DuplicateUser:
+            return error('Phone number already registered', 400)
+
+        return json_response({
+            'success': True,
+            'message': 'Registration successful! 2FA is enabled by default.',
+            'phone_number': phone_number
+        }, 201)
+
+    async def login(self, request):
+        retry_after = await self.check_limits(request, LOGIN_IP, LOGIN_PHONE)
+        if retry_after > 0:
+            return too_many_attempts(retry_after)
+
+        data = request.json()
+        phone_number = str(data.get('phone_number', '')).strip()
+        password = data.get('password', '')
+
+        if not phone_number or not password:
+            return error('Phone and password required', 400)
+
+        user = await self.db.call(self.stores.users.get, phone_number)
+        hasher = self.services.password_hasher
+        if not user or not await asyncio.wrap_future(hasher.verify_async(password, user['password_hash'])):
+            return error('Invalid credentials', 401)
+
+        self.services.rehash_in_background(phone_number, password, user['password_hash'])
+
+        if user['two_fa_enabled']:
+            otp_code = new_otp()
+            now = datetime.now()
+            await self.db.call(self.stores.otps.issue, phone_number, otp_code,
+                               now + timedelta(minutes=10), now)
+            sms_sent = await self.send_sms(phone_number, otp_code)
+
+            return json_response({
+                'success': True,
+                'requires_2fa': True,
+                'message': 'OTP sent to your phone' if sms_sent else 'Check console for OTP code',
+                'phone_number': phone_number
+            })
+
+        expires = datetime.now() + timedelta(days=7)
+        session_token = self.generate_session_token(phone_number, expires)
+        await self.db.call(self.stores.sessions.create, phone_number, session_token, expires,
+                           request.client_ip, request.user_agent)
+
+        self.services.session_cache.put(session_token, phone_number, expires.timestamp())
+        self.services.write_buffer.record_login(phone_number, request.client_ip, request.user_agent,
+                                                'password')
+
+        return json_response({
+            'success': True,
+            'requires_2fa': False,
+            'session_token': session_token,
+            'message': 'Login successful'
+        })
+
+    async def verify_otp(self, request):
+        data = request.json()
+        phone_number = str(data.get('phone_number', '')).strip()
+        otp = data.get('otp', '')
+        keys = request.rate_limit_keys()
+
+        expires = datetime.now() + timedelta(days=7)
+        session_token = self.generate_session_token(phone_number, expires)
+
+        def verify():
+            # One write transaction, as in auth_routes.verify_otp: attempt
+            # count, code check, consume and session insert commit
+            # together, so a code can only be used once.
+            with self.services.write_transaction():
+                if self.rate_limiter.enabled:
+                    retry_after = self.rate_limiter.check((VERIFY_OTP_IP, VERIFY_OTP_PHONE), keys)
+                    if retry_after > 0:
+                        return too_many_attempts(retry_after)
+
+                if not phone_number or not otp:
+                    return error('Phone and OTP required', 400)
+
+                if not self.stores.otps.consume(phone_number, otp, datetime.now()):
+                    return error('Invalid OTP', 401)
+
+                self.stores.sessions.create(phone_number, session_token, expires,
+                                            request.client_ip, request.user_agent)
+                self.rate_limiter.reset(VERIFY_OTP_PHONE, keys['phone'])
+                return None
+
+        failure = await self.db.call(verify)
+        if failure is not None:
+            return failure
+
+        self.services.session_cache.put(session_token, phone_number, expires.timestamp())
+        self.services.write_buffer.record_login(phone_number, request.client_ip, request.user_agent, 'otp')
+
+        return json_response({
+            'success': True,
+            'session_token': session_token,
+            'message': '2FA verification successful'
+        })
+
+    async def resend_otp(self, request):
+        retry_after = await self.check_limits(request, RESEND_OTP_IP, RESEND_OTP_PHONE)
+        if retry_after > 0:
+            return too_many_attempts(retry_after)
+
+        phone_number = str(request.json().get('phone_number', '')).strip()
+        if not phone_number:
+            return error('Phone required', 400)
+
+        otp_code = new_otp()
+        now = datetime.now()
+        await self.db.call(self.stores.otps.issue, phone_number, otp_code,
+                           now + timedelta(minutes=10), now, True)
+        sms_sent = await self.send_sms(phone_number, otp_code)
+
+        return json_response({
+            'success': True,
+            'message': 'OTP resent to your phone' if sms_sent else 'Check console for OTP code'
+        })
+
+    async def verify_session(self, request):
+        retry_after = await self.check_limits(request, SESSION_IP)
+        if retry_after > 0:
+            return too_many_attempts(retry_after)
+
+        session_token = request.json().get('session_token', '')
+        if not session_token:
+            return error('Session token required', 400)
+
+        session = await self.lookup_session(session_token)
+        if not session:
+            return error('Invalid session', 401)
+
+        phone_number, expires_ts = session
+        if expires_ts < time.time():
+            return error('Session expired', 401)
+
+        return json_response({
+            'success': True,
+            'phone_number': phone_number,
+            'message': 'Session valid'
+        })
+
+    async def verify_sessions(self, request):
+        retry_after = await self.check_limits(request, SESSION_BATCH_IP)
+        if retry_after > 0:
+            return too_many_attempts(retry_after)
+
+        data = request.json()
+        try:
+            tokens = batch_tokens(data, self.services.config['SESSION_BATCH_MAX_TOKENS'])
+        except ValueError as e:
+            return error(str(e), 400)
+
+        sessions = await self.lookup_sessions(tokens)
+        return json_response(session_results(data['session_tokens'], sessions))
+
+    async def logout(self, request):
+        retry_after = await self.check_limits(request, SESSION_IP)
+        if retry_after > 0:
+            return too_many_attempts(retry_after)
+
+        session_token = request.json().get('session_token', '')
+        if not session_token:
+            return error('Session token required', 400)
+
+        await self.db.call(self.stores.sessions.delete, session_token)
+        self.services.session_cache.invalidate(session_token)
+
+        # Signed tokens validate without the sessions table; revoke them too
+        signer = self.services.session_signer
+        if signer is not None and signer.is_signed(session_token):
+            claims = signer.verify(session_token)
+            if claims is not None:
+                await self.db.call(self.services.revocations.revoke, claims.jti, claims.expires_ts)
+
+        return json_response({
+            'success': True,
+            'message': 'Logout successful'
+        })
+
+    async def health(self, request):
+        return json_response({'status': 'OK'})
+
+
+def load_config(config_name=None):
+    """Settings of a config/config.py class as a plain dict"""
+    from config.config import config
+
+    config_class = config[config_name or os.environ.get('FLASK_CONFIG', 'default')]
+    return {key: getattr(config_class, key) for key in dir(config_class) if key.isupper()}
+
+
+def create_asgi_app(config_name=None, config=None):
+    """Build the async auth app from a config name (or an explicit settings dict)"""
+    config = config if config is not None else load_config(config_name)
+    services = AuthServices(config)
+    services.init_db()
+    if config['BCRYPT_ROUNDS'] is None:
+        print(f"bcrypt cost calibrated to {services.password_hasher.calibrate()} rounds")
+    return AsyncAuthApp(services, rate_limit_enabled=config['RATE_LIMIT_ENABLED'])
@@ -0,0 +1,437 @@
+"""
+DigiSken LMS - Secure Authentication API
+Uses bcrypt for password hashing and SMS OTP for 2FA
+Supports Twilio SMS or local development mode
+"""
+
+from flask import Blueprint, current_app, g, request, jsonify
+from datetime import datetime, timedelta
+from functools import wraps
+import secrets
+import random
+import string
+import time
+
+from app.password_hashing import HasherBusy
+from app.rate_limiter import RateLimiter, Rule, client_ip, request_phone
+from app.services import services
+from app.stores import DuplicateUser
+from app.validation import validate_password, validate_phone_number
+
+auth_bp = Blueprint('auth', __name__, url_prefix='/api')
+
+# ============ Rate Limits ============
+# Bound to the configured backend by create_app()
+rate_limiter = RateLimiter()
+
+# Token buckets: capacity hits per period (seconds), refilled continuously
+REGISTER_IP = Rule('register', 'ip', 10, 3600)
+LOGIN_IP = Rule('login', 'ip', 30, 60)
+LOGIN_PHONE = Rule('login', 'phone', 10, 900)
+# 5 OTP guesses, then one more every 3 minutes (reset on success)
+VERIFY_OTP_PHONE = Rule('verify-otp', 'phone', 5, 900)
+VERIFY_OTP_IP = Rule('verify-otp', 'ip', 30, 60)
+# SMS pumping: each resend costs real money
+RESEND_OTP_PHONE = Rule('resend-otp', 'phone', 3, 600)
+RESEND_OTP_IP = Rule('resend-otp', 'ip', 10, 600)
+SESSION_IP = Rule('session', 'ip', 600, 60)
+# Gateways validating many tokens per call
+SESSION_BATCH_IP = Rule('session-batch', 'ip', 120, 60)
+
+# ============ Services ============
+
+@auth_bp.after_request
+def no_store(response):
+    """Auth responses carry credentials and per-user state; never cache them"""
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@auth_bp.before_app_request
+def start_background_services():
+    """Start the sweeper/SMS senders in whichever process serves requests"""
+    services().start_background()
+
+def stores():
+    """User, OTP and session stores of the configured backend"""
+    return services().stores
+
+def write_transaction():
+    """Write transaction shared by the rate limiter and the stores"""
+    return services().write_transaction()
+
+# ============ SMS ============
+
+def send_sms(phone_number, otp_code):
+    """Queue SMS with OTP code; delivery happens on background senders"""
+    services().sms_queue.enqueue(
+        phone_number,
+        f"Your DigiSken LMS login code is: {otp_code}\n\nValid for 10 minutes.",
+        ttl=timedelta(minutes=10),
+    )
+    return True
+
+# ============ Utility Functions ============
+
+def hash_password(password):
+    """Hash password using bcrypt on the hashing pool (calibrated cost)"""
+    return services().password_hasher.hash(password)
+
+def verify_password(password, password_hash):
+    """Verify password against hash on the hashing pool"""
+    return services().password_hasher.verify(password, password_hash)
+
+def rehash_password_if_needed(phone_number, password, password_hash):
+    """Upgrade a stored hash in the background when the bcrypt cost changed"""
+    services().rehash_in_background(phone_number, password, password_hash)
+
+def service_busy(error):
+    """503 response asking the client to retry later"""
+    response = jsonify({'success': False, 'error': 'Server busy, please retry shortly'})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+def client_user_agent():
+    """User-Agent header, truncated for storage"""
+    return request.user_agent.string[:256] or None
+
+def record_login(phone_number, method):
+    """Queue last_login and an audit event; flushed in batches off the request path"""
+    services().write_buffer.record_login(phone_number, client_ip(), client_user_agent(), method)
+
+def generate_session_token(phone_number, expires):
+    """Generate secure session token (HMAC-signed when SESSION_TOKEN_MODE=signed)"""
+    signer = services().session_signer
+    if signer is not None:
+        return signer.issue(phone_number, expires.timestamp())[0]
+    return secrets.token_urlsafe(32)
+
+def lookup_session(session_token):
+    """Return (phone_number, expires_ts) for a token, or None if unknown.
+
+    Signed tokens are checked in memory (signature and revocation list).
+    Opaque tokens are served from the session cache; only cache misses
+    query the database.
+    """
+    return services().lookup_sessions((session_token,))[session_token]
+
+def session_error(session):
+    """Why a looked-up session is not valid, or None if it is"""
+    if not session:
+        return 'Invalid session'
+    if session[1] < time.time():
+        return 'Session expired'
+    return None
+
+def batch_tokens(data, max_tokens):
+    """Distinct tokens of a verify-sessions body; raises ValueError on bad input"""
+    tokens = data.get('session_tokens')
+    if not isinstance(tokens, list) or not tokens:
+        raise ValueError('session_tokens must be a non-empty list')
+    if len(tokens) > max_tokens:
+        raise ValueError(f'At most {max_tokens} session tokens per request')
+    if not all(isinstance(token, str) and token for token in tokens):
+        raise ValueError('session_tokens must be non-empty strings')
+    return list(dict.fromkeys(tokens))
+
+def session_results(tokens, sessions):
+    """verify-sessions payload: one result per requested token, in order"""
+    results = []
+    for token in tokens:
+        session = sessions[token]
+        problem = session_error(session)
+        if problem:
+            results.append({'valid': False, 'error': problem})
+        else:
+            results.append({'valid': True, 'phone_number': session[0], 'expires_at': int(session[1])})
+    return {'success': True, 'sessions': results}
+
+def request_session_token():
+    """Token of ``Authorization: Bearer <token>``, else of X-Session-Token"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token.strip():
+        return token.strip()
+    return request.headers.get('X-Session-Token', '').strip() or None
+
+def require_session(view):
+    """Reject requests without a valid session (401); the view finds the
+    user in ``g.phone_number``.
+
+    The token is checked in process, like /api/verify-session, so a
+    protected view costs no extra HTTP round trip and, on a session cache
+    hit, no database query.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        session_token = request_session_token()
+        session = lookup_session(session_token) if session_token else None
+        problem = session_error(session) if session_token else 'Session token required'
+        if problem:
+            response = jsonify({'success': False, 'error': problem})
+            response.headers['WWW-Authenticate'] = 'Bearer'
+            response.headers['Cache-Control'] = 'no-store'
+            return response, 401
+        g.phone_number, g.session_expires = session
+        return view(*args, **kwargs)
+    return wrapper
+
+# ============ API Endpoints ============
+
+@auth_bp.route('/register', methods=['POST'])
+@rate_limiter.limit(REGISTER_IP)
+def register():
+    """Register new user"""
+    try:
+        data = request.json
+        phone_number = data.get('phone_number', '').strip()
+        password = data.get('password', '')
+        
+        # Validation
+        if not phone_number or not password:
+            return jsonify({'success': False, 'error': 'Phone and password required'}), 400
+        
+        if not validate_phone_number(phone_number):
+            return jsonify({'success': False, 'error': 'Invalid phone number format'}), 400
+        
+        valid, msg = validate_password(password)
+        if not valid:
+            return jsonify({'success': False, 'error': msg}), 400
+        
+        # Check if user exists
+        if stores().users.exists(phone_number):
+            return jsonify({'success': False, 'error': 'Phone number already registered'}), 400
+        
+        # Create user (hash outside the connection so the pool isn't held by bcrypt)
+        password_hash = hash_password(password)
+        
+        stores().users.create(phone_number, password_hash, two_fa_enabled=True)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Registration successful! 2FA is enabled by default.',
+            'phone_number': phone_number
+        }), 201
+    
+    except DuplicateUser:
+        return jsonify({'success': False, 'error': 'Phone number already registered'}), 400
+    except HasherBusy as e:
+        return service_busy(e)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@auth_bp.route('/login', methods=['POST'])
+@rate_limiter.limit(LOGIN_IP, LOGIN_PHONE)
+def login():
+    """First factor authentication - verify phone and password, send OTP via SMS"""
+    try:
+        data = request.json
+        phone_number = data.get('phone_number', '').strip()
+        password = data.get('password', '')
+        
+        if not phone_number or not password:
+            return jsonify({'success': False, 'error': 'Phone and password required'}), 400
+        
+        # Get user
+        user = stores().users.get(phone_number)
+        
+        if not user or not verify_password(password, user['password_hash']):
+            return jsonify({'success': False, 'error': 'Invalid credentials'}), 401
+        
+        rehash_password_if_needed(phone_number, password, user['password_hash'])
+        
+        # Check if 2FA is enabled
+        if user['two_fa_enabled']:
+            # Generate 6-digit OTP code
+            otp_code = ''.join(random.choices(string.digits, k=6))
+            now = datetime.now()
+            
+            # Store OTP (expired codes of this phone are dropped)
+            stores().otps.issue(phone_number, otp_code, now + timedelta(minutes=10), now)
+            
+            # Send SMS
+            sms_sent = send_sms(phone_number, otp_code)
+            
+            return jsonify({
+                'success': True,
+                'requires_2fa': True,
+                'message': 'OTP sent to your phone' if sms_sent else 'Check console for OTP code',
+                'phone_number': phone_number
+            }), 200
+        else:
+            # Create session (2FA disabled)
+            expires = datetime.now() + timedelta(days=7)
+            session_token = generate_session_token(phone_number, expires)
+            
+            stores().sessions.create(phone_number, session_token, expires,
+                                     client_ip(), client_user_agent())
+            
+            services().session_cache.put(session_token, phone_number, expires.timestamp())
+            record_login(phone_number, 'password')
+            
+            return jsonify({
+                'success': True,
+                'requires_2fa': False,
+                'session_token': session_token,
+                'message': 'Login successful'
+            }), 200
+    
+    except HasherBusy as e:
+        return service_busy(e)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@auth_bp.route('/verify-otp', methods=['POST'])
+@rate_limiter.limit(VERIFY_OTP_IP, VERIFY_OTP_PHONE, transaction=write_transaction)
+def verify_otp():
+    """Verify SMS OTP for 2FA login"""
+    try:
+        data = request.json
+        phone_number = data.get('phone_number', '').strip()
+        otp = data.get('otp', '')
+        
+        if not phone_number or not otp:
+            return jsonify({'success': False, 'error': 'Phone and OTP required'}), 400
+        
+        expires = datetime.now() + timedelta(days=7)
+        session_token = generate_session_token(phone_number, expires)
+        
+        # Joins the write transaction opened around the rate limit check:
+        # the attempt count, code check, OTP consume and session insert
+        # commit together, and concurrent requests with the same code
+        # serialize on the lock so only one can consume it.
+        with write_transaction():
+            # Consume this phone's codes only if the latest unexpired one matches
+            if not stores().otps.consume(phone_number, otp, datetime.now()):
+                return jsonify({'success': False, 'error': 'Invalid OTP'}), 401
+            
+            stores().sessions.create(phone_number, session_token, expires,
+                                     client_ip(), client_user_agent())
+            
+            # Reset rate limit (joins this transaction with the sqlite backend)
+            rate_limiter.reset(VERIFY_OTP_PHONE, request_phone())
+        
+        services().session_cache.put(session_token, phone_number, expires.timestamp())
+        record_login(phone_number, 'otp')
+        
+        return jsonify({
+            'success': True,
+            'session_token': session_token,
+            'message': '2FA verification successful'
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@auth_bp.route('/resend-otp', methods=['POST'])
+@rate_limiter.limit(RESEND_OTP_IP, RESEND_OTP_PHONE)
+def resend_otp():
+    """Resend OTP via SMS"""
+    try:
+        data = request.json
+        phone_number = data.get('phone_number', '').strip()
+        
+        if not phone_number:
+            return jsonify({'success': False, 'error': 'Phone required'}), 400
+        
+        # Generate new OTP
+        otp_code = ''.join(random.choices(string.digits, k=6))
+        now = datetime.now()
+        
+        # Replace any older OTP
+        stores().otps.issue(phone_number, otp_code, now + timedelta(minutes=10), now, replace=True)
+        
+        # Send SMS
+        sms_sent = send_sms(phone_number, otp_code)
+        
+        return jsonify({
+            'success': True,
+            'message': 'OTP resent to your phone' if sms_sent else 'Check console for OTP code'
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@auth_bp.route('/verify-session', methods=['POST'])
+@rate_limiter.limit(SESSION_IP)
+def verify_session():
+    """Verify if session token is valid"""
+    try:
+        data = request.json
+        session_token = data.get('session_token', '')
+        
+        if not session_token:
+            return jsonify({'success': False, 'error': 'Session token required'}), 400
+        
+        session = lookup_session(session_token)
+        
+        if not session:
+            return jsonify({'success': False, 'error': 'Invalid session'}), 401
+        
+        phone_number, expires_ts = session
+        if expires_ts < time.time():
+            return jsonify({'success': False, 'error': 'Session expired'}), 401
+        
+        return jsonify({
+            'success': True,
+            'phone_number': phone_number,
+            'message': 'Session valid'
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@auth_bp.route('/verify-sessions', methods=['POST'])
+@rate_limiter.limit(SESSION_BATCH_IP)
+def verify_sessions():
+    """Validate many session tokens at once (reverse proxies, gateways).
+
+    Returns one result per token, in request order. Tokens not resolved
+    in memory are looked up with a single query.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            tokens = batch_tokens(data, current_app.config['SESSION_BATCH_MAX_TOKENS'])
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        sessions = services().lookup_sessions(tokens)
+        
+        return jsonify(session_results(data['session_tokens'], sessions)), 200
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@auth_bp.route('/logout', methods=['POST'])
+@rate_limiter.limit(SESSION_IP)
+def logout():
+    """Logout user by invalidating session"""
+    try:
+        data = request.json
+        session_token = data.get('session_token', '')
+        
+        if not session_token:
+            return jsonify({'success': False, 'error': 'Session token required'}), 400
+        
+        stores().sessions.delete(session_token)
+        
+        services().session_cache.invalidate(session_token)
+        
+        # Signed tokens validate without the sessions table; revoke them too
+        signer = services().session_signer
+        if signer is not None and signer.is_signed(session_token):
+            claims = signer.verify(session_token)
+            if claims is not None:
+                services().revocations.revoke(claims.jti, claims.expires_ts)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Logout successful'
+        }), 200
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@auth_bp.route('/health', methods=['GET'])
+def health():
+    """Health check endpoint"""
+    return jsonify({'status': 'OK'}), 200
@@ -0,0 +1,204 @@
+"""
+DigiSken LMS - Bulk user import/export
+Streams users from CSV/JSONL, hashes passwords on the process pool and
+inserts them in batched transactions with resumable checkpoints; exports
+by iterating the cursor so memory stays flat on any table size
+"""
+
+import csv
+import json
+import os
+import time
+
+from app.validation import validate_password, validate_phone_number
+
+FORMATS = ('csv', 'jsonl')
+
+EXPORT_FIELDS = ('id', 'phone_number', 'two_fa_enabled', 'created_at', 'last_login')
+
+
+def detect_format(path, fmt=None):
+    """Explicit ``fmt``, else the file extension (.csv / .jsonl / .ndjson)"""
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return 'csv'
+    if ext in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    raise ValueError(f'Cannot tell the format of {path}; pass --format csv|jsonl')
+
+
+def read_records(stream, fmt):
+    """Yield (line_number, dict) from a CSV (with header) or JSONL stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, {'_error': f'Invalid JSON: {e}'}
+                continue
+            yield line_number, record if isinstance(record, dict) else {'_error': 'Not a JSON object'}
+
+
+def validate_record(record):
+    """Return (phone_number, password, password_hash, two_fa_enabled) or raise ValueError.
+
+    Records carry either a plaintext ``password`` (validated like
+    /api/register) or an existing bcrypt ``password_hash`` (e.g. from an
+    export with hashes), which is inserted as is.
+    """
+    if '_error' in record:
+        raise ValueError(record['_error'])
+    for field in ('phone_number', 'password', 'password_hash'):
+        if not isinstance(record.get(field) or '', str):
+            raise ValueError(f'{field} must be a string')
+    phone_number = (record.get('phone_number') or '').strip()
+    password = record.get('password') or ''
+    password_hash = record.get('password_hash') or ''
+    if not phone_number:
+        raise ValueError('Phone required')
+    if not validate_phone_number(phone_number):
+        raise ValueError('Invalid phone number format')
+    if password_hash:
+        if not password_hash.startswith('$2'):
+            raise ValueError('password_hash is not a bcrypt hash')
+    else:
+        if not password:
+            raise ValueError('Password required')
+        valid, msg = validate_password(password)
+        if not valid:
+            raise ValueError(msg)
+    two_fa = str(record.get('two_fa_enabled', '1')).strip().lower() not in ('0', 'false', 'no')
+    return phone_number, password, password_hash, int(two_fa)
+
+
+class Checkpoint:
+    """Progress of an import, saved atomically after every committed batch"""
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.state = {'source': self.source, 'records': 0, 'imported': 0,
+                      'existing': 0, 'rejected': 0}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get('source') != self.source:
+                raise ValueError(f"Checkpoint {path} belongs to {saved.get('source')}, not {self.source}")
+            self.state.update(saved)
+
+    @property
+    def records(self):
+        """Input records already handled (skipped on resume)"""
+        return self.state['records']
+
+    def advance(self, records, imported, existing, rejected):
+        self.state['records'] += records
+        self.state['imported'] += imported
+        self.state['existing'] += existing
+        self.state['rejected'] += rejected
+        if self.path:
+            tmp = f'{self.path}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self.state, f)
+            os.replace(tmp, self.path)
+
+
+def import_users(users, hasher, records, batch_size=1000, checkpoint=None,
+                 on_reject=None, on_batch=None):
+    """Import ``(line_number, record)`` pairs; returns the checkpoint state.
+
+    Per batch: validate, drop phone numbers that already exist (so a rerun
+    never pays for bcrypt twice), hash the remaining passwords on
+    ``hasher``'s process pool, then insert everything with one
+    ``users.create_many`` (a ``UserStore``) and save the checkpoint. Records before ``checkpoint.records`` are
+    skipped, which makes an interrupted import resumable.
+    """
+    skip = checkpoint.records if checkpoint else 0
+    batch = []
+
+    def flush():
+        valid, rejected = {}, 0
+        for line_number, record in batch:
+            try:
+                phone_number, password, password_hash, two_fa = validate_record(record)
+            except ValueError as e:
+                rejected += 1
+                if on_reject:
+                    on_reject(line_number, record, str(e))
+                continue
+            # Last occurrence of a phone number within the batch wins
+            valid[phone_number] = (password, password_hash, two_fa)
+
+        existing = users.existing(valid)
+        pending = {phone: row for phone, row in valid.items() if phone not in existing}
+
+        futures = {phone: hasher.hash_async(password)
+                   for phone, (password, password_hash, _) in pending.items() if not password_hash}
+        rows = [(phone, futures[phone].result() if phone in futures else password_hash, two_fa)
+                for phone, (_, password_hash, two_fa) in pending.items()]
+
+        imported = users.create_many(rows)
+        if checkpoint:
+            checkpoint.advance(len(batch), imported, len(batch) - rejected - imported, rejected)
+        if on_batch:
+            on_batch(len(batch), imported)
+        batch.clear()
+
+    for index, item in enumerate(records):
+        if index < skip:
+            continue
+        batch.append(item)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return checkpoint.state if checkpoint else None
+
+
+def export_users(users, stream, fmt, with_hashes=False):
+    """Write every user of a ``UserStore`` to ``stream`` as it is read;
+    returns the number of rows written"""
+    fields = EXPORT_FIELDS + (('password_hash',) if with_hashes else ())
+    count = 0
+    writer = None
+    for user in users.iter_all(fields):
+        if fmt == 'csv':
+            if writer is None:
+                writer = csv.DictWriter(stream, fieldnames=list(user))
+                writer.writeheader()
+            writer.writerow(user)
+        else:
+            stream.write(json.dumps(user, default=str) + '\n')
+        count += 1
+    return count
+
+
+class Progress:
+    """Throttled progress line for long imports"""
+
+    def __init__(self, log=print, every=2.0):
+        self.log = log
+        self.every = every
+        self.start = time.perf_counter()
+        self.last = 0.0
+        self.records = 0
+        self.imported = 0
+
+    def __call__(self, records, imported):
+        self.records += records
+        self.imported += imported
+        now = time.perf_counter()
+        if now - self.last >= self.every:
+            self.last = now
+            elapsed = now - self.start
+            self.log(f'{self.records} records, {self.imported} imported '
+                     f'({self.records / elapsed:.0f} records/s)')
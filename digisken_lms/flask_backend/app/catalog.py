@@ -0,0 +1,619 @@
+"""
+DigiSken LMS - Course catalog store
+SQLite-backed courses, lessons and enrollments for the LMS blueprint
+"""
+
+import re
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS courses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT NOT NULL DEFAULT '',
+        instructor TEXT NOT NULL DEFAULT '',
+        category TEXT NOT NULL DEFAULT 'General',
+        rating REAL NOT NULL DEFAULT 0,
+        duration TEXT NOT NULL DEFAULT '4 weeks',
+        price REAL NOT NULL DEFAULT 0,
+        thumbnail_emoji TEXT NOT NULL DEFAULT '📚',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_courses_category ON courses (category, id)',
+    'CREATE INDEX IF NOT EXISTS idx_courses_instructor ON courses (instructor, id)',
+    '''
+    CREATE TABLE IF NOT EXISTS lessons (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        course_id INTEGER NOT NULL REFERENCES courses (id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        content TEXT NOT NULL DEFAULT '',
+        content_type TEXT NOT NULL DEFAULT 'text',
+        video_url TEXT,
+        duration_minutes INTEGER NOT NULL DEFAULT 5,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (course_id, position)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS enrollments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        phone_number TEXT NOT NULL,
+        course_id INTEGER NOT NULL REFERENCES courses (id) ON DELETE CASCADE,
+        enrolled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (phone_number, course_id)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_enrollments_course ON enrollments (course_id)',
+    # Files of a lesson (video, PDFs, attachments); path is relative to MEDIA_ROOT
+    '''
+    CREATE TABLE IF NOT EXISTS lesson_media (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        lesson_id INTEGER NOT NULL REFERENCES lessons (id) ON DELETE CASCADE,
+        position INTEGER NOT NULL DEFAULT 0,
+        kind TEXT NOT NULL DEFAULT 'attachment',
+        title TEXT NOT NULL,
+        path TEXT NOT NULL,
+        content_type TEXT NOT NULL,
+        size_bytes INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_lesson_media_lesson ON lesson_media (lesson_id, position, id)',
+    # Learner progress, one row per (learner, lesson), written in batches by
+    # the progress queue. Times are epoch seconds. Not part of the catalog
+    # version: heartbeats must not invalidate cached catalog responses.
+    '''
+    CREATE TABLE IF NOT EXISTS lesson_progress (
+        phone_number TEXT NOT NULL,
+        lesson_id INTEGER NOT NULL REFERENCES lessons (id) ON DELETE CASCADE,
+        opened_at REAL NOT NULL,
+        position_seconds REAL,
+        position_at REAL,
+        completed_at REAL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (phone_number, lesson_id)
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_lesson_progress_lesson ON lesson_progress (lesson_id)',
+    # Idempotency keys of applied progress events, so offline replays are dropped
+    '''
+    CREATE TABLE IF NOT EXISTS progress_event_keys (
+        phone_number TEXT NOT NULL,
+        event_id TEXT NOT NULL,
+        received_at REAL NOT NULL,
+        PRIMARY KEY (phone_number, event_id)
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_progress_event_keys_received ON progress_event_keys (received_at)',
+    # Single-row counter bumped by triggers on every catalog write; it lets
+    # the API compute ETags (and answer 304) without reading any rows
+    '''
+    CREATE TABLE IF NOT EXISTS catalog_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    ''',
+    'INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 1)',
+    # Change feed for /sync: the latest change of each course, lesson and
+    # media row (deleted = tombstone). Rewriting a row's entry gives it a
+    # new, higher AUTOINCREMENT version, so 'version > cursor' finds
+    # exactly what a client has not seen yet.
+    '''
+    CREATE TABLE IF NOT EXISTS catalog_changes (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        entity TEXT NOT NULL,
+        entity_id INTEGER NOT NULL,
+        deleted INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (entity, entity_id)
+    )
+    ''',
+) + tuple(
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version
+    AFTER {event} ON {table}
+    BEGIN
+        UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+    END
+    '''
+    for table in ('courses', 'lessons', 'enrollments', 'lesson_media')
+    for event in ('INSERT', 'UPDATE', 'DELETE')
+)
+
+# Synced entity -> table
+SYNC_TABLES = {'course': 'courses', 'lesson': 'lessons', 'media': 'lesson_media'}
+
+# Rows of the change feed written by each table's triggers: (entity, id,
+# deleted). A course record counts its lessons and enrollments, so those
+# changes re-send the course; when a course delete cascades to them, the
+# course entry stays a tombstone whichever trigger runs last.
+COURSE_TOUCHED = 'NOT EXISTS (SELECT 1 FROM courses WHERE id = {}.course_id)'
+CHANGE_TRIGGERS = {
+    'courses': {
+        'INSERT': [('course', 'new.id', '0')],
+        'UPDATE': [('course', 'new.id', '0')],
+        'DELETE': [('course', 'old.id', '1')],
+    },
+    'lessons': {
+        'INSERT': [('lesson', 'new.id', '0'), ('course', 'new.course_id', '0')],
+        'UPDATE': [('lesson', 'new.id', '0')],
+        'DELETE': [('lesson', 'old.id', '1'), ('course', 'old.course_id', COURSE_TOUCHED.format('old'))],
+    },
+    'lesson_media': {
+        'INSERT': [('media', 'new.id', '0')],
+        'UPDATE': [('media', 'new.id', '0')],
+        'DELETE': [('media', 'old.id', '1')],
+    },
+    'enrollments': {
+        'INSERT': [('course', 'new.course_id', '0')],
+        'DELETE': [('course', 'old.course_id', COURSE_TOUCHED.format('old'))],
+    },
+}
+# A lesson moved between courses changes both courses' lesson lists
+LESSON_MOVE_CHANGES = [('course', 'old.course_id', COURSE_TOUCHED.format('old')),
+                       ('course', 'new.course_id', '0')]
+
+
+def change_statements(changes):
+    # Delete + insert rather than INSERT OR REPLACE: an outer
+    # 'INSERT OR IGNORE' would override the trigger's conflict clause
+    return ' '.join(
+        f"DELETE FROM catalog_changes WHERE entity = '{entity}' AND entity_id = {row_id}; "
+        f"INSERT INTO catalog_changes (entity, entity_id, deleted) VALUES ('{entity}', {row_id}, {deleted});"
+        for entity, row_id, deleted in changes)
+
+
+def change_triggers():
+    for table, events in CHANGE_TRIGGERS.items():
+        for event, changes in events.items():
+            yield (f'CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_changes '
+                   f'AFTER {event} ON {table} BEGIN {change_statements(changes)} END')
+    yield ('CREATE TRIGGER IF NOT EXISTS trg_lessons_move_changes '
+           'AFTER UPDATE OF course_id ON lessons WHEN old.course_id IS NOT new.course_id '
+           f'BEGIN {change_statements(LESSON_MOVE_CHANGES)} END')
+
+
+# Full-text search: FTS5 index -> (indexed table, columns). The indexes are
+# external-content tables kept in sync by triggers, so every catalog write
+# updates them incrementally; prefix indexes make 'pyth*' queries cheap.
+SEARCH_INDEXES = {
+    'courses_fts': ('courses', ('title', 'description', 'instructor')),
+    'lessons_fts': ('lessons', ('title', 'content')),
+}
+
+
+# Search result type -> (index, table, bm25 column weights); titles count most
+SEARCH_SOURCES = {
+    'course': ('courses_fts', 'courses', '10.0, 2.0, 5.0'),
+    'lesson': ('lessons_fts', 'lessons', '10.0, 1.0'),
+}
+
+
+def search_schema(index, table, columns):
+    listed = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    delete = f"INSERT INTO {index} ({index}, rowid, {listed}) VALUES ('delete', old.id, {old});"
+    insert = f'INSERT INTO {index} (rowid, {listed}) VALUES (new.id, {new});'
+    return (
+        f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+            {listed}, content='{table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        ''',
+        f'CREATE TRIGGER IF NOT EXISTS trg_{index}_insert AFTER INSERT ON {table} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS trg_{index}_delete AFTER DELETE ON {table} BEGIN {delete} END',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_{index}_update AFTER UPDATE OF {listed} ON {table}
+        BEGIN {delete} {insert} END''',
+    )
+
+
+# Public field name -> SQL expression, in response order
+COURSE_FIELDS = {
+    'id': 'c.id',
+    'title': 'c.title',
+    'description': 'c.description',
+    'instructor': 'c.instructor',
+    'lessons': '(SELECT COUNT(*) FROM lessons l WHERE l.course_id = c.id)',
+    'category': 'c.category',
+    'rating': 'c.rating',
+    'students': '(SELECT COUNT(*) FROM enrollments e WHERE e.course_id = c.id)',
+    'duration': 'c.duration',
+    'price': 'c.price',
+    'thumbnailEmoji': 'c.thumbnail_emoji',
+}
+
+LESSON_FIELDS = {
+    'id': 'id',
+    'courseId': 'course_id',
+    'position': 'position',
+    'title': 'title',
+    'content': 'content',
+    'contentType': 'content_type',
+    'videoUrl': 'video_url',
+    'durationMinutes': 'duration_minutes',
+}
+
+MEDIA_FIELDS = {
+    'id': 'id',
+    'lessonId': 'lesson_id',
+    'kind': 'kind',
+    'title': 'title',
+    'contentType': 'content_type',
+    'sizeBytes': 'size_bytes',
+}
+
+# Synced entity -> (response key, FROM clause, fields) for /sync
+SYNC_RECORDS = {
+    'course': ('courses', 'courses c', COURSE_FIELDS),
+    'lesson': ('lessons', 'lessons', LESSON_FIELDS),
+    'media': ('media', 'lesson_media', MEDIA_FIELDS),
+}
+
+PROGRESS_FIELDS = {
+    'lessonId': 'p.lesson_id',
+    'courseId': 'l.course_id',
+    'openedAt': 'p.opened_at',
+    'positionSeconds': 'p.position_seconds',
+    'completedAt': 'p.completed_at',
+    'updatedAt': 'p.updated_at',
+}
+
+# Merge a batch's state for (learner, lesson) into the stored row: the
+# earliest open and completion win, and the position with the latest
+# client timestamp. Applying the same state twice changes nothing.
+PROGRESS_UPSERT = '''
+    INSERT INTO lesson_progress (phone_number, lesson_id, opened_at, position_seconds,
+                                 position_at, completed_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (phone_number, lesson_id) DO UPDATE SET
+        opened_at = min(opened_at, excluded.opened_at),
+        position_seconds = CASE WHEN excluded.position_at > coalesce(position_at, -1)
+                                THEN excluded.position_seconds ELSE position_seconds END,
+        position_at = CASE WHEN excluded.position_at > coalesce(position_at, -1)
+                           THEN excluded.position_at ELSE position_at END,
+        completed_at = coalesce(min(completed_at, excluded.completed_at), completed_at, excluded.completed_at),
+        updated_at = max(updated_at, excluded.updated_at)
+'''
+
+SEED_COURSES = (
+    {
+        'title': 'Introduction to Python',
+        'description': 'Learn Python programming basics',
+        'instructor': 'John Doe',
+        'category': 'Computer Science',
+        'lessons': (
+            ('Getting Started', 'Installing Python and running your first script', 'text', None),
+            ('Variables and Types', 'Numbers, strings and lists', 'video', 'https://example.com/video.mp4'),
+        ),
+    },
+    {
+        'title': 'Web Development with Flask',
+        'description': 'Build web applications using Flask',
+        'instructor': 'Jane Smith',
+        'category': 'Web Development',
+        'lessons': (
+            ('Hello Flask', 'Your first Flask route', 'text', None),
+            ('Templates', 'Rendering HTML with Jinja', 'video', 'https://example.com/video.mp4'),
+        ),
+    },
+)
+
+
+class InvalidField(ValueError):
+    """Raised when ``fields`` names a field that does not exist"""
+
+
+def match_query(text):
+    """FTS5 query for user input: every word must match, as a prefix.
+
+    Words are quoted, so FTS5 operators and punctuation in the input are
+    searched for as plain text instead of being interpreted.
+    """
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def select_fields(fields, available):
+    """Validate a ``fields`` selection; None means every field"""
+    if not fields:
+        return list(available)
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise InvalidField(f"Unknown field(s): {', '.join(unknown)}")
+    # Always include id so clients can page and cross-reference
+    return ['id'] + [name for name in available if name in fields and name != 'id']
+
+
+def table_exists(conn, name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def init_catalog(conn, seed=True):
+    """Create catalog tables (idempotent) and seed an empty catalog"""
+    had_changes = table_exists(conn, 'catalog_changes')
+    for statement in SCHEMA:
+        conn.execute(statement)
+    for statement in change_triggers():
+        conn.execute(statement)
+    if not had_changes:
+        # Catalogs created before the change feed: every row is a change
+        for entity, table in SYNC_TABLES.items():
+            conn.execute(f"INSERT INTO catalog_changes (entity, entity_id) SELECT '{entity}', id FROM {table}")
+    for index, (table, columns) in SEARCH_INDEXES.items():
+        exists = table_exists(conn, index)
+        for statement in search_schema(index, table, columns):
+            conn.execute(statement)
+        if not exists:
+            # Catalogs created before search: index the existing rows once
+            conn.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+    if seed and conn.execute('SELECT COUNT(*) FROM courses').fetchone()[0] == 0:
+        for course in SEED_COURSES:
+            cursor = conn.execute('''
+                INSERT INTO courses (title, description, instructor, category)
+                VALUES (?, ?, ?, ?)
+            ''', (course['title'], course['description'], course['instructor'], course['category']))
+            conn.executemany('''
+                INSERT INTO lessons (course_id, position, title, content, content_type, video_url)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(cursor.lastrowid, position, *lesson)
+                  for position, lesson in enumerate(course['lessons'], start=1)])
+    conn.commit()
+
+
+class CatalogStore:
+    """Read/write access to the catalog over one connection"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def version(self):
+        """Catalog change counter (changes on every write)"""
+        return self.conn.execute('SELECT version FROM catalog_version WHERE id = 1').fetchone()[0]
+
+    def list_courses(self, limit, after=None, category=None, instructor=None, fields=None):
+        """Keyset-paginated courses ordered by id.
+
+        Returns (courses, next_cursor); next_cursor is None on the last page.
+        """
+        names = select_fields(fields, COURSE_FIELDS)
+        where, params = [], []
+        if after is not None:
+            where.append('c.id > ?')
+            params.append(after)
+        if category:
+            where.append('c.category = ?')
+            params.append(category)
+        if instructor:
+            where.append('c.instructor = ?')
+            params.append(instructor)
+        sql = 'SELECT ' + ', '.join(f'{COURSE_FIELDS[name]} AS "{name}"' for name in names)
+        sql += ' FROM courses c'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY c.id LIMIT ?'
+        params.append(limit + 1)
+
+        rows = [dict(row) for row in self.conn.execute(sql, params)]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1]['id']
+        return rows, next_cursor
+
+    def get_course(self, course_id, fields=None):
+        names = select_fields(fields, COURSE_FIELDS)
+        row = self.conn.execute(
+            'SELECT ' + ', '.join(f'{COURSE_FIELDS[name]} AS "{name}"' for name in names)
+            + ' FROM courses c WHERE c.id = ?', (course_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def course_exists(self, course_id):
+        return self.conn.execute('SELECT 1 FROM courses WHERE id = ?', (course_id,)).fetchone() is not None
+
+    def list_lessons(self, course_id, limit, after=None, fields=None):
+        """Keyset-paginated lessons of a course ordered by position.
+
+        The cursor is the position of the last lesson returned.
+        """
+        names = select_fields(fields, LESSON_FIELDS)
+        select = ', '.join(f'{LESSON_FIELDS[name]} AS "{name}"' for name in names)
+        rows = [dict(row) for row in self.conn.execute(
+            f'SELECT {select}, position AS _cursor FROM lessons '
+            'WHERE course_id = ? AND position > ? ORDER BY position LIMIT ?',
+            (course_id, after if after is not None else -1, limit + 1),
+        )]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1]['_cursor']
+        for row in rows:
+            del row['_cursor']
+        return rows, next_cursor
+
+    def get_lesson(self, lesson_id, fields=None):
+        names = select_fields(fields, LESSON_FIELDS)
+        row = self.conn.execute(
+            'SELECT ' + ', '.join(f'{LESSON_FIELDS[name]} AS "{name}"' for name in names)
+            + ' FROM lessons WHERE id = ?', (lesson_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def list_media(self, lesson_id):
+        """Media files of a lesson, in display order"""
+        select = ', '.join(f'{sql} AS "{name}"' for name, sql in MEDIA_FIELDS.items())
+        return [dict(row) for row in self.conn.execute(
+            f'SELECT {select} FROM lesson_media WHERE lesson_id = ? ORDER BY position, id',
+            (lesson_id,),
+        )]
+
+    def get_media(self, media_id):
+        """A media row with its stored ``path``, or None"""
+        select = ', '.join(f'{sql} AS "{name}"' for name, sql in MEDIA_FIELDS.items())
+        row = self.conn.execute(
+            f'SELECT {select}, path FROM lesson_media WHERE id = ?', (media_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def add_media(self, lesson_id, kind, title, path, content_type, size_bytes, position=0):
+        """Register a file already stored under MEDIA_ROOT; returns its id"""
+        cursor = self.conn.execute('''
+            INSERT INTO lesson_media (lesson_id, position, kind, title, path, content_type, size_bytes)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (lesson_id, position, kind, title, path, content_type, size_bytes))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def search(self, text, limit, offset=0, kinds=('course', 'lesson')):
+        """Courses and lessons matching ``text``, best first (bm25, titles
+        weighted highest). Returns (results, next_offset); next_offset is
+        None on the last page.
+
+        Each index returns only its best ``offset + limit + 1`` matches
+        (FTS5 keeps a bounded sort and builds snippets for those rows
+        only). bm25 scores of different indexes are not comparable (each
+        has its own document statistics and column weights), so a row's
+        score is taken relative to its index's best match: 1.0 for the
+        top course and the top lesson alike, courses first on ties. The
+        page's rows are then joined to their tables in one query each.
+        """
+        query = match_query(text)
+        if not query:
+            return [], None
+        depth = offset + limit + 1
+        matches = []
+        for kind, (index, _, weights) in SEARCH_SOURCES.items():
+            if kind in kinds:
+                ranked = self.conn.execute(
+                    f"SELECT rowid, bm25({index}, {weights}) AS score, "
+                    f"snippet({index}, 1, '<mark>', '</mark>', '…', 16) FROM {index} "
+                    f'WHERE {index} MATCH ? ORDER BY score LIMIT ?', (query, depth)).fetchall()
+                if ranked:
+                    # bm25 is negative, lower is better; FTS5 keeps it below zero
+                    best = ranked[0][1]
+                    matches.extend((score / best, kind, rowid, snippet) for rowid, score, snippet in ranked)
+        matches.sort(key=lambda match: (-match[0], match[1], match[2]))
+        page = matches[offset:offset + limit]
+        next_offset = offset + limit if len(matches) > offset + limit else None
+
+        rows = {}
+        for kind, (_, table, _) in SEARCH_SOURCES.items():
+            ids = [rowid for _, match_kind, rowid, _ in page if match_kind == kind]
+            if ids:
+                course_id = 'id' if table == 'courses' else 'course_id'
+                for row in self.conn.execute(
+                        f'SELECT id, {course_id}, title FROM {table} '
+                        f"WHERE id IN ({','.join('?' * len(ids))})", ids):
+                    rows[kind, row[0]] = row
+        results = []
+        for score, kind, rowid, snippet in page:
+            row = rows.get((kind, rowid))
+            if row is not None:
+                results.append({'type': kind, 'id': rowid, 'courseId': row[1], 'title': row[2],
+                                'snippet': snippet, 'score': round(score, 4)})
+        return results, next_offset
+
+    def changes(self, since, limit):
+        """Catalog records changed after the change-feed cursor ``since``.
+
+        Returns (changes, cursor, more): ``changes`` holds the current
+        'courses', 'lessons' and 'media' records plus the ids 'deleted'
+        since, for at most ``limit`` changes; ``cursor`` is the version to
+        pass next time and ``more`` tells whether changes remain. A cursor
+        from beyond the feed (a recreated database) starts over from 0,
+        flagged by ``changes['reset']``.
+        """
+        latest = self.conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'catalog_changes'").fetchone()
+        reset = since > (latest[0] if latest else 0)
+        if reset:
+            since = 0
+        rows = self.conn.execute(
+            'SELECT version, entity, entity_id, deleted FROM catalog_changes '
+            'WHERE version > ? ORDER BY version LIMIT ?', (since, limit + 1)).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+
+        changes = {key: [] for key, _, _ in SYNC_RECORDS.values()}
+        changes['deleted'] = {key: [] for key, _, _ in SYNC_RECORDS.values()}
+        changes['reset'] = reset
+        for entity, (key, source, fields) in SYNC_RECORDS.items():
+            changed = sorted(row[2] for row in rows if row[1] == entity and not row[3])
+            changes['deleted'][key] = sorted(row[2] for row in rows if row[1] == entity and row[3])
+            select = ', '.join(f'{sql} AS "{name}"' for name, sql in fields.items())
+            for start in range(0, len(changed), 500):
+                chunk = changed[start:start + 500]
+                changes[key].extend(dict(row) for row in self.conn.execute(
+                    f"SELECT {select} FROM {source} WHERE {fields['id']} IN ({','.join('?' * len(chunk))}) "
+                    f"ORDER BY {fields['id']}", chunk))
+        return changes, rows[-1][0] if rows else since, more
+
+    def record_progress(self, events, now):
+        """Apply a batch of progress events in the current transaction.
+
+        ``events`` are (phone_number, event_id, lesson_id, kind, position,
+        at) tuples. An event whose (phone_number, event_id) was applied
+        before, or whose lesson no longer exists, is dropped; the rest are
+        folded into one lesson_progress upsert per (learner, lesson).
+        Returns the number of events applied.
+        """
+        lesson_ids = list({event[2] for event in events})
+        existing = set()
+        for start in range(0, len(lesson_ids), 500):
+            chunk = lesson_ids[start:start + 500]
+            existing.update(row[0] for row in self.conn.execute(
+                f"SELECT id FROM lessons WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+
+        # (phone_number, lesson_id) -> [opened_at, position, position_at, completed_at, updated_at]
+        merged = {}
+        applied = 0
+        for phone_number, event_id, lesson_id, kind, position, at in events:
+            if lesson_id not in existing or self.conn.execute(
+                    'INSERT OR IGNORE INTO progress_event_keys (phone_number, event_id, received_at) '
+                    'VALUES (?, ?, ?)', (phone_number, event_id, now)).rowcount == 0:
+                continue
+            applied += 1
+            state = merged.get((phone_number, lesson_id))
+            if state is None:
+                state = merged[phone_number, lesson_id] = [at, None, None, None, at]
+            state[0] = min(state[0], at)
+            state[4] = max(state[4], at)
+            if position is not None and (state[2] is None or at > state[2]):
+                state[1], state[2] = position, at
+            if kind == 'completed' and (state[3] is None or at < state[3]):
+                state[3] = at
+        self.conn.executemany(PROGRESS_UPSERT, [(phone_number, lesson_id, *state)
+                                                for (phone_number, lesson_id), state in merged.items()])
+        return applied
+
+    def prune_progress_keys(self, before, limit=1000):
+        """Forget up to ``limit`` idempotency keys received before ``before``"""
+        return self.conn.execute('''
+            DELETE FROM progress_event_keys WHERE (phone_number, event_id) IN (
+                SELECT phone_number, event_id FROM progress_event_keys WHERE received_at < ? LIMIT ?
+            )
+        ''', (before, limit)).rowcount
+
+    def list_progress(self, phone_number, course_id=None):
+        """A learner's progress rows, by lesson id"""
+        select = ', '.join(f'{sql} AS "{name}"' for name, sql in PROGRESS_FIELDS.items())
+        sql = (f'SELECT {select} FROM lesson_progress p JOIN lessons l ON l.id = p.lesson_id '
+               'WHERE p.phone_number = ?')
+        params = [phone_number]
+        if course_id is not None:
+            sql += ' AND l.course_id = ?'
+            params.append(course_id)
+        return [dict(row) for row in self.conn.execute(sql + ' ORDER BY p.lesson_id', params)]
+
+    def enroll(self, phone_number, course_id):
+        """Enroll a learner (idempotent)"""
+        self.conn.execute('''
+            INSERT OR IGNORE INTO enrollments (phone_number, course_id) VALUES (?, ?)
+        ''', (phone_number, course_id))
+        self.conn.commit()
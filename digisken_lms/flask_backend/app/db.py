@@ -0,0 +1,156 @@
+"""
+DigiSken LMS - SQLite connection layer
+Pooled connections in WAL mode shared by every endpoint of a worker process
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free in time"""
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections tuned for concurrent access.
+
+    Connections are opened lazily, configured once (WAL journaling,
+    synchronous=NORMAL, busy timeout, statement cache, incremental
+    auto-vacuum for new files) and reused for the lifetime of the worker.
+    The pool is re-entrant per thread: nested ``connection()`` blocks
+    share the outer connection and only the outermost block commits or
+    rolls back.
+    """
+
+    def __init__(self, database, size=8, busy_timeout_ms=5000,
+                 statement_cache=128, acquire_timeout=10.0, factory=sqlite3.Connection):
+        self.database = database
+        self.size = size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.statement_cache = statement_cache
+        self.acquire_timeout = acquire_timeout
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._reset()
+
+    def _reset(self):
+        """(Re)create pool state for the current process"""
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._opened = 0
+
+    def _open(self):
+        """Open and configure a new connection"""
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.busy_timeout_ms / 1000.0,
+            check_same_thread=False,
+            cached_statements=self.statement_cache,
+            factory=self.factory,
+        )
+        conn.row_factory = sqlite3.Row
+        # Only takes effect on a brand-new file; must precede the WAL switch
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA foreign_keys=ON')
+        return conn
+
+    def _acquire(self):
+        """Take an idle connection, opening a new one while under the limit"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked worker: never share the parent's connections
+                self._reset()
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            if self._opened < self.size:
+                self._opened += 1
+                opening = True
+            else:
+                opening = False
+
+        if opening:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise PoolTimeout(f'No database connection free after {self.acquire_timeout}s')
+
+    def _release(self, conn):
+        """Return a connection to the pool"""
+        if self._pid != os.getpid():
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+    @contextmanager
+    def connection(self, immediate=False):
+        """Borrow a connection; commits on success, rolls back on error.
+
+        ``immediate=True`` opens the transaction with BEGIN IMMEDIATE so
+        the write lock is taken up front and a read-then-write sequence
+        cannot fail midway on a lock upgrade. Nested blocks join the
+        outer transaction as is.
+        """
+        held = getattr(self._local, 'held', None)
+        if held is not None:
+            held[1] += 1
+            try:
+                yield held[0]
+            finally:
+                held[1] -= 1
+            return
+
+        conn = self._acquire()
+        self._local.held = [conn, 1]
+        try:
+            if immediate and not conn.in_transaction:
+                conn.execute('BEGIN IMMEDIATE')
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.held = None
+            self._release(conn)
+
+    def stats(self):
+        """Current pool utilization"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'opened': self._opened,
+                'idle': self._idle.qsize(),
+                'in_use': self._opened - self._idle.qsize(),
+            }
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._opened -= 1
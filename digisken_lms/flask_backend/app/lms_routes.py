@@ -1,50 +1,341 @@
-from flask import Blueprint, jsonify, request
+import hashlib
+from contextlib import ExitStack
+
+from flask import Blueprint, current_app, g, jsonify, request, url_for
+
+from app.auth_routes import require_session
+from app.catalog import CatalogStore, InvalidField
+from app.media import MediaNotFound, send_media
+from app.progress import InvalidEvent, parse_events
+from app.responses import response_cache
 
 lms_bp = Blueprint('lms', __name__, url_prefix='/api/lms')
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Catalog data changes rarely and every response carries an ETag, so
+# clients reuse it for max-age and then revalidate cheaply (304).
+# Course lists include enrollment counts and are kept fresher.
+CACHE_CONTROL = {
+    'lms.get_courses': 'public, max-age=60, stale-while-revalidate=300',
+    'lms.get_course_detail': 'public, max-age=300, stale-while-revalidate=3600',
+    'lms.get_course_lessons': 'public, max-age=300, stale-while-revalidate=3600',
+    'lms.get_lesson': 'public, max-age=3600, stale-while-revalidate=86400',
+    'lms.get_lesson_media': 'public, max-age=300, stale-while-revalidate=3600',
+    'lms.search': 'public, max-age=60, stale-while-revalidate=300',
+    # Deltas are tiny and a 304 is cheaper still: always revalidate
+    'lms.sync': 'public, no-cache',
+    # Per learner: always revalidated
+    'lms.get_progress': 'private, no-cache',
+}
+
+SEARCH_TYPES = {'course': ('course',), 'lesson': ('lesson',), 'all': ('course', 'lesson')}
+MAX_QUERY_LENGTH = 200
+# Deepest search offset served: each page re-ranks offset + limit rows per index
+MAX_SEARCH_OFFSET = 1000
+
+DEFAULT_SYNC_CHANGES = 1000
+MAX_SYNC_CHANGES = 5000
+
+def get_catalog():
+    """Catalog store bound to a pooled connection held for this request"""
+    if 'catalog' not in g:
+        g.catalog_stack = ExitStack()
+        conn = g.catalog_stack.enter_context(current_app.extensions['catalog_pool'].connection())
+        g.catalog = CatalogStore(conn)
+    return g.catalog
+
+@lms_bp.after_request
+def set_cache_control(response):
+    if response.status_code in (200, 304) and request.endpoint in CACHE_CONTROL:
+        response.headers.setdefault('Cache-Control', CACHE_CONTROL[request.endpoint])
+    return response
+
+@lms_bp.teardown_app_request
+def release_catalog(exc):
+    g.pop('catalog', None)
+    stack = g.pop('catalog_stack', None)
+    if stack is not None:
+        stack.close()
+
+def bad_request(message):
+    return jsonify({'success': False, 'error': message}), 400
+
+def not_found(message):
+    return jsonify({'success': False, 'error': message}), 404
+
+def page_args():
+    """Parse ?limit=&after=&fields= ; raises ValueError on bad input"""
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit must be a positive integer')
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    after = request.args.get('after')
+    if after is not None:
+        try:
+            after = int(after)
+        except ValueError:
+            raise ValueError('after must be an integer cursor')
+    fields = request.args.get('fields')
+    fields = [name.strip() for name in fields.split(',') if name.strip()] if fields else None
+    return min(limit, MAX_PAGE_SIZE), after, fields
+
+def catalog_etag():
+    """Strong ETag from the catalog version and the exact request URL"""
+    digest = hashlib.sha1(request.full_path.encode('utf-8')).hexdigest()[:16]
+    return f'v{get_catalog().version()}-{digest}'
+
+def cached_response(etag):
+    """304 response if the client already has this representation, else a
+    cached copy of the full response, else None.
+
+    ETags compare weakly: a compressed copy carries W/"<etag>".
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    return response_cache().get(etag)
+
+def with_etag(response, etag, next_url=None):
+    """Tag a successful response and keep it for identical requests"""
+    response.set_etag(etag)
+    if next_url:
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response_cache().put(etag, response)
+
 @lms_bp.route('/courses', methods=['GET'])
 def get_courses():
-    courses = [
-        {
-            "id": 1,
-            "title": "Introduction to Python",
-            "description": "Learn Python programming basics",
-            "instructor": "John Doe",
-            "lessons": 10
-        },
-        {
-            "id": 2,
-            "title": "Web Development with Flask",
-            "description": "Build web applications using Flask",
-            "instructor": "Jane Smith",
-            "lessons": 8
-        }
-    ]
-    return jsonify(courses)
+    try:
+        limit, after, fields = page_args()
+    except ValueError as e:
+        return bad_request(str(e))
+
+    etag = catalog_etag()
+    cached = cached_response(etag)
+    if cached:
+        return cached
+
+    try:
+        courses, next_cursor = get_catalog().list_courses(
+            limit,
+            after=after,
+            category=request.args.get('category'),
+            instructor=request.args.get('instructor'),
+            fields=fields,
+        )
+    except InvalidField as e:
+        return bad_request(str(e))
+
+    next_url = None
+    if next_cursor is not None:
+        args = request.args.to_dict()
+        args['after'] = next_cursor
+        next_url = url_for('lms.get_courses', **args)
+    response = jsonify(courses)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return with_etag(response, etag, next_url)
 
 @lms_bp.route('/courses/<int:course_id>', methods=['GET'])
 def get_course_detail(course_id):
-    course = {
-        "id": course_id,
-        "title": "Sample Course",
-        "description": "Course description",
-        "instructor": "Instructor Name",
-        "lessons": [
-            {
-                "id": 1,
-                "title": "Lesson 1",
-                "content": "Lesson content here"
-            }
-        ]
-    }
-    return jsonify(course)
+    try:
+        _, _, fields = page_args()
+    except ValueError as e:
+        return bad_request(str(e))
+
+    etag = catalog_etag()
+    cached = cached_response(etag)
+    if cached:
+        return cached
+
+    try:
+        course = get_catalog().get_course(course_id, fields=fields)
+    except InvalidField as e:
+        return bad_request(str(e))
+    if course is None:
+        return not_found('Course not found')
+    return with_etag(jsonify(course), etag)
+
+@lms_bp.route('/courses/<int:course_id>/lessons', methods=['GET'])
+def get_course_lessons(course_id):
+    try:
+        limit, after, fields = page_args()
+    except ValueError as e:
+        return bad_request(str(e))
+
+    etag = catalog_etag()
+    cached = cached_response(etag)
+    if cached:
+        return cached
+
+    catalog = get_catalog()
+    if not catalog.course_exists(course_id):
+        return not_found('Course not found')
+    try:
+        lessons, next_cursor = catalog.list_lessons(course_id, limit, after=after, fields=fields)
+    except InvalidField as e:
+        return bad_request(str(e))
+
+    next_url = None
+    if next_cursor is not None:
+        args = request.args.to_dict()
+        args['after'] = next_cursor
+        next_url = url_for('lms.get_course_lessons', course_id=course_id, **args)
+    response = jsonify(lessons)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return with_etag(response, etag, next_url)
 
 @lms_bp.route('/lessons/<int:lesson_id>', methods=['GET'])
 def get_lesson(lesson_id):
-    lesson = {
-        "id": lesson_id,
-        "title": "Lesson Title",
-        "content": "Lesson content",
-        "videoUrl": "https://example.com/video.mp4"
-    }
-    return jsonify(lesson)
+    try:
+        _, _, fields = page_args()
+    except ValueError as e:
+        return bad_request(str(e))
+
+    etag = catalog_etag()
+    cached = cached_response(etag)
+    if cached:
+        return cached
+
+    try:
+        lesson = get_catalog().get_lesson(lesson_id, fields=fields)
+    except InvalidField as e:
+        return bad_request(str(e))
+    if lesson is None:
+        return not_found('Lesson not found')
+    return with_etag(jsonify(lesson), etag)
+
+@lms_bp.route('/search', methods=['GET'])
+def search():
+    """Ranked full-text search over courses and lessons.
+
+    ?q= words are matched as prefixes (all must match); ?type=course|lesson|all.
+    Pages follow X-Next-Cursor / the Link header like the other lists.
+    """
+    try:
+        limit, after, _ = page_args()
+    except ValueError as e:
+        return bad_request(str(e))
+    if after is not None and after < 0:
+        return bad_request('after must be an integer cursor')
+    if after is not None and after > MAX_SEARCH_OFFSET:
+        return bad_request(f'Search results end at {MAX_SEARCH_OFFSET}; refine the query')
+    text = request.args.get('q', '').strip()
+    if not text:
+        return bad_request('q is required')
+    if len(text) > MAX_QUERY_LENGTH:
+        return bad_request(f'q must be at most {MAX_QUERY_LENGTH} characters')
+    kinds = SEARCH_TYPES.get(request.args.get('type', 'all'))
+    if kinds is None:
+        return bad_request('type must be one of: ' + ', '.join(SEARCH_TYPES))
+
+    etag = catalog_etag()
+    cached = cached_response(etag)
+    if cached:
+        return cached
+
+    results, next_cursor = get_catalog().search(text, limit, offset=after or 0, kinds=kinds)
+    if next_cursor is not None and next_cursor > MAX_SEARCH_OFFSET:
+        next_cursor = None
+
+    next_url = None
+    if next_cursor is not None:
+        args = request.args.to_dict()
+        args['after'] = next_cursor
+        next_url = url_for('lms.search', **args)
+    response = jsonify(results)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return with_etag(response, etag, next_url)
+
+@lms_bp.route('/sync', methods=['GET'])
+def sync():
+    """Catalog changes since ?since=<cursor> (0 or omitted: everything).
+
+    Returns changed courses, lessons and media records and the ids deleted,
+    oldest change first, with the cursor for the next call; when "more" is
+    true the client calls again right away with that cursor.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', DEFAULT_SYNC_CHANGES))
+    except ValueError:
+        return bad_request('since and limit must be integers')
+    if since < 0 or limit < 1:
+        return bad_request('since must be >= 0 and limit positive')
+
+    etag = catalog_etag()
+    cached = cached_response(etag)
+    if cached:
+        return cached
+
+    changes, cursor, more = get_catalog().changes(since, min(limit, MAX_SYNC_CHANGES))
+    for item in changes['media']:
+        item['url'] = url_for('lms.get_media', media_id=item['id'])
+    return with_etag(jsonify({'cursor': cursor, 'more': more, **changes}), etag)
+
+@lms_bp.route('/lessons/<int:lesson_id>/media', methods=['GET'])
+def get_lesson_media(lesson_id):
+    etag = catalog_etag()
+    cached = cached_response(etag)
+    if cached:
+        return cached
+
+    catalog = get_catalog()
+    if catalog.get_lesson(lesson_id, fields=['id']) is None:
+        return not_found('Lesson not found')
+    media = catalog.list_media(lesson_id)
+    for item in media:
+        item['url'] = url_for('lms.get_media', media_id=item['id'])
+    return with_etag(jsonify(media), etag)
+
+@lms_bp.route('/media/<int:media_id>', methods=['GET'])
+def get_media(media_id):
+    """A lesson file, with Range and conditional GET support"""
+    media = get_catalog().get_media(media_id)
+    if media is None:
+        return not_found('Media not found')
+    try:
+        return send_media(current_app.config['MEDIA_ROOT'], media, current_app.config['MEDIA_MAX_AGE'])
+    except MediaNotFound:
+        return not_found('Media file not found')
+
+@lms_bp.route('/progress', methods=['POST'])
+@require_session
+def record_progress():
+    """Queue a batch of the learner's progress events (202).
+
+    Events are written with other requests' events in the next flush;
+    ids already applied are dropped, so offline replays are safe.
+    """
+    try:
+        events = parse_events(g.phone_number, request.get_json(silent=True),
+                              current_app.config['PROGRESS_BATCH_MAX_EVENTS'])
+    except InvalidEvent as e:
+        return bad_request(str(e))
+    if not current_app.extensions['progress'].append(events):
+        response = jsonify({'success': False, 'error': 'Too many pending progress events, retry later'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    return jsonify({'success': True, 'accepted': len(events)}), 202
+
+@lms_bp.route('/progress', methods=['GET'])
+@require_session
+def get_progress():
+    """The learner's progress, optionally for one ?courseId=.
+
+    Reads what has been flushed, so a just-posted event can take up to
+    PROGRESS_FLUSH_INTERVAL_MS to appear.
+    """
+    course_id = request.args.get('courseId')
+    if course_id is not None:
+        try:
+            course_id = int(course_id)
+        except ValueError:
+            return bad_request('courseId must be an integer')
+    return jsonify(get_catalog().list_progress(g.phone_number, course_id))
@@ -0,0 +1,174 @@
+"""
+DigiSken LMS - Database maintenance
+Deletes expired sessions/OTPs/SMS in bounded batches and keeps the file compact
+"""
+
+import os
+import secrets
+import threading
+import time
+from datetime import datetime
+
+# Rows removed per transaction; keeps each write lock short
+DEFAULT_BATCH_SIZE = 500
+
+# Pages returned to the OS per sweep (incremental auto-vacuum only)
+DEFAULT_VACUUM_PAGES = 1000
+
+SWEEPS = (
+    ('sessions', '''
+        DELETE FROM sessions WHERE id IN (
+            SELECT id FROM sessions WHERE expires_at < :now LIMIT :limit
+        )
+    '''),
+    # Expired codes can never verify; lockouts live in rate_limits now
+    ('otp_attempts', '''
+        DELETE FROM otp_attempts WHERE id IN (
+            SELECT id FROM otp_attempts WHERE expires_at < :now LIMIT :limit
+        )
+    '''),
+    # OTP messages are worthless (and sensitive) once expired
+    ('sms_outbox', '''
+        DELETE FROM sms_outbox WHERE id IN (
+            SELECT id FROM sms_outbox WHERE expires_at < :now LIMIT :limit
+        )
+    '''),
+    # Idle for a day: every bucket has refilled, so the row carries no state
+    ('rate_limits', '''
+        DELETE FROM rate_limits WHERE bucket IN (
+            SELECT bucket FROM rate_limits WHERE updated_at < :now_ts - 86400 LIMIT :limit
+        )
+    '''),
+    # An expired token is rejected anyway; its revocation is no longer needed
+    ('revoked_sessions', '''
+        DELETE FROM revoked_sessions WHERE id IN (
+            SELECT id FROM revoked_sessions WHERE expires_at < :now_ts LIMIT :limit
+        )
+    '''),
+    # Keep 90 days of login history
+    ('login_events', '''
+        DELETE FROM login_events WHERE id IN (
+            SELECT id FROM login_events WHERE created_at < :now_ts - 7776000 LIMIT :limit
+        )
+    '''),
+)
+
+
+def delete_expired(connection, sql, now, batch_size):
+    """Run a batched DELETE until it comes up short; returns rows deleted"""
+    params = {'now': now.isoformat(), 'now_ts': now.timestamp(), 'limit': batch_size}
+    total = 0
+    while True:
+        with connection() as conn:
+            deleted = conn.execute(sql, params).rowcount
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+
+def compact(connection, vacuum_pages=DEFAULT_VACUUM_PAGES):
+    """Run incremental vacuum (when enabled) and PRAGMA optimize.
+
+    Returns the number of free pages released to the filesystem.
+    """
+    with connection() as conn:
+        auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        freed = 0
+        if auto_vacuum == 2:
+            before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            conn.execute(f'PRAGMA incremental_vacuum({int(vacuum_pages)})').fetchall()
+            freed = before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+        conn.execute('PRAGMA optimize')
+    return freed
+
+
+def run_sweep(connection, batch_size=DEFAULT_BATCH_SIZE, vacuum_pages=DEFAULT_VACUUM_PAGES, stores=None):
+    """One maintenance pass.
+
+    ``connection`` is a callable returning a connection context manager
+    (e.g. ``ConnectionPool.connection``). With ``stores`` on another
+    backend, their expired rows are swept too and counted under the same
+    table names. Returns a report dict with rows reclaimed per table,
+    pages freed and seconds spent.
+    """
+    start = time.perf_counter()
+    now = datetime.now()
+    report = {}
+    for table, sql in SWEEPS:
+        report[table] = delete_expired(connection, sql, now, batch_size)
+    if stores is not None:
+        for table, deleted in stores.sweep(now, batch_size).items():
+            report[table] += deleted
+    report['pages_freed'] = compact(connection, vacuum_pages)
+    report['seconds'] = round(time.perf_counter() - start, 4)
+    return report
+
+
+def format_report(report):
+    return (f"Maintenance sweep: {report['sessions']} sessions, "
+            f"{report['otp_attempts']} OTP rows, "
+            f"{report['sms_outbox']} outbox messages, "
+            f"{report['rate_limits']} rate-limit buckets, "
+            f"{report['revoked_sessions']} revocations, "
+            f"{report['login_events']} login events deleted, "
+            f"{report['pages_freed']} pages freed in {report['seconds']:.3f}s")
+
+
+def acquire_lease(connection, owner, seconds, now=None):
+    """Take or renew the ``maintenance_lease`` row; True if ``owner`` holds it.
+
+    Succeeds for the current owner, or for anyone once the lease has
+    expired (its owner stopped without releasing it).
+    """
+    now = time.time() if now is None else now
+    with connection() as conn:
+        return conn.execute('''
+            UPDATE maintenance_lease SET owner = ?, expires_at = ?
+            WHERE id = 1 AND (owner = ? OR expires_at < ?)
+        ''', (owner, now + seconds, owner, now)).rowcount == 1
+
+
+def release_lease(connection, owner):
+    """Give up the lease so another process can take over at once"""
+    with connection() as conn:
+        conn.execute('UPDATE maintenance_lease SET expires_at = 0 WHERE id = 1 AND owner = ?', (owner,))
+
+
+class MaintenanceScheduler(threading.Thread):
+    """Daemon thread that runs ``run_sweep`` every ``interval`` seconds.
+
+    Every gunicorn worker starts one, but only the holder of the database's
+    maintenance lease sweeps; the lease outlives two intervals, so another
+    worker takes over if the holder dies.
+    """
+
+    def __init__(self, connection, interval=300.0, batch_size=DEFAULT_BATCH_SIZE,
+                 vacuum_pages=DEFAULT_VACUUM_PAGES, stores=None, log=print):
+        super().__init__(name='db-maintenance', daemon=True)
+        self.connection = connection
+        self.stores = stores
+        self.interval = interval
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.log = log
+        self.last_report = None
+        self.owner = f'{os.getpid()}-{secrets.token_hex(4)}'
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                if not acquire_lease(self.connection, self.owner, self.interval * 2.5):
+                    continue
+                self.last_report = run_sweep(self.connection, self.batch_size, self.vacuum_pages,
+                                             self.stores)
+                self.log(format_report(self.last_report))
+            except Exception as e:
+                self.log(f"Maintenance sweep failed: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        try:
+            release_lease(self.connection, self.owner)
+        except Exception as e:
+            self.log(f"Maintenance lease release failed: {e}")
@@ -0,0 +1,105 @@
+"""
+DigiSken LMS - Lesson media delivery
+Streams lesson files from MEDIA_ROOT with conditional GETs and byte
+ranges, handing the file itself to the WSGI server so it can use
+sendfile() instead of copying the body through Python
+"""
+
+import mimetypes
+import os
+
+from flask import request, send_file
+from werkzeug.security import safe_join
+
+# Served inline unless the media kind says otherwise
+MEDIA_KINDS = ('video', 'audio', 'document', 'attachment')
+
+
+class MediaNotFound(LookupError):
+    """Raised when a media row points outside MEDIA_ROOT or at a missing file"""
+
+
+def media_kind(content_type):
+    """Default kind for a MIME type"""
+    major = content_type.split('/', 1)[0]
+    if major in ('video', 'audio'):
+        return major
+    if content_type == 'application/pdf':
+        return 'document'
+    return 'attachment'
+
+
+def guess_content_type(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def resolve(media_root, relative_path):
+    """Absolute path of a stored media file; raises MediaNotFound"""
+    path = safe_join(media_root, relative_path)
+    if path is None or not os.path.isfile(path):
+        raise MediaNotFound(relative_path)
+    return path
+
+
+class RangeFile:
+    """A file positioned at ``start`` that reads at most ``length`` bytes.
+
+    gunicorn sends a file-wrapped body with sendfile() from the file
+    descriptor's current offset, for Content-Length bytes; when sendfile
+    is off (or over TLS) it iterates the wrapper, and ``read`` stops at
+    the end of the range instead of the end of the file.
+    """
+
+    def __init__(self, path, start, length):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = length
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+def offset_file_wrapper(environ):
+    """The server's file wrapper if it sends from the file's current
+    offset for Content-Length bytes (gunicorn), else None"""
+    if environ.get('SERVER_SOFTWARE', '').startswith('gunicorn/'):
+        return environ.get('wsgi.file_wrapper')
+    return None
+
+
+def send_media(media_root, media, max_age):
+    """Response for a ``lesson_media`` row.
+
+    ``send_file`` answers If-None-Match/If-Modified-Since with 304 and
+    Range/If-Range with 206 (or 416), and streams the body through
+    ``wsgi.file_wrapper``: gunicorn sends a whole file with sendfile().
+    For a range, werkzeug reads the file in 8 KB blocks; under gunicorn
+    the body becomes a wrapped ``RangeFile`` instead, so seeking in a
+    video is sent with sendfile() too.
+    """
+    path = resolve(media_root, media['path'])
+    response = send_file(
+        path,
+        mimetype=media['contentType'],
+        as_attachment=media['kind'] == 'attachment',
+        download_name=os.path.basename(media['path']),
+        conditional=True,
+        max_age=max_age,
+    )
+    wrapper = offset_file_wrapper(request.environ)
+    if response.status_code == 206 and wrapper is not None:
+        content_range = response.content_range
+        response.response.close()
+        response.response = wrapper(RangeFile(path, content_range.start,
+                                              content_range.stop - content_range.start))
+    return response
@@ -0,0 +1,334 @@
+"""
+DigiSken LMS - Metrics
+Request latency, SQL timing, bcrypt/SMS timing and pool utilization,
+exposed in Prometheus text format at /metrics
+"""
+
+import bisect
+import re
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g, request
+
+# Seconds; spans sub-millisecond SQL up to slow bcrypt/SMS calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SMS_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Statements recorded for the request running on this thread
+_trace = threading.local()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # [per-bucket counts..., +Inf count], sum
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def totals(self):
+        """{labels: (count, sum)} observed so far"""
+        with self._lock:
+            return {labels: (sum(counts), total) for labels, (counts, total) in self._values.items()}
+
+    def samples(self):
+        with self._lock:
+            values = {labels: (list(counts), total) for labels, (counts, total) in self._values.items()}
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield (f'{self.name}_bucket',
+                       _labels(self.labelnames, labels, [('le', _number(bound))]), cumulative)
+            yield f'{self.name}_sum', _labels(self.labelnames, labels), total
+            yield f'{self.name}_count', _labels(self.labelnames, labels), cumulative
+
+
+class Gauge:
+    """Value read at scrape time from a callback.
+
+    ``read`` returns a number, or a dict of label tuple -> number.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, read, labelnames=(), kind='gauge'):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def samples(self):
+        values = self.read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Registry:
+    """Ordered collection of metrics rendered together"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                # A failing callback must not break the whole scrape
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{name}{labels} {_number(value)}' for name, labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+
+# ============ SQL instrumentation ============
+
+_VERB = re.compile(r'^\s*(\w+)')
+_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE|ON)\s+(?:IF\s+NOT\s+EXISTS\s+)?(?!ON\b)([A-Za-z_]\w*)',
+                    re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+def statement_labels(sql):
+    """(operation, table) labels for a SQL statement"""
+    verb = _VERB.match(sql)
+    table = _TABLE.search(sql)
+    return (verb.group(1).upper() if verb else '?',
+            table.group(1).lower() if table else '')
+
+
+def connection_factory(metrics, database):
+    """sqlite3.Connection subclass whose statements are timed into ``metrics``.
+
+    Pass it to ``ConnectionPool(factory=...)``. Timings cover execute()
+    (planning plus the first step), not rows fetched afterwards.
+    """
+    histogram = metrics.db_seconds
+    labels_cache = {}
+
+    def record(sql, elapsed):
+        labels = labels_cache.get(sql)
+        if labels is None:
+            if len(labels_cache) > 2048:
+                labels_cache.clear()
+            labels = labels_cache[sql] = (database,) + statement_labels(sql)
+        histogram.observe(elapsed, *labels)
+        statements = getattr(_trace, 'statements', None)
+        if statements is not None:
+            statements.append((elapsed, sql))
+
+    class TimedCursor(sqlite3.Cursor):
+        def execute(self, sql, parameters=()):
+            start = time.perf_counter()
+            try:
+                return super().execute(sql, parameters)
+            finally:
+                record(sql, time.perf_counter() - start)
+
+        def executemany(self, sql, seq_of_parameters):
+            start = time.perf_counter()
+            try:
+                return super().executemany(sql, seq_of_parameters)
+            finally:
+                record(sql, time.perf_counter() - start)
+
+    class TimedConnection(sqlite3.Connection):
+        def cursor(self, factory=TimedCursor):
+            return super().cursor(factory)
+
+        def execute(self, sql, parameters=()):
+            return self.cursor().execute(sql, parameters)
+
+        def executemany(self, sql, seq_of_parameters):
+            return self.cursor().executemany(sql, seq_of_parameters)
+
+    return TimedConnection
+
+
+# ============ Application metrics ============
+
+class Metrics:
+    """Metrics of one app, plus the request middleware and /metrics view"""
+
+    def __init__(self, slow_request_ms=500, slow_query_count=5):
+        self.slow_request_ms = slow_request_ms
+        self.slow_query_count = slow_query_count
+        self.registry = Registry()
+        self.request_seconds = self.registry.register(Histogram(
+            'http_request_duration_seconds', 'Request latency by endpoint',
+            ('method', 'endpoint')))
+        self.requests = self.registry.register(Counter(
+            'http_requests_total', 'Requests by endpoint and status',
+            ('method', 'endpoint', 'status')))
+        self.db_seconds = self.registry.register(Histogram(
+            'db_statement_duration_seconds', 'SQL statement execution time',
+            ('database', 'operation', 'table')))
+        self.bcrypt_seconds = self.registry.register(Histogram(
+            'bcrypt_duration_seconds', 'Password hash/verify time including queueing',
+            ('operation',)))
+        self.sms_queue_seconds = self.registry.register(Histogram(
+            'sms_queue_duration_seconds', 'Time from enqueue to successful SMS delivery',
+            buckets=SMS_BUCKETS))
+
+    def observe_pools(self, pools):
+        """Expose ``{name: ConnectionPool}`` utilization"""
+        def read():
+            values = {}
+            for name, pool in pools.items():
+                stats = pool.stats()
+                for state in ('size', 'opened', 'idle', 'in_use'):
+                    values[(name, state)] = stats[state]
+            return values
+        self.registry.register(Gauge(
+            'db_pool_connections', 'Connection pool utilization', read, ('pool', 'state')))
+
+    def observe_services(self, services):
+        """Expose hashing backlog, session cache and SMS queue counters"""
+        hasher, cache, sms = services.password_hasher, services.session_cache, services.sms_queue
+        self.registry.register(Gauge(
+            'bcrypt_pending_jobs', 'Hash/verify jobs queued or running', hasher.pending))
+        self.registry.register(Gauge(
+            'session_cache_lookups_total', 'Session cache lookups by result',
+            lambda: {(result,): cache.stats()[key] for result, key in
+                     (('hit', 'hits'), ('negative_hit', 'negative_hits'), ('miss', 'misses'))},
+            ('result',), kind='counter'))
+        self.registry.register(Gauge(
+            'session_cache_entries', 'Cached session lookups', lambda: cache.stats()['entries']))
+        self.registry.register(Gauge(
+            'sms_messages_total', 'SMS delivery outcomes in this process',
+            lambda: {('delivered',): sms.delivered, ('failed',): sms.failed, ('retried',): sms.retried},
+            ('outcome',), kind='counter'))
+        self.registry.register(Gauge(
+            'sms_outbox_backlog', 'Messages waiting in the outbox', lambda: sms.stats()['backlog']))
+        self.registry.register(Gauge(
+            'write_buffer_pending', 'Login events waiting to be flushed', services.write_buffer.pending))
+        otps = services.stores.otps
+        if hasattr(otps, 'evicted'):
+            self.registry.register(Gauge(
+                'otp_memory_codes', 'OTP codes held in memory', lambda: len(otps)))
+            self.registry.register(Gauge(
+                'otp_memory_evicted_total', 'Unexpired OTP codes evicted at OTP_MEMORY_MAX_ENTRIES',
+                lambda: otps.evicted, kind='counter'))
+        if services.revocations is not None:
+            self.registry.register(Gauge(
+                'session_revocations', 'Revoked signed session tokens held in memory',
+                lambda: len(services.revocations)))
+
+    def observe_progress(self, queue):
+        """Expose the learner progress queue"""
+        self.registry.register(Gauge(
+            'progress_queue_pending', 'Progress events waiting to be written', queue.pending))
+        self.registry.register(Gauge(
+            'progress_events_total', 'Progress events in this process by outcome',
+            lambda: {('applied',): queue.applied, ('dropped',): queue.dropped, ('rejected',): queue.rejected},
+            ('outcome',), kind='counter'))
+
+    # ---- request middleware ----
+
+    def init_app(self, app):
+        app.extensions['metrics'] = self
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self._view, methods=['GET'])
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        _trace.statements = []
+
+    def _after_request(self, response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.url_rule.rule if request.url_rule else '<unmatched>'
+        self.request_seconds.observe(elapsed, request.method, endpoint)
+        self.requests.inc(request.method, endpoint, str(response.status_code))
+        if self.slow_request_ms and elapsed * 1000 >= self.slow_request_ms:
+            self._log_slow(elapsed, response.status_code)
+        return response
+
+    def _teardown_request(self, exc):
+        _trace.statements = None
+
+    def _log_slow(self, elapsed, status):
+        statements = getattr(_trace, 'statements', None) or []
+        db_ms = sum(seconds for seconds, _ in statements) * 1000
+        lines = [f'Slow request {request.method} {request.path} -> {status} in {elapsed * 1000:.1f} ms '
+                 f'(db {db_ms:.1f} ms over {len(statements)} statements)']
+        for seconds, sql in sorted(statements, reverse=True)[:self.slow_query_count]:
+            lines.append(f'  {seconds * 1000:8.2f} ms  {_SPACE.sub(" ", sql).strip()[:200]}')
+        current_app.logger.warning('\n'.join(lines))
+
+    def _view(self):
+        return current_app.response_class(self.registry.render(), content_type=CONTENT_TYPE)
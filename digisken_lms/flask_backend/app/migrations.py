@@ -0,0 +1,201 @@
+"""
+DigiSken LMS - Schema migrations
+Versioned schema changes tracked with PRAGMA user_version
+"""
+
+# Each migration is (version, description, statements). Versions must be
+# strictly increasing; never edit a migration once it has shipped, append
+# a new one instead.
+MIGRATIONS = [
+    (1, 'baseline auth schema', (
+        # Users table with secure password storage
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phone_number TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            two_fa_enabled INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP
+        )
+        ''',
+        # OTP verification attempts (rate limiting)
+        '''
+        CREATE TABLE IF NOT EXISTS otp_attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phone_number TEXT NOT NULL,
+            otp_code TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP,
+            attempt_count INTEGER DEFAULT 0,
+            last_attempt TIMESTAMP,
+            locked_until TIMESTAMP
+        )
+        ''',
+        # Sessions table for tracking active sessions
+        '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phone_number TEXT NOT NULL,
+            session_token TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP,
+            ip_address TEXT,
+            user_agent TEXT
+        )
+        ''',
+    )),
+    (2, 'lookup indexes for otp_attempts and sessions', (
+        # verify_otp: WHERE phone_number = ? AND expires_at > ? ORDER BY created_at DESC
+        '''
+        CREATE INDEX IF NOT EXISTS idx_otp_attempts_phone_expires_created
+        ON otp_attempts (phone_number, expires_at, created_at)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_sessions_phone_number
+        ON sessions (phone_number)
+        ''',
+        # Expiry sweeps: WHERE expires_at < ?
+        '''
+        CREATE INDEX IF NOT EXISTS idx_sessions_expires_at
+        ON sessions (expires_at)
+        ''',
+        'ANALYZE',
+    )),
+    (3, 'expiry index for otp_attempts sweeps', (
+        '''
+        CREATE INDEX IF NOT EXISTS idx_otp_attempts_expires_at
+        ON otp_attempts (expires_at)
+        ''',
+    )),
+    (4, 'sms outbox for queued delivery', (
+        '''
+        CREATE TABLE IF NOT EXISTS sms_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phone_number TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP,
+            lease_until TIMESTAMP,
+            expires_at TIMESTAMP,
+            last_error TEXT,
+            provider_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_sms_outbox_status_next_attempt
+        ON sms_outbox (status, next_attempt_at)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_sms_outbox_expires_at
+        ON sms_outbox (expires_at)
+        ''',
+    )),
+    (5, 'token buckets for the sqlite rate-limit backend', (
+        '''
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            bucket TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            allowed INTEGER NOT NULL DEFAULT 1,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_rate_limits_updated_at
+        ON rate_limits (updated_at)
+        ''',
+    )),
+    (6, 'revocation list for signed session tokens', (
+        '''
+        CREATE TABLE IF NOT EXISTS revoked_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            jti TEXT UNIQUE NOT NULL,
+            expires_at REAL NOT NULL,
+            revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_revoked_sessions_expires_at
+        ON revoked_sessions (expires_at)
+        ''',
+    )),
+    (7, 'login audit log', (
+        '''
+        CREATE TABLE IF NOT EXISTS login_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phone_number TEXT NOT NULL,
+            ip_address TEXT,
+            user_agent TEXT,
+            method TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_login_events_phone_created
+        ON login_events (phone_number, created_at)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_login_events_created_at
+        ON login_events (created_at)
+        ''',
+    )),
+    (8, 'drop plaintext otp codes (otp_code now holds an HMAC digest)', (
+        'DELETE FROM otp_attempts',
+    )),
+    (9, 'maintenance lease (one sweeper per database)', (
+        '''
+        CREATE TABLE IF NOT EXISTS maintenance_lease (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        ''',
+        "INSERT OR IGNORE INTO maintenance_lease (id, owner, expires_at) VALUES (1, '', 0)",
+    )),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """Return the schema version stored in the database header"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn, target=None, verbose=False):
+    """Apply pending migrations up to ``target`` (default: latest).
+
+    Every migration runs in its own BEGIN IMMEDIATE transaction together
+    with its user_version bump, so a crash never leaves a half-applied
+    version and concurrent workers cannot apply the same step twice.
+    Returns the list of versions applied.
+    """
+    if target is None:
+        target = LATEST_VERSION
+    if conn.in_transaction:
+        conn.commit()
+
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if version > target:
+            break
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Re-read under the write lock: another worker may have won the race
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+        if verbose:
+            print(f'Applied migration {version}: {description}')
+    return applied
@@ -0,0 +1,167 @@
+"""
+DigiSken LMS - Password hashing service
+Runs bcrypt on a bounded process pool so hashing bursts cannot stall the API
+"""
+
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """Raised when too many hashing jobs are already queued"""
+
+    def __init__(self, retry_after):
+        super().__init__('Password hashing queue is full')
+        self.retry_after = retry_after
+
+
+def _hashpw(password, rounds):
+    """Hash a password (runs in a pool worker)"""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _checkpw(password, password_hash):
+    """Check a password against its hash (runs in a pool worker)"""
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+def hash_rounds(password_hash):
+    """Cost factor encoded in a bcrypt hash ($2b$<rounds>$...)"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def calibrate_rounds(target_ms, min_rounds=10, max_rounds=15):
+    """Pick the highest bcrypt cost whose hash time stays within ``target_ms``"""
+    sample = 'calibration-Passw0rd!'
+    start = time.perf_counter()
+    _hashpw(sample, min_rounds)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    # Every extra round doubles the work
+    rounds = min_rounds
+    while rounds < max_rounds and elapsed_ms * 2 <= target_ms:
+        rounds += 1
+        elapsed_ms *= 2
+    return rounds, elapsed_ms
+
+
+class PasswordHasher:
+    """Bounded bcrypt worker pool with adaptive cost.
+
+    At most ``workers`` hashes run at once and at most ``max_pending``
+    jobs may be queued or running; beyond that callers get HasherBusy
+    so the endpoint can answer 503 instead of piling up threads.
+    ``workers`` defaults to one per CPU; under gunicorn every worker has
+    its own pool, so the app passes BCRYPT_WORKERS (the CPUs divided
+    among WEB_WORKERS).
+    """
+
+    def __init__(self, workers=None, max_pending=None, target_ms=250,
+                 rounds=None, min_rounds=10, max_rounds=15, observe=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.target_ms = target_ms
+        self.min_rounds = min_rounds
+        self.max_rounds = max_rounds
+        # Optional observe(operation, seconds) hook for metrics
+        self.observe = observe
+        self._rounds = rounds
+        self._estimated_ms = float(target_ms)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    @property
+    def rounds(self):
+        """Cost factor for new hashes (calibrated on first use)"""
+        if self._rounds is None:
+            self.calibrate()
+        return self._rounds
+
+    def calibrate(self):
+        """Measure this host and choose the cost factor for ``target_ms``"""
+        rounds, estimated_ms = calibrate_rounds(self.target_ms, self.min_rounds, self.max_rounds)
+        self._rounds = rounds
+        self._estimated_ms = estimated_ms
+        return rounds
+
+    def needs_rehash(self, password_hash):
+        """True when a stored hash is cheaper than the current cost.
+
+        Never for a costlier one: hosts (or restarts) that calibrate a
+        lower cost would otherwise rehash, and weaken, on every login.
+        """
+        return hash_rounds(password_hash) < self.rounds
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _retry_after(self):
+        """Seconds until a queued batch of hashes should have drained"""
+        batches = self.max_pending / self.workers
+        return max(1, math.ceil(batches * self._estimated_ms / 1000))
+
+    def submit(self, fn, *args):
+        """Queue ``fn`` on the pool; returns a Future or raises HasherBusy"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HasherBusy(self._retry_after())
+            self._pending += 1
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def hash_async(self, password):
+        """Hash a password on the pool; returns a Future"""
+        return self.submit(_hashpw, password, self.rounds)
+
+    def verify_async(self, password, password_hash):
+        """Verify a password on the pool; returns a Future"""
+        return self.submit(_checkpw, password, password_hash)
+
+    def hash(self, password):
+        """Hash a password on the pool, blocking until done"""
+        start = time.perf_counter()
+        result = self.hash_async(password).result()
+        if self.observe:
+            self.observe('hash', time.perf_counter() - start)
+        return result
+
+    def verify(self, password, password_hash):
+        """Verify a password on the pool, blocking until done"""
+        start = time.perf_counter()
+        result = self.verify_async(password, password_hash).result()
+        if self.observe:
+            self.observe('verify', time.perf_counter() - start)
+        return result
+
+    def pending(self):
+        """Jobs currently queued or running"""
+        return self._pending
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -0,0 +1,367 @@
+"""
+DigiSken LMS - PostgreSQL auth storage
+UserStore/OtpStore/SessionStore on a pooled PostgreSQL connection, so
+several app nodes can share one auth database (STORE_BACKEND=postgres)
+"""
+
+import hmac
+import os
+import secrets
+import threading
+from contextlib import contextmanager
+
+from app.stores import (DuplicateUser, OtpStore, SessionStore, Stores, UserStore,
+                        otp_digest, to_timestamp)
+
+# Optional: only needed with STORE_BACKEND=postgres
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg_pool import ConnectionPool as PsycopgPool
+    PSYCOPG_AVAILABLE = True
+except ImportError:
+    PSYCOPG_AVAILABLE = False
+
+# Same tables as migrations.py; every statement is idempotent
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id BIGSERIAL PRIMARY KEY,
+        phone_number TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        two_fa_enabled INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT LOCALTIMESTAMP(0),
+        last_login TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS otp_attempts (
+        id BIGSERIAL PRIMARY KEY,
+        phone_number TEXT NOT NULL,
+        otp_code TEXT NOT NULL,  -- hex HMAC digest, never the code itself
+        created_at TIMESTAMP DEFAULT LOCALTIMESTAMP,
+        expires_at TIMESTAMP NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_otp_attempts_phone ON otp_attempts (phone_number, id)',
+    'CREATE INDEX IF NOT EXISTS idx_otp_attempts_expires_at ON otp_attempts (expires_at)',
+    '''
+    CREATE TABLE IF NOT EXISTS sessions (
+        id BIGSERIAL PRIMARY KEY,
+        phone_number TEXT NOT NULL,
+        session_token TEXT UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT LOCALTIMESTAMP,
+        expires_at TIMESTAMP NOT NULL,
+        ip_address TEXT,
+        user_agent TEXT
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_sessions_phone_number ON sessions (phone_number)',
+    'CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)',
+    '''
+    CREATE TABLE IF NOT EXISTS revoked_sessions (
+        id BIGSERIAL PRIMARY KEY,
+        jti TEXT UNIQUE NOT NULL,
+        expires_at DOUBLE PRECISION NOT NULL,
+        revoked_at TIMESTAMP DEFAULT LOCALTIMESTAMP
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_revoked_sessions_expires_at ON revoked_sessions (expires_at)',
+    '''
+    CREATE TABLE IF NOT EXISTS login_events (
+        id BIGSERIAL PRIMARY KEY,
+        phone_number TEXT NOT NULL,
+        ip_address TEXT,
+        user_agent TEXT,
+        method TEXT NOT NULL,
+        created_at DOUBLE PRECISION NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_login_events_phone_created ON login_events (phone_number, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_login_events_created_at ON login_events (created_at)',
+)
+
+# Expired rows deleted by Stores.sweep, in bounded batches like maintenance.py
+SWEEPS = (
+    ('sessions', '''
+        DELETE FROM sessions WHERE id IN (
+            SELECT id FROM sessions WHERE expires_at < %(now)s LIMIT %(limit)s
+        )
+    '''),
+    ('otp_attempts', '''
+        DELETE FROM otp_attempts WHERE id IN (
+            SELECT id FROM otp_attempts WHERE expires_at < %(now)s LIMIT %(limit)s
+        )
+    '''),
+    ('revoked_sessions', '''
+        DELETE FROM revoked_sessions WHERE id IN (
+            SELECT id FROM revoked_sessions WHERE expires_at < %(now_ts)s LIMIT %(limit)s
+        )
+    '''),
+    ('login_events', '''
+        DELETE FROM login_events WHERE id IN (
+            SELECT id FROM login_events WHERE created_at < %(now_ts)s - 7776000 LIMIT %(limit)s
+        )
+    '''),
+)
+
+
+class PostgresPool:
+    """psycopg pool with the same per-thread re-entrancy as db.ConnectionPool.
+
+    Nested ``connection()`` blocks on one thread share the outer
+    connection; the outermost block commits, or rolls back on error.
+    The pool is opened lazily per process, so it survives a fork.
+    ``immediate`` is accepted for interface parity: PostgreSQL locks rows,
+    not the database, so writers never need to take a lock up front.
+    """
+
+    def __init__(self, dsn, min_size=1, max_size=10, timeout=10.0):
+        if not PSYCOPG_AVAILABLE:
+            raise RuntimeError('STORE_BACKEND=postgres needs: pip install "psycopg[binary]" psycopg-pool')
+        self.dsn = dsn
+        self.size = max_size
+        self.min_size = min_size
+        self.timeout = timeout
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                # Never reuse the parent's sockets in a forked worker
+                self._pool = PsycopgPool(self.dsn, min_size=self.min_size, max_size=self.size,
+                                         timeout=self.timeout, kwargs={'row_factory': dict_row},
+                                         name='auth-store')
+                self._pid = os.getpid()
+            return self._pool
+
+    @contextmanager
+    def connection(self, immediate=False):
+        held = getattr(self._local, 'held', None)
+        if held is not None:
+            held[1] += 1
+            try:
+                yield held[0]
+            finally:
+                held[1] -= 1
+            return
+
+        # psycopg_pool commits on a clean exit and rolls back on an exception
+        with self._get_pool().connection() as conn:
+            self._local.held = [conn, 1]
+            try:
+                yield conn
+            finally:
+                self._local.held = None
+
+    def stats(self):
+        if self._pool is None:
+            return {'size': self.size, 'opened': 0, 'idle': 0, 'in_use': 0}
+        stats = self._pool.get_stats()
+        opened = stats.get('pool_size', 0)
+        idle = stats.get('pool_available', 0)
+        return {'size': self.size, 'opened': opened, 'idle': idle, 'in_use': opened - idle}
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.close()
+            self._pool = None
+
+
+class PostgresUserStore(UserStore):
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def exists(self, phone_number):
+        with self.connection() as conn:
+            return conn.execute('SELECT 1 FROM users WHERE phone_number = %s',
+                                (phone_number,)).fetchone() is not None
+
+    def get(self, phone_number):
+        with self.connection() as conn:
+            return conn.execute('''
+                SELECT id, password_hash, two_fa_enabled FROM users WHERE phone_number = %s
+            ''', (phone_number,)).fetchone()
+
+    def create(self, phone_number, password_hash, two_fa_enabled=True):
+        with self.connection() as conn:
+            # ON CONFLICT instead of catching UniqueViolation: a failed
+            # statement would abort the whole surrounding transaction
+            inserted = conn.execute('''
+                INSERT INTO users (phone_number, password_hash, two_fa_enabled)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (phone_number) DO NOTHING
+            ''', (phone_number, password_hash, int(two_fa_enabled))).rowcount
+        if not inserted:
+            raise DuplicateUser(phone_number)
+
+    def replace_password_hash(self, phone_number, new_hash, old_hash):
+        with self.connection() as conn:
+            return conn.execute('''
+                UPDATE users SET password_hash = %s WHERE phone_number = %s AND password_hash = %s
+            ''', (new_hash, phone_number, old_hash)).rowcount > 0
+
+    def existing(self, phone_numbers):
+        with self.connection() as conn:
+            return {row['phone_number'] for row in conn.execute(
+                'SELECT phone_number FROM users WHERE phone_number = ANY(%s)', (list(phone_numbers),))}
+
+    def create_many(self, rows):
+        rows = list(rows)
+        if not rows:
+            return 0
+        with self.connection() as conn:
+            # One statement for the whole batch; RETURNING counts real inserts
+            return len(conn.execute('''
+                INSERT INTO users (phone_number, password_hash, two_fa_enabled)
+                SELECT * FROM UNNEST(%s::text[], %s::text[], %s::integer[])
+                ON CONFLICT (phone_number) DO NOTHING
+                RETURNING id
+            ''', ([row[0] for row in rows], [row[1] for row in rows],
+                  [int(row[2]) for row in rows])).fetchall())
+
+    def iter_all(self, fields, arraysize=1000):
+        with self.connection() as conn:
+            # Named (server-side) cursor: rows stream in batches of arraysize
+            with conn.cursor(name='export_users') as cursor:
+                cursor.itersize = arraysize
+                cursor.execute(f"SELECT {', '.join(fields)} FROM users ORDER BY id")
+                for row in cursor:
+                    yield {name: row[name] for name in fields}
+
+    def record_logins(self, last_login, events):
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.executemany('''
+                    UPDATE users SET last_login = %s WHERE phone_number = %s
+                ''', [(stamp, phone) for phone, stamp in last_login.items()])
+                cursor.executemany('''
+                    INSERT INTO login_events (phone_number, ip_address, user_agent, method, created_at)
+                    VALUES (%s, %s, %s, %s, %s)
+                ''', events)
+
+
+class PostgresOtpStore(OtpStore):
+
+    def __init__(self, connection, key):
+        self.connection = connection
+        self.key = key
+
+    def issue(self, phone_number, otp_code, expires_at, now, replace=False):
+        digest = otp_digest(self.key, phone_number, otp_code).hex()
+        with self.connection() as conn:
+            if replace:
+                conn.execute('DELETE FROM otp_attempts WHERE phone_number = %s', (phone_number,))
+            else:
+                conn.execute('''
+                    DELETE FROM otp_attempts WHERE phone_number = %s AND expires_at < %s
+                ''', (phone_number, now))
+            conn.execute('''
+                INSERT INTO otp_attempts (phone_number, otp_code, expires_at)
+                VALUES (%s, %s, %s)
+            ''', (phone_number, digest, expires_at))
+
+    def consume(self, phone_number, otp_code, now):
+        digest = otp_digest(self.key, phone_number, otp_code).hex()
+        with self.connection() as conn:
+            latest = conn.execute('''
+                SELECT id, otp_code FROM otp_attempts
+                WHERE phone_number = %s AND expires_at > %s
+                ORDER BY id DESC LIMIT 1
+            ''', (phone_number, now)).fetchone()
+            if latest is None or not hmac.compare_digest(latest['otp_code'], digest):
+                return False
+            # Under READ COMMITTED a concurrent DELETE of the same rows
+            # blocks on the row locks and then finds them gone, so only
+            # one caller gets the matched row back
+            deleted = conn.execute('''
+                DELETE FROM otp_attempts WHERE phone_number = %s AND id <= %s RETURNING id
+            ''', (phone_number, latest['id'])).fetchall()
+        return any(row['id'] == latest['id'] for row in deleted)
+
+
+class PostgresSessionStore(SessionStore):
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create(self, phone_number, session_token, expires_at, ip_address=None, user_agent=None):
+        with self.connection() as conn:
+            conn.execute('''
+                INSERT INTO sessions (phone_number, session_token, expires_at, ip_address, user_agent)
+                VALUES (%s, %s, %s, %s, %s)
+            ''', (phone_number, session_token, expires_at, ip_address, user_agent))
+
+    def get(self, session_token):
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT phone_number, expires_at FROM sessions WHERE session_token = %s
+            ''', (session_token,)).fetchone()
+        return (row['phone_number'], to_timestamp(row['expires_at'])) if row else None
+
+    def get_many(self, session_tokens):
+        with self.connection() as conn:
+            return {row['session_token']: (row['phone_number'], to_timestamp(row['expires_at']))
+                    for row in conn.execute('''
+                        SELECT session_token, phone_number, expires_at FROM sessions
+                        WHERE session_token = ANY(%s)
+                    ''', (list(session_tokens),))}
+
+    def delete(self, session_token):
+        with self.connection() as conn:
+            conn.execute('DELETE FROM sessions WHERE session_token = %s', (session_token,))
+
+    def revoke(self, jti, expires_ts):
+        with self.connection() as conn:
+            conn.execute('''
+                INSERT INTO revoked_sessions (jti, expires_at) VALUES (%s, %s)
+                ON CONFLICT (jti) DO NOTHING
+            ''', (jti, expires_ts))
+
+    def revocations_since(self, last_id):
+        with self.connection() as conn:
+            return [(row['id'], row['jti'], row['expires_at']) for row in conn.execute('''
+                SELECT id, jti, expires_at FROM revoked_sessions WHERE id > %s ORDER BY id
+            ''', (last_id,))]
+
+
+class PostgresStores(Stores):
+    """Stores on a shared PostgreSQL database"""
+
+    backend = 'postgres'
+
+    def __init__(self, dsn, min_size=1, max_size=10, otp_key=None):
+        self.pool = PostgresPool(dsn, min_size=min_size, max_size=max_size)
+        connection = self.pool.connection
+        otp_key = otp_key or secrets.token_bytes(32)
+        super().__init__(PostgresUserStore(connection), PostgresOtpStore(connection, otp_key),
+                         PostgresSessionStore(connection), connection)
+
+    def init_db(self):
+        with self.pool.connection() as conn:
+            # Serialize schema setup when several nodes start at once
+            conn.execute('SELECT pg_advisory_xact_lock(7406135)')
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def sweep(self, now, batch_size):
+        params = {'now': now, 'now_ts': now.timestamp(), 'limit': batch_size}
+        report = {}
+        for table, sql in SWEEPS:
+            total = 0
+            while True:
+                with self.pool.connection() as conn:
+                    deleted = conn.execute(sql, params).rowcount
+                total += deleted
+                if deleted < batch_size:
+                    break
+            report[table] = total
+        return report
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,186 @@
+"""
+DigiSken LMS - Learner progress ingestion
+Accepts batched progress events (lesson opened, video position, completed),
+queues them in memory and writes them to the catalog database in large
+transactions off the request path
+"""
+
+import atexit
+import math
+import os
+import threading
+import time
+
+PROGRESS_EVENT_TYPES = ('opened', 'position', 'completed')
+MAX_EVENT_ID_LENGTH = 64
+
+
+class InvalidEvent(ValueError):
+    """Raised when a submitted progress event is malformed"""
+
+
+def parse_events(phone_number, data, max_events, now=None):
+    """Validate a ``{"events": [...]}`` body into queue tuples.
+
+    Each event is ``{"id", "lessonId", "type", "position"?, "at"?}``: ``id``
+    is the client's idempotency key, ``position`` is seconds into the
+    lesson (required for "position") and ``at`` the client's epoch time,
+    defaulting to now and capped at now.
+    """
+    now = time.time() if now is None else now
+    events = data.get('events') if isinstance(data, dict) else None
+    if not isinstance(events, list) or not events:
+        raise InvalidEvent('events must be a non-empty list')
+    if len(events) > max_events:
+        raise InvalidEvent(f'At most {max_events} events per request')
+    parsed = []
+    for index, event in enumerate(events):
+        if not isinstance(event, dict):
+            raise InvalidEvent(f'events[{index}] must be an object')
+        event_id = event.get('id')
+        if not isinstance(event_id, str) or not 0 < len(event_id) <= MAX_EVENT_ID_LENGTH:
+            raise InvalidEvent(f'events[{index}].id must be a string of 1-{MAX_EVENT_ID_LENGTH} characters')
+        lesson_id = event.get('lessonId')
+        if not isinstance(lesson_id, int) or isinstance(lesson_id, bool) or lesson_id < 1:
+            raise InvalidEvent(f'events[{index}].lessonId must be a lesson id')
+        kind = event.get('type')
+        if kind not in PROGRESS_EVENT_TYPES:
+            raise InvalidEvent(f'events[{index}].type must be one of: ' + ', '.join(PROGRESS_EVENT_TYPES))
+        position = event.get('position')
+        if position is None and kind == 'position':
+            raise InvalidEvent(f'events[{index}].position is required')
+        if position is not None and not valid_number(position):
+            raise InvalidEvent(f'events[{index}].position must be a non-negative number')
+        at = event.get('at', now)
+        if not valid_number(at):
+            raise InvalidEvent(f'events[{index}].at must be an epoch time in seconds')
+        parsed.append((phone_number, event_id, lesson_id, kind,
+                       None if position is None else float(position), min(float(at), now)))
+    return parsed
+
+
+def valid_number(value):
+    return (isinstance(value, (int, float)) and not isinstance(value, bool)
+            and math.isfinite(value) and value >= 0)
+
+
+def catalog_writer(pool, key_retention):
+    """``write`` for ProgressQueue: applies a batch to the catalog database
+    in one transaction and forgets idempotency keys older than
+    ``key_retention`` seconds a slice at a time. Returns events applied."""
+    from app.catalog import CatalogStore
+
+    def write(events):
+        now = time.time()
+        with pool.connection(immediate=True) as conn:
+            catalog = CatalogStore(conn)
+            applied = catalog.record_progress(events, now)
+            catalog.prune_progress_keys(now - key_retention)
+        return applied
+    return write
+
+
+class ProgressQueue:
+    """Append-only in-memory queue of progress events, flushed in batches.
+
+    ``append`` only extends a list under a lock, so a heartbeat costs the
+    request no database write. A daemon thread flushes every
+    ``flush_interval`` seconds, or sooner once ``max_events`` are queued,
+    handing ``write(events)`` at most ``max_events`` events per call (one
+    transaction each). ``append`` refuses new events while ``max_pending``
+    are waiting, so a stalled database cannot grow the queue without
+    bound. ``close`` (also registered with atexit) drains the queue on
+    shutdown; events still queued when a worker is killed are lost.
+    """
+
+    def __init__(self, write, flush_interval=1.0, max_events=5000, max_pending=100000, log=print):
+        self.write = write
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        self.max_pending = max_pending
+        self.log = log
+        self.applied = 0
+        self.dropped = 0
+        self.rejected = 0
+        self._events = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._atexit = False
+
+    def append(self, events):
+        """Queue a batch of parsed events; False if the queue is full"""
+        with self._lock:
+            if len(self._events) + len(events) > self.max_pending:
+                self.rejected += len(events)
+                return False
+            self._events.extend(events)
+            full = len(self._events) >= self.max_events
+        self.start()
+        if full:
+            self._wakeup.set()
+        return True
+
+    def pending(self):
+        with self._lock:
+            return len(self._events)
+
+    def flush(self):
+        """Write everything queued so far; returns the number of events written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._events[:self.max_events]
+                    del self._events[:self.max_events]
+                if not batch:
+                    return written
+                try:
+                    applied = self.write(batch)
+                except Exception:
+                    with self._lock:
+                        # Back to the front, in order, for the next flush
+                        self._events[:0] = batch
+                    raise
+                self.applied += applied
+                self.dropped += len(batch) - applied
+                written += len(batch)
+
+    def start(self):
+        """Start the flusher thread once per process"""
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='progress-queue', daemon=True)
+            self._thread.start()
+            if not self._atexit:
+                atexit.register(self.close)
+                self._atexit = True
+
+    def close(self, timeout=5.0):
+        """Stop the flusher and write out anything still queued"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            self.log(f"Progress queue final flush failed: {e}")
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.log(f"Progress queue flush failed: {e}")
@@ -0,0 +1,176 @@
+"""
+DigiSken LMS - Rate limiting
+Token-bucket limits keyed by phone number and client IP, with an
+in-process backend and a SQLite backend shared by worker processes
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import jsonify, request
+
+
+class Rule:
+    """Allow ``capacity`` hits per ``period`` seconds, bursting up to ``capacity``.
+
+    ``key`` selects what is limited: 'ip' or 'phone'.
+    """
+
+    def __init__(self, name, key, capacity, period):
+        self.name = name
+        self.key = key
+        self.capacity = float(capacity)
+        self.period = float(period)
+        self.rate = self.capacity / self.period
+
+    def __repr__(self):
+        return f'Rule({self.name!r}, {self.key!r}, {self.capacity:g}/{self.period:g}s)'
+
+
+class MemoryBackend:
+    """Token buckets in a bounded in-process LRU map (O(1) per hit)"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, bucket, rule, cost=1.0, now=None):
+        """Consume ``cost`` tokens; returns (allowed, retry_after_seconds)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(bucket, (rule.capacity, now))
+            tokens = min(rule.capacity, tokens + (now - updated) * rule.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[bucket] = (tokens, now)
+            self._buckets.move_to_end(bucket)
+            # The least recently hit buckets have refilled the longest
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rule.rate
+
+    def reset(self, bucket):
+        with self._lock:
+            self._buckets.pop(bucket, None)
+
+
+class SqliteBackend:
+    """Token buckets in the ``rate_limits`` table, updated with one UPSERT per hit"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def hit(self, bucket, rule, cost=1.0, now=None):
+        now = time.time() if now is None else now
+        with self.connection() as conn:
+            row = conn.execute('''
+                INSERT INTO rate_limits (bucket, tokens, allowed, updated_at)
+                VALUES (:bucket, :capacity - :cost, 1, :now)
+                ON CONFLICT(bucket) DO UPDATE SET
+                    allowed = MIN(:capacity, tokens + (:now - updated_at) * :rate) >= :cost,
+                    tokens = MIN(:capacity, tokens + (:now - updated_at) * :rate)
+                        - CASE WHEN MIN(:capacity, tokens + (:now - updated_at) * :rate) >= :cost
+                               THEN :cost ELSE 0 END,
+                    updated_at = :now
+                RETURNING tokens, allowed
+            ''', {'bucket': bucket, 'capacity': rule.capacity, 'cost': cost,
+                  'rate': rule.rate, 'now': now}).fetchone()
+        allowed = bool(row['allowed'])
+        return allowed, 0.0 if allowed else (cost - row['tokens']) / rule.rate
+
+    def reset(self, bucket):
+        with self.connection() as conn:
+            conn.execute('DELETE FROM rate_limits WHERE bucket = ?', (bucket,))
+
+
+def client_ip():
+    """Address of the connecting client"""
+    return request.remote_addr or 'unknown'
+
+
+def phone_digits(phone_number):
+    """Phone number normalized to digits, so formatting cannot dodge a limit"""
+    return ''.join(c for c in str(phone_number or '') if c.isdigit())
+
+
+def request_phone():
+    """Phone number from the JSON body, normalized to digits"""
+    data = request.get_json(silent=True) or {}
+    return phone_digits(data.get('phone_number'))
+
+
+KEY_FUNCTIONS = {
+    'ip': client_ip,
+    'phone': request_phone,
+}
+
+
+class RateLimiter:
+    """Applies Rules to Flask views before any database or bcrypt work"""
+
+    def __init__(self, backend=None, enabled=True):
+        self.backend = backend
+        self.enabled = enabled
+        self.rejected = 0
+
+    def init_app(self, backend, enabled=True):
+        """Bind the limiter to a backend once the app config is known"""
+        self.backend = backend
+        self.enabled = enabled
+
+    def bucket(self, rule, value):
+        return f'{rule.name}:{rule.key}:{value}'
+
+    def check(self, rules, keys=None):
+        """Hit rules in order; returns retry_after of the first one that rejects.
+
+        Key values come from the Flask request unless ``keys`` maps them
+        explicitly (e.g. ``{'ip': ..., 'phone': ...}`` from the ASGI app).
+        """
+        for rule in rules:
+            value = keys.get(rule.key) if keys is not None else KEY_FUNCTIONS[rule.key]()
+            if not value:
+                continue
+            allowed, retry_after = self.backend.hit(self.bucket(rule, value), rule)
+            if not allowed:
+                return retry_after
+        return 0.0
+
+    def reset(self, rule, value):
+        """Forget a bucket, e.g. after a successful OTP verification"""
+        self.backend.reset(self.bucket(rule, value))
+
+    def limit(self, *rules, transaction=None):
+        """Decorator rejecting requests with 429 + Retry-After once a rule is exhausted.
+
+        ``transaction`` is an optional callable returning a context manager
+        (e.g. a pooled ``connection(immediate=True)``) entered around both
+        the check and the view, so with the SQLite backend the bucket
+        updates commit together with the view's own writes.
+        """
+        def decorator(view):
+            def limited(args, kwargs):
+                if self.enabled and self.backend is not None:
+                    retry_after = self.check(rules)
+                    if retry_after > 0:
+                        self.rejected += 1
+                        response = jsonify({
+                            'success': False,
+                            'error': 'Too many attempts. Try again later.'
+                        })
+                        response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+                        return response, 429
+                return view(*args, **kwargs)
+
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if transaction is None:
+                    return limited(args, kwargs)
+                with transaction():
+                    return limited(args, kwargs)
+            return wrapper
+        return decorator
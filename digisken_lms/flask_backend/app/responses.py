@@ -0,0 +1,205 @@
+"""
+DigiSken LMS - Response encoding
+Fast JSON serialization, cached serialized responses and gzip/brotli
+compression negotiated per request
+"""
+
+import gzip
+import json
+import threading
+from collections import OrderedDict
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+# Optional: orjson serializes several times faster than the json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional: brotli compresses JSON ~15-20% smaller than gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'application/manifest+json',
+    'text/plain', 'text/html', 'text/css', 'text/javascript', 'image/svg+xml',
+}
+
+
+def dumps(obj, default=None):
+    """Serialize ``obj`` to compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        # Dates and dataclasses go through ``default`` as with Flask's provider
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS
+                            | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    """Parse JSON from str or bytes"""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify()/request.json on orjson, falling back to the json module.
+
+    Keys keep their insertion order (catalog fields are emitted in their
+    documented order) and non-ASCII text is sent as UTF-8 rather than
+    escaped. Debug-mode pretty printing still uses the json module.
+    """
+
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.get('indent') is not None:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, self.default).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, self.default) + b'\n', mimetype=self.mimetype)
+
+
+class LRUCache:
+    """Small thread-safe LRU map"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ResponseCache(LRUCache):
+    """Serialized responses keyed by a strong ETag.
+
+    An ETag that already encodes the data version and the request URL
+    identifies the exact bytes of a response, so a hit skips the queries
+    and the serialization and replays the stored body and headers.
+    """
+
+    def get(self, etag):
+        entry = super().get(etag)
+        if entry is None:
+            return None
+        body, status, headers = entry
+        return current_app.response_class(body, status=status, headers=headers)
+
+    def put(self, etag, response):
+        super().put(etag, (response.get_data(), response.status_code, list(response.headers)))
+        return response
+
+
+class Compressor:
+    """Compresses responses with brotli or gzip as the client allows.
+
+    Only compressible types of at least ``min_bytes`` are touched.
+    Compressed bodies of responses with a strong ETag are cached per
+    encoding, so unchanged catalog data is compressed once per worker.
+    Compressed responses get a weak ETag (the bytes differ from the
+    identity encoding); conditional requests compare ETags weakly.
+    """
+
+    def __init__(self, min_bytes=512, gzip_level=6, brotli_quality=5, cache_size=512):
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = LRUCache(cache_size)
+        self.encodings = (('br', 'gzip') if brotli is not None else ('gzip',))
+
+    def negotiate(self, accept_encodings):
+        """Best encoding the client accepts, or None"""
+        best, best_quality = None, 0
+        for encoding in self.encodings:
+            quality = accept_encodings[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def after_request(self, response):
+        if (response.direct_passthrough or response.is_streamed
+                or not 200 <= response.status_code < 300 or response.status_code in (204, 206)
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or 'Content-Encoding' in response.headers
+                or (response.content_length or 0) < self.min_bytes):
+            return response
+
+        # Caches must keep one copy per encoding
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        key = (etag, encoding) if etag and not weak else None
+        body = self.cache.get(key) if key else None
+        if body is None:
+            body = self.compress(response.get_data(), encoding)
+            if key:
+                self.cache.put(key, body)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def init_app(app):
+    """Fast JSON for jsonify(), plus the response cache and compression from config"""
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+    app.extensions['response_cache'] = ResponseCache(app.config['RESPONSE_CACHE_SIZE'])
+    if app.config['COMPRESSION_ENABLED']:
+        compressor = Compressor(
+            min_bytes=app.config['COMPRESS_MIN_BYTES'],
+            gzip_level=app.config['COMPRESS_GZIP_LEVEL'],
+            brotli_quality=app.config['COMPRESS_BROTLI_QUALITY'],
+            cache_size=app.config['RESPONSE_CACHE_SIZE'],
+        )
+        app.extensions['compressor'] = compressor
+        app.after_request(compressor.after_request)
+
+
+def response_cache():
+    """ResponseCache of the current app"""
+    return current_app.extensions['response_cache']
@@ -0,0 +1,261 @@
+"""
+DigiSken LMS - Auth services
+Per-process infrastructure (DB pool, hashing, caches, queues) built from config
+"""
+
+import importlib.util
+import os
+import secrets
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from flask import current_app
+
+from app.db import ConnectionPool
+from app.maintenance import MaintenanceScheduler
+from app.metrics import connection_factory
+from app.password_hashing import HasherBusy, PasswordHasher
+from app.rate_limiter import MemoryBackend, SqliteBackend
+from app.session_cache import SessionCache
+from app.session_tokens import RevocationList, SessionSigner, parse_keys
+from app.sms_queue import ConsoleProvider, FakeProvider, SmsQueue, TwilioProvider
+from app.stores import SqliteStores, build_stores
+from app.write_buffer import WriteBuffer
+
+# Optional: Twilio for SMS. Only looked up here (importing twilio.rest takes
+# longer than the rest of the app); TwilioProvider imports it on first send.
+TWILIO_AVAILABLE = importlib.util.find_spec('twilio') is not None
+
+
+def build_sms_provider(config):
+    """Pick the SMS provider from SMS_PROVIDER / DEBUG_MODE"""
+    provider = config['SMS_PROVIDER']
+    if provider == 'fake':
+        return FakeProvider()
+    if provider == 'console' or (config['DEBUG_MODE'] and provider != 'twilio'):
+        # In debug mode, print OTP to console
+        return ConsoleProvider()
+    if not TWILIO_AVAILABLE:
+        print(f"Warning: Twilio not installed. Install with: pip install twilio")
+        print(f"SMS codes will be printed to the console instead")
+        return ConsoleProvider()
+    return TwilioProvider(config['TWILIO_ACCOUNT_SID'], config['TWILIO_AUTH_TOKEN'],
+                          config['TWILIO_PHONE_NUMBER'])
+
+
+def load_otp_key(config):
+    """OTP_HMAC_KEY, or a random key shared through OTP_KEY_FILE.
+
+    The file is created once with an atomic link, so workers starting
+    together all end up reading the same key.
+    """
+    if config['OTP_HMAC_KEY']:
+        return config['OTP_HMAC_KEY'].encode()
+    path = config['OTP_KEY_FILE'] or os.path.join(
+        os.path.dirname(os.path.abspath(config['AUTH_DATABASE'])), '.otp_hmac_key')
+    if not os.path.exists(path):
+        tmp = f'{path}.{os.getpid()}.tmp'
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(tmp, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp)
+    with open(path) as f:
+        return f.read().strip().encode()
+
+
+def build_session_signer(config):
+    """SessionSigner for SESSION_TOKEN_MODE=signed, else None"""
+    if config['SESSION_TOKEN_MODE'] != 'signed':
+        return None
+    keys = parse_keys(config['SESSION_SIGNING_KEYS'])
+    if not keys:
+        print(f"Warning: SESSION_SIGNING_KEYS is not set; using a random key")
+        print(f"Signed sessions will not survive a restart or validate on other nodes")
+        keys = {'ephemeral': secrets.token_bytes(32)}
+    return SessionSigner(keys)
+
+
+class AuthServices:
+    """Everything the auth blueprint needs, configured from ``app.config``.
+
+    Construction is cheap and fork-safe: connections, hashing processes
+    and background threads are created lazily in whichever process uses
+    them, so an app preloaded by a gunicorn master can be forked freely.
+    """
+
+    def __init__(self, config, metrics=None):
+        self.config = config
+        self.metrics = metrics
+        self.db_pool = ConnectionPool(
+            config['AUTH_DATABASE'],
+            size=config['DB_POOL_SIZE'],
+            busy_timeout_ms=config['DB_BUSY_TIMEOUT_MS'],
+            statement_cache=config['DB_STATEMENT_CACHE'],
+            factory=connection_factory(metrics, 'auth') if metrics else sqlite3.Connection,
+        )
+        # Users, OTP codes and sessions (SQLite shares db_pool); the outbox
+        # and rate-limit buckets are node-local and stay in db_pool
+        self.stores = build_stores(config, self.db_pool, load_otp_key(config))
+        self.password_hasher = PasswordHasher(
+            workers=config['BCRYPT_WORKERS'],
+            max_pending=config['BCRYPT_MAX_PENDING'],
+            target_ms=config['BCRYPT_TARGET_MS'],
+            rounds=config['BCRYPT_ROUNDS'],
+            min_rounds=config['BCRYPT_MIN_ROUNDS'],
+            observe=(lambda operation, seconds: metrics.bcrypt_seconds.observe(seconds, operation))
+            if metrics else None,
+        )
+        self.session_cache = SessionCache(
+            max_entries=config['SESSION_CACHE_SIZE'],
+            ttl=config['SESSION_CACHE_TTL'],
+            negative_ttl=config['SESSION_CACHE_NEGATIVE_TTL'],
+        )
+        self.sms_queue = SmsQueue(
+            self.db_pool.connection,
+            build_sms_provider(config),
+            senders=config['SMS_SENDERS'],
+            max_attempts=config['SMS_MAX_ATTEMPTS'],
+            observe=metrics.sms_queue_seconds.observe if metrics else None,
+        )
+        self.write_buffer = WriteBuffer(
+            self.stores.users.record_logins,
+            flush_interval=config['WRITE_BUFFER_INTERVAL_MS'] / 1000.0,
+            max_events=config['WRITE_BUFFER_MAX_EVENTS'],
+        )
+        self.session_signer = build_session_signer(config)
+        self.revocations = RevocationList(
+            self.stores.sessions,
+            refresh_interval=config['SESSION_REVOCATION_REFRESH'],
+        ) if self.session_signer else None
+        if config['RATE_LIMIT_BACKEND'] == 'sqlite':
+            self.rate_limit_backend = SqliteBackend(self.db_pool.connection)
+        else:
+            self.rate_limit_backend = MemoryBackend()
+        self.maintenance_scheduler = None
+        self._background_pid = None
+        self._lock = threading.Lock()
+
+    def init_db(self):
+        """Apply pending schema migrations (both databases with STORE_BACKEND=postgres)"""
+        SqliteStores(self.db_pool).init_db()
+        if self.stores.backend != 'sqlite':
+            self.stores.init_db()
+
+    def start_background(self):
+        """Start the sweeper, SMS senders and revocation refresh once per process"""
+        if self._background_pid == os.getpid():
+            return
+        with self._lock:
+            if self._background_pid == os.getpid():
+                return
+            self._background_pid = os.getpid()
+            if self.config['MAINTENANCE_INTERVAL'] > 0:
+                self.maintenance_scheduler = MaintenanceScheduler(
+                    self.db_pool.connection,
+                    interval=self.config['MAINTENANCE_INTERVAL'],
+                    batch_size=self.config['MAINTENANCE_BATCH_SIZE'],
+                    stores=self.stores,
+                )
+                self.maintenance_scheduler.start()
+            self.sms_queue.start()
+            if self.revocations is not None:
+                self.revocations.start()
+
+    @contextmanager
+    def write_transaction(self):
+        """One write transaction for the stores and the rate-limit buckets.
+
+        BEGIN IMMEDIATE on the auth SQLite database only when something
+        there is written (SQLite stores or SqliteBackend buckets); with
+        Postgres stores and in-memory buckets only the stores' transaction
+        is opened, so no node-local write lock is held across Postgres
+        round trips.
+        """
+        if self.stores.backend == 'sqlite':
+            with self.db_pool.connection(immediate=True):
+                yield
+            return
+        if isinstance(self.rate_limit_backend, SqliteBackend):
+            with self.db_pool.connection(immediate=True), self.stores.transaction(immediate=True):
+                yield
+            return
+        with self.stores.transaction(immediate=True):
+            yield
+
+    def cached_sessions(self, session_tokens):
+        """Resolve what needs no I/O: signed tokens (signature and revocation
+        list) and cached opaque ones. Returns ``(found, missing)``: a dict of
+        token -> (phone_number, expires_ts) or None, and the tokens left for
+        the sessions store."""
+        found, opaque = {}, []
+        signer = self.session_signer
+        for session_token in session_tokens:
+            if signer is not None and signer.is_signed(session_token):
+                claims = signer.verify(session_token)
+                revoked = claims is None or self.revocations.is_revoked(claims.jti)
+                found[session_token] = None if revoked else (claims.phone_number, claims.expires_ts)
+            else:
+                opaque.append(session_token)
+        cached = self.session_cache.get_many(opaque)
+        found.update(cached)
+        return found, [session_token for session_token in opaque if session_token not in cached]
+
+    def cache_sessions(self, found, missing, sessions):
+        """Cache the store's answer (``get_many``) for ``missing`` and add it to ``found``"""
+        for session_token in missing:
+            session = sessions.get(session_token)
+            if session is None:
+                self.session_cache.put_missing(session_token)
+            else:
+                self.session_cache.put(session_token, *session)
+            found[session_token] = session
+        return found
+
+    def lookup_sessions(self, session_tokens):
+        """{token: (phone_number, expires_ts) or None}, with one store query
+        for all the tokens that could not be resolved in memory"""
+        found, missing = self.cached_sessions(session_tokens)
+        if not missing:
+            return found
+        return self.cache_sessions(found, missing, self.stores.sessions.get_many(missing))
+
+    def rehash_in_background(self, phone_number, password, password_hash):
+        """Upgrade a stored hash off the request path when the bcrypt cost changed"""
+        if not self.password_hasher.needs_rehash(password_hash):
+            return
+        try:
+            future = self.password_hasher.hash_async(password)
+        except HasherBusy:
+            # Best effort: try again on the next login
+            return
+
+        def store(done):
+            # Runs on an executor thread, outside any request
+            if done.exception() is not None:
+                return
+            # Only replace the hash we verified against
+            self.stores.users.replace_password_hash(phone_number, done.result(), password_hash)
+
+        future.add_done_callback(store)
+
+    def shutdown(self):
+        """Stop background work and flush buffered writes (worker exit)"""
+        if self.maintenance_scheduler is not None:
+            self.maintenance_scheduler.stop()
+        if self.revocations is not None:
+            self.revocations.stop()
+        self.sms_queue.stop()
+        self.write_buffer.close()
+        self.password_hasher.shutdown()
+        self.stores.close()
+
+
+def services():
+    """AuthServices of the current app"""
+    return current_app.extensions['auth']
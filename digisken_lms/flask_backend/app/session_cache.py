@@ -0,0 +1,116 @@
+"""
+DigiSken LMS - Session token cache
+In-process LRU+TTL cache in front of the sessions table
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by SessionCache.get() when the token is not cached at all
+MISS = object()
+
+
+def token_key(session_token):
+    """Cache key for a token; raw tokens are never kept in memory"""
+    return hashlib.sha256(session_token.encode('utf-8')).digest()
+
+
+class SessionCache:
+    """Thread-safe LRU cache of session lookups with per-entry TTL.
+
+    Positive entries hold ``(phone_number, expires_ts)``; unknown tokens
+    are cached as ``None`` for a shorter ``negative_ttl`` so floods of bad
+    tokens do not reach the database. Entries live at most ``ttl`` seconds,
+    which bounds how long a logout performed by another worker process
+    can go unnoticed.
+    """
+
+    def __init__(self, max_entries=10000, ttl=60.0, negative_ttl=5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    def get(self, session_token):
+        """Cached value for a token, ``None`` if known-invalid, or MISS"""
+        key = token_key(session_token)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return MISS
+            self._entries.move_to_end(key)
+            if entry[1] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry[1]
+
+    def get_many(self, session_tokens):
+        """{session_token: cached value} for the cached tokens, in one lock pass"""
+        keys = [(token, token_key(token)) for token in session_tokens]
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for token, key in keys:
+                entry = self._entries.get(key)
+                if entry is None or entry[0] <= now:
+                    if entry is not None:
+                        del self._entries[key]
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                if entry[1] is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                found[token] = entry[1]
+        return found
+
+    def _store(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, session_token, phone_number, expires_ts):
+        """Cache a valid session (expiry as a Unix timestamp)"""
+        self._store(token_key(session_token), (phone_number, expires_ts), self.ttl)
+
+    def put_missing(self, session_token):
+        """Remember that a token does not exist"""
+        self._store(token_key(session_token), None, self.negative_ttl)
+
+    def invalidate(self, session_token):
+        """Drop a token, e.g. on logout"""
+        with self._lock:
+            self._entries.pop(token_key(session_token), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,192 @@
+"""
+DigiSken LMS - Signed session tokens
+HMAC-signed, self-describing session tokens that validate without I/O,
+plus a revocation list so logout still takes effect
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+VERSION = 'v1'
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def parse_keys(spec):
+    """Parse ``kid:secret,kid:secret`` into an ordered {kid: secret} dict.
+
+    The first key signs new tokens; the others only verify, so a key can
+    be rotated by prepending its successor and dropping it a session
+    lifetime later.
+    """
+    keys = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        kid, sep, secret = item.partition(':')
+        if not sep or not kid or not secret:
+            raise ValueError(f'Signing key must look like kid:secret, got {item!r}')
+        if '.' in kid:
+            raise ValueError(f'Key id {kid!r} must not contain "."')
+        keys[kid] = secret.encode('utf-8')
+    return keys
+
+
+class SessionClaims:
+    __slots__ = ('phone_number', 'expires_ts', 'jti', 'kid')
+
+    def __init__(self, phone_number, expires_ts, jti, kid):
+        self.phone_number = phone_number
+        self.expires_ts = expires_ts
+        self.jti = jti
+        self.kid = kid
+
+
+class SessionSigner:
+    """Issues and verifies ``v1.<kid>.<payload>.<signature>`` tokens.
+
+    The payload (phone number, expiry, token id) is signed, not
+    encrypted: clients can read it but not alter it.
+    """
+
+    def __init__(self, keys):
+        if not keys:
+            raise ValueError('At least one signing key is required')
+        self.keys = dict(keys)
+        self.active_kid = next(iter(self.keys))
+
+    @staticmethod
+    def is_signed(token):
+        return token.startswith(VERSION + '.')
+
+    def _sign(self, kid, message):
+        return hmac.new(self.keys[kid], message, hashlib.sha256).digest()
+
+    def issue(self, phone_number, expires_ts):
+        """New token for ``phone_number``; returns (token, jti)"""
+        jti = secrets.token_urlsafe(12)
+        payload = _b64encode(json.dumps([phone_number, int(expires_ts), jti],
+                                        separators=(',', ':')).encode('utf-8'))
+        message = f'{VERSION}.{self.active_kid}.{payload}'
+        return f'{message}.{_b64encode(self._sign(self.active_kid, message.encode("ascii")))}', jti
+
+    def verify(self, token):
+        """SessionClaims for a well-formed, correctly signed token, else None.
+
+        Expiry and revocation are left to the caller.
+        """
+        try:
+            version, kid, payload, signature = token.split('.')
+        except ValueError:
+            return None
+        if version != VERSION or kid not in self.keys:
+            return None
+        message = f'{version}.{kid}.{payload}'.encode('ascii', 'replace')
+        try:
+            valid = hmac.compare_digest(_b64decode(signature), self._sign(kid, message))
+        except ValueError:
+            return None
+        if not valid:
+            return None
+        try:
+            phone_number, expires_ts, jti = json.loads(_b64decode(payload))
+        except (TypeError, ValueError):
+            return None
+        return SessionClaims(phone_number, expires_ts, jti, kid)
+
+
+class RevocationList:
+    """Token ids revoked before expiry, mirrored in memory.
+
+    ``revoke`` writes to the session store and the local set at once;
+    other workers and nodes pick the row up on their next refresh, so
+    ``is_revoked`` is a set lookup and never touches the database.
+
+    Ids come from a sequence, and on PostgreSQL concurrent logouts can
+    commit them out of order, so a refresh re-reads the last
+    ``id_overlap`` ids and every ``full_reload_interval`` seconds
+    reloads the whole table; a late commit is missed for one period at
+    most.
+    """
+
+    def __init__(self, sessions, refresh_interval=5.0, id_overlap=1000,
+                 full_reload_interval=300.0, log=print):
+        self.sessions = sessions
+        self.refresh_interval = refresh_interval
+        self.id_overlap = id_overlap
+        self.full_reload_interval = full_reload_interval
+        self.log = log
+        self._revoked = {}
+        self._last_id = 0
+        self._last_full_reload = 0.0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def __len__(self):
+        return len(self._revoked)
+
+    def is_revoked(self, jti):
+        return jti in self._revoked
+
+    def revoke(self, jti, expires_ts):
+        self.sessions.revoke(jti, expires_ts)
+        with self._lock:
+            self._revoked[jti] = expires_ts
+
+    def refresh(self):
+        """Load revocations recorded since the last refresh and drop expired ones"""
+        now = time.time()
+        if now - self._last_full_reload >= self.full_reload_interval:
+            since, self._last_full_reload = 0, now
+        else:
+            since = max(0, self._last_id - self.id_overlap)
+        rows = self.sessions.revocations_since(since)
+        with self._lock:
+            for revocation_id, jti, expires_ts in rows:
+                if expires_ts > now:
+                    self._revoked[jti] = expires_ts
+                self._last_id = max(self._last_id, revocation_id)
+            expired = [jti for jti, expires_ts in self._revoked.items() if expires_ts <= now]
+            for jti in expired:
+                del self._revoked[jti]
+        return len(rows)
+
+    def start(self):
+        """Load the list and keep it fresh on a daemon thread (once per process).
+
+        A failed first load is logged, not raised: the thread still starts
+        and retries on its next refresh.
+        """
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='session-revocations', daemon=True)
+        try:
+            self.refresh()
+        except Exception as e:
+            self.log(f"Session revocation refresh failed: {e}")
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _run(self):
+        while not self._stopping.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                self.log(f"Session revocation refresh failed: {e}")
@@ -0,0 +1,237 @@
+"""
+DigiSken LMS - SMS delivery queue
+Durable SQLite outbox drained by background sender threads with retries
+"""
+
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class ConsoleProvider:
+    """Prints messages to the console (development / DEBUG_MODE)"""
+
+    def send(self, phone_number, body):
+        print(f"\n{'='*50}")
+        print(f"📱 SMS for {phone_number}")
+        print(body)
+        print(f"{'='*50}\n")
+        return 'console'
+
+
+class FakeProvider:
+    """In-memory provider for load tests: no network, tunable latency and failures"""
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send(self, phone_number, body):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self._random.random() < self.failure_rate:
+                raise RuntimeError('fake provider failure')
+            self.sent.append((phone_number, body))
+            return f'fake-{len(self.sent)}'
+
+
+class TwilioProvider:
+    """Twilio REST provider sharing one client (and its HTTP connection pool).
+
+    twilio is imported with the first message, on a sender thread, so app
+    startup and worker forks never pay for its import.
+    """
+
+    def __init__(self, account_sid, auth_token, from_number):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from twilio.rest import Client
+                self._client = Client(self.account_sid, self.auth_token)
+            return self._client
+
+    def send(self, phone_number, body):
+        message = self.client.messages.create(body=body, from_=self.from_number, to=phone_number)
+        return message.sid
+
+
+class SmsQueue:
+    """Outbox-backed SMS delivery.
+
+    ``enqueue`` only inserts into ``sms_outbox`` and wakes a sender, so
+    request latency no longer depends on the provider. Sender threads
+    claim due rows with a lease (safe across worker processes), deliver
+    them, and retry failures with exponential backoff until
+    ``max_attempts`` or the message's ``expires_at`` is reached.
+    """
+
+    def __init__(self, connection, provider, senders=2, max_attempts=5,
+                 base_backoff=1.0, max_backoff=60.0, lease_seconds=30.0,
+                 batch_size=10, poll_interval=1.0, log=print, observe=None):
+        self.connection = connection
+        self.provider = provider
+        self.senders = senders
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.log = log
+        # Optional observe(seconds) hook: enqueue-to-delivery time
+        self.observe = observe
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self.delivered = 0
+        self.failed = 0
+        self.retried = 0
+
+    def enqueue(self, phone_number, body, ttl=timedelta(minutes=10)):
+        """Store a message in the outbox; returns its id"""
+        now = datetime.now()
+        with self.connection() as conn:
+            cursor = conn.execute('''
+                INSERT INTO sms_outbox (phone_number, body, next_attempt_at, expires_at, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (phone_number, body, now.isoformat(), (now + ttl).isoformat(), now.isoformat()))
+            message_id = cursor.lastrowid
+        self.start()
+        self._wakeup.set()
+        return message_id
+
+    def start(self):
+        """Start sender threads once per process"""
+        with self._lock:
+            if self._pid == os.getpid() and self._threads:
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'sms-sender-{i}', daemon=True)
+                for i in range(self.senders)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop senders; unsent messages stay in the outbox"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        while not self._stopping.is_set():
+            # Clear before claiming so an enqueue during the claim is not lost
+            self._wakeup.clear()
+            try:
+                batch = self._claim()
+            except Exception as e:
+                self.log(f"SMS queue claim failed: {e}")
+                batch = []
+            if not batch:
+                self._wakeup.wait(self.poll_interval)
+                continue
+            for row in batch:
+                self._deliver(row)
+
+    def _claim(self):
+        """Lease a batch of due messages to this sender.
+
+        A plain SELECT (a WAL read, no lock) checks for due rows first:
+        even an UPDATE that matches nothing takes the write lock, and idle
+        senders of every worker poll each ``poll_interval``.
+        """
+        now = datetime.now()
+        lease_until = (now + timedelta(seconds=self.lease_seconds)).isoformat()
+        params = {'lease_until': lease_until, 'now': now.isoformat(), 'limit': self.batch_size}
+        with self.connection() as conn:
+            due = conn.execute('''
+                SELECT 1 FROM sms_outbox
+                WHERE (status = 'pending' AND next_attempt_at <= :now)
+                   OR (status = 'sending' AND lease_until < :now)
+                LIMIT 1
+            ''', params).fetchone()
+            if due is None:
+                return []
+            return conn.execute('''
+                UPDATE sms_outbox
+                SET status = 'sending', attempts = attempts + 1, lease_until = :lease_until
+                WHERE id IN (
+                    SELECT id FROM sms_outbox
+                    WHERE (status = 'pending' AND next_attempt_at <= :now)
+                       OR (status = 'sending' AND lease_until < :now)
+                    ORDER BY id LIMIT :limit
+                )
+                RETURNING id, phone_number, body, attempts, expires_at, created_at
+            ''', params).fetchall()
+
+    def _deliver(self, row):
+        now = datetime.now()
+        if row['expires_at'] and row['expires_at'] < now.isoformat():
+            self._finish(row['id'], 'expired', error='expired before delivery')
+            self.failed += 1
+            return
+        try:
+            provider_id = self.provider.send(row['phone_number'], row['body'])
+        except Exception as e:
+            if row['attempts'] >= self.max_attempts:
+                self._finish(row['id'], 'failed', error=str(e))
+                self.failed += 1
+                self.log(f"SMS to {row['phone_number']} failed permanently: {e}")
+                return
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (row['attempts'] - 1))
+            delay *= random.uniform(0.5, 1.0)
+            with self.connection() as conn:
+                conn.execute('''
+                    UPDATE sms_outbox SET status = 'pending', next_attempt_at = ?, last_error = ?
+                    WHERE id = ?
+                ''', ((now + timedelta(seconds=delay)).isoformat(), str(e), row['id']))
+            self.retried += 1
+            return
+        self._finish(row['id'], 'sent', provider_id=provider_id)
+        self.delivered += 1
+        if self.observe and row['created_at']:
+            try:
+                queued = datetime.now() - datetime.fromisoformat(row['created_at'])
+            except ValueError:
+                return
+            self.observe(max(0.0, queued.total_seconds()))
+
+    def _finish(self, message_id, status, provider_id=None, error=None):
+        with self.connection() as conn:
+            conn.execute('''
+                UPDATE sms_outbox SET status = ?, provider_id = ?, last_error = ?, sent_at = ?
+                WHERE id = ?
+            ''', (status, provider_id, error,
+                  datetime.now().isoformat() if status == 'sent' else None, message_id))
+
+    def stats(self):
+        """Delivery counters and outbox backlog"""
+        with self.connection() as conn:
+            backlog = conn.execute(
+                "SELECT COUNT(*) FROM sms_outbox WHERE status IN ('pending', 'sending')"
+            ).fetchone()[0]
+        return {
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'retried': self.retried,
+            'backlog': backlog,
+        }
@@ -0,0 +1,434 @@
+"""
+DigiSken LMS - Auth storage
+Repository layer for users, OTP codes and sessions, so the auth API does
+not depend on where they are kept. This module holds the contract and
+the SQLite implementation; pg_stores.py holds the PostgreSQL one.
+"""
+
+import hashlib
+import heapq
+import hmac
+import itertools
+import secrets
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+
+class DuplicateUser(Exception):
+    """Raised by UserStore.create when the phone number is already registered"""
+
+
+def to_timestamp(value):
+    """Epoch seconds for a stored expiry (ISO text in SQLite, datetime in PostgreSQL)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+def otp_digest(key, phone_number, otp_code):
+    """HMAC-SHA256 of a code, bound to its phone number. Only digests are
+    stored, so a leaked table does not reveal live codes."""
+    return hmac.new(key, f'{phone_number}:{otp_code}'.encode(), hashlib.sha256).digest()
+
+
+# ============ Contract ============
+
+class UserStore(ABC):
+    """Registered users and their login history"""
+
+    @abstractmethod
+    def exists(self, phone_number):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, phone_number):
+        """{'id', 'password_hash', 'two_fa_enabled'} or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def create(self, phone_number, password_hash, two_fa_enabled=True):
+        """Insert a user; raises DuplicateUser if the phone number is taken"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def replace_password_hash(self, phone_number, new_hash, old_hash):
+        """Swap the hash only if it is still ``old_hash``; returns True if it was"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def existing(self, phone_numbers):
+        """Subset of ``phone_numbers`` already registered"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def create_many(self, rows):
+        """Insert (phone_number, password_hash, two_fa_enabled) rows, skipping
+        registered phone numbers; returns the number inserted"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_all(self, fields, arraysize=1000):
+        """Yield every user as a dict of ``fields``, ordered by id, without
+        loading the table into memory"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def record_logins(self, last_login, events):
+        """Apply {phone_number: 'YYYY-MM-DD HH:MM:SS'} last_login updates and
+        insert (phone_number, ip, user_agent, method, created_ts) login events"""
+        raise NotImplementedError
+
+
+class OtpStore(ABC):
+    """One-time codes sent by SMS, kept as ``otp_digest`` values and
+    compared with ``hmac.compare_digest``"""
+
+    @abstractmethod
+    def issue(self, phone_number, otp_code, expires_at, now, replace=False):
+        """Store a new code. Expired codes of the phone number are dropped,
+        or all of them with ``replace``"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def consume(self, phone_number, otp_code, now):
+        """Delete the phone number's codes if its latest unexpired code is
+        ``otp_code``; returns True if it was. Atomic: of concurrent calls
+        with the same code, only one succeeds."""
+        raise NotImplementedError
+
+
+class SessionStore(ABC):
+    """Opaque session tokens, plus revoked signed-token ids"""
+
+    @abstractmethod
+    def create(self, phone_number, session_token, expires_at, ip_address=None, user_agent=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, session_token):
+        """(phone_number, expires_ts) or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_many(self, session_tokens):
+        """{session_token: (phone_number, expires_ts)} of the tokens that exist"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, session_token):
+        raise NotImplementedError
+
+    @abstractmethod
+    def revoke(self, jti, expires_ts):
+        raise NotImplementedError
+
+    @abstractmethod
+    def revocations_since(self, last_id):
+        """(id, jti, expires_ts) of revocations with an id above ``last_id``, by id"""
+        raise NotImplementedError
+
+
+class Stores:
+    """The three stores of one backend and its transaction scope.
+
+    ``transaction(immediate=False)`` returns a context manager; store
+    calls made inside it on the same thread join one transaction.
+    ``sweep`` purges expired rows the SQLite maintenance sweep cannot
+    reach (only non-SQLite backends have any).
+    """
+
+    backend = None
+
+    def __init__(self, users, otps, sessions, transaction):
+        self.users = users
+        self.otps = otps
+        self.sessions = sessions
+        self.transaction = transaction
+
+    def init_db(self):
+        """Create or migrate the schema"""
+
+    def sweep(self, now, batch_size):
+        return {}
+
+    def close(self):
+        """Release pooled connections"""
+
+
+# ============ SQLite ============
+
+class SqliteUserStore(UserStore):
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def exists(self, phone_number):
+        with self.connection() as conn:
+            return conn.execute('SELECT 1 FROM users WHERE phone_number = ?',
+                                (phone_number,)).fetchone() is not None
+
+    def get(self, phone_number):
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT id, password_hash, two_fa_enabled FROM users WHERE phone_number = ?
+            ''', (phone_number,)).fetchone()
+        return dict(row) if row else None
+
+    def create(self, phone_number, password_hash, two_fa_enabled=True):
+        try:
+            with self.connection() as conn:
+                conn.execute('''
+                    INSERT INTO users (phone_number, password_hash, two_fa_enabled)
+                    VALUES (?, ?, ?)
+                ''', (phone_number, password_hash, int(two_fa_enabled)))
+        except sqlite3.IntegrityError:
+            raise DuplicateUser(phone_number)
+
+    def replace_password_hash(self, phone_number, new_hash, old_hash):
+        with self.connection() as conn:
+            return conn.execute('''
+                UPDATE users SET password_hash = ? WHERE phone_number = ? AND password_hash = ?
+            ''', (new_hash, phone_number, old_hash)).rowcount > 0
+
+    def existing(self, phone_numbers):
+        found = set()
+        phone_numbers = list(phone_numbers)
+        # Chunked to stay under SQLite's bound-variable limit
+        for start in range(0, len(phone_numbers), 500):
+            chunk = phone_numbers[start:start + 500]
+            with self.connection() as conn:
+                found.update(row[0] for row in conn.execute(
+                    f"SELECT phone_number FROM users WHERE phone_number IN ({','.join('?' * len(chunk))})",
+                    chunk))
+        return found
+
+    def create_many(self, rows):
+        with self.connection() as conn:
+            return conn.executemany('''
+                INSERT OR IGNORE INTO users (phone_number, password_hash, two_fa_enabled)
+                VALUES (?, ?, ?)
+            ''', rows).rowcount
+
+    def iter_all(self, fields, arraysize=1000):
+        with self.connection() as conn:
+            cursor = conn.execute(f"SELECT {', '.join(fields)} FROM users ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(arraysize)
+                if not rows:
+                    return
+                for row in rows:
+                    yield dict(zip(fields, row))
+
+    def record_logins(self, last_login, events):
+        with self.connection() as conn:
+            conn.executemany('''
+                UPDATE users SET last_login = ? WHERE phone_number = ?
+            ''', [(stamp, phone) for phone, stamp in last_login.items()])
+            conn.executemany('''
+                INSERT INTO login_events (phone_number, ip_address, user_agent, method, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', events)
+
+
+class SqliteOtpStore(OtpStore):
+
+    def __init__(self, connection, key):
+        self.connection = connection
+        self.key = key
+
+    def issue(self, phone_number, otp_code, expires_at, now, replace=False):
+        digest = otp_digest(self.key, phone_number, otp_code).hex()
+        with self.connection() as conn:
+            if replace:
+                conn.execute('DELETE FROM otp_attempts WHERE phone_number = ?', (phone_number,))
+            else:
+                conn.execute('''
+                    DELETE FROM otp_attempts WHERE phone_number = ? AND expires_at < ?
+                ''', (phone_number, now.isoformat()))
+            conn.execute('''
+                INSERT INTO otp_attempts (phone_number, otp_code, expires_at)
+                VALUES (?, ?, ?)
+            ''', (phone_number, digest, expires_at.isoformat()))
+
+    def consume(self, phone_number, otp_code, now):
+        digest = otp_digest(self.key, phone_number, otp_code).hex()
+        with self.connection() as conn:
+            latest = conn.execute('''
+                SELECT id, otp_code FROM otp_attempts
+                WHERE phone_number = ? AND expires_at > ?
+                ORDER BY id DESC LIMIT 1
+            ''', (phone_number, now.isoformat())).fetchone()
+            if latest is None or not hmac.compare_digest(latest['otp_code'], digest):
+                return False
+            # Writers are serialized: of two callers that both matched, only
+            # the first still finds the row to delete
+            deleted = conn.execute('''
+                DELETE FROM otp_attempts WHERE phone_number = ? AND id <= ? RETURNING id
+            ''', (phone_number, latest['id'])).fetchall()
+        return any(row[0] == latest['id'] for row in deleted)
+
+
+class OtpRecord:
+    """A code held by MemoryOtpStore"""
+
+    __slots__ = ('digest', 'expires_ts', 'seq')
+
+    def __init__(self, digest, expires_ts, seq):
+        self.digest = digest
+        self.expires_ts = expires_ts
+        self.seq = seq
+
+
+class MemoryOtpStore(OtpStore):
+    """OTP codes in process memory (OTP_STORE=memory).
+
+    Issue and verify are dict operations under one lock, with no database
+    round trip. Only a phone number's latest code is kept (codes share one
+    TTL, so it is also the last to expire). A heap ordered by expiry evicts
+    expired codes in O(log n) as new ones are issued, and the earliest-
+    expiring ones once ``max_entries`` is reached, so an SMS-login storm
+    cannot grow the store without bound. Codes are lost on restart and are
+    not shared between processes: use it only when one process serves
+    every auth request.
+    """
+
+    def __init__(self, key, max_entries=100000):
+        self.key = key
+        self.max_entries = max_entries
+        self.evicted = 0
+        self._codes = {}
+        self._expiry = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._codes)
+
+    def issue(self, phone_number, otp_code, expires_at, now, replace=False):
+        # A phone number only ever has one code, so ``replace`` is implied
+        record = OtpRecord(otp_digest(self.key, phone_number, otp_code),
+                           expires_at.timestamp(), next(self._seq))
+        with self._lock:
+            self._codes[phone_number] = record
+            heapq.heappush(self._expiry, (record.expires_ts, record.seq, phone_number))
+            self._evict(now.timestamp())
+
+    def consume(self, phone_number, otp_code, now):
+        digest = otp_digest(self.key, phone_number, otp_code)
+        with self._lock:
+            record = self._codes.get(phone_number)
+            if (record is None or record.expires_ts <= now.timestamp()
+                    or not hmac.compare_digest(record.digest, digest)):
+                return False
+            del self._codes[phone_number]
+            return True
+
+    def _evict(self, now_ts):
+        heap, codes = self._expiry, self._codes
+        while heap and (heap[0][0] <= now_ts or len(codes) > self.max_entries):
+            expires_ts, seq, phone_number = heapq.heappop(heap)
+            record = codes.get(phone_number)
+            # Entries of replaced or consumed codes are skipped lazily
+            if record is not None and record.seq == seq:
+                del codes[phone_number]
+                if expires_ts > now_ts:
+                    self.evicted += 1
+        if len(heap) > 2 * len(codes) + 64:
+            self._expiry = [(record.expires_ts, record.seq, phone_number)
+                            for phone_number, record in codes.items()]
+            heapq.heapify(self._expiry)
+
+
+class SqliteSessionStore(SessionStore):
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create(self, phone_number, session_token, expires_at, ip_address=None, user_agent=None):
+        with self.connection() as conn:
+            conn.execute('''
+                INSERT INTO sessions (phone_number, session_token, expires_at, ip_address, user_agent)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (phone_number, session_token, expires_at.isoformat(), ip_address, user_agent))
+
+    def get(self, session_token):
+        with self.connection() as conn:
+            row = conn.execute('''
+                SELECT phone_number, expires_at FROM sessions WHERE session_token = ?
+            ''', (session_token,)).fetchone()
+        return (row['phone_number'], to_timestamp(row['expires_at'])) if row else None
+
+    def get_many(self, session_tokens):
+        found = {}
+        session_tokens = list(session_tokens)
+        # Chunked to stay under SQLite's bound-variable limit
+        with self.connection() as conn:
+            for start in range(0, len(session_tokens), 500):
+                chunk = session_tokens[start:start + 500]
+                for row in conn.execute(
+                        'SELECT session_token, phone_number, expires_at FROM sessions '
+                        f"WHERE session_token IN ({','.join('?' * len(chunk))})", chunk):
+                    found[row['session_token']] = (row['phone_number'], to_timestamp(row['expires_at']))
+        return found
+
+    def delete(self, session_token):
+        with self.connection() as conn:
+            conn.execute('DELETE FROM sessions WHERE session_token = ?', (session_token,))
+
+    def revoke(self, jti, expires_ts):
+        with self.connection() as conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO revoked_sessions (jti, expires_at) VALUES (?, ?)
+            ''', (jti, expires_ts))
+
+    def revocations_since(self, last_id):
+        with self.connection() as conn:
+            return [tuple(row) for row in conn.execute('''
+                SELECT id, jti, expires_at FROM revoked_sessions WHERE id > ? ORDER BY id
+            ''', (last_id,))]
+
+
+class SqliteStores(Stores):
+    """Stores on the auth SQLite pool (schema managed by migrations.py).
+
+    Without ``otp_key`` a random one is used, which is enough for tools
+    that never verify codes issued by another process.
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, pool, otp_key=None):
+        otp_key = otp_key or secrets.token_bytes(32)
+        super().__init__(SqliteUserStore(pool.connection), SqliteOtpStore(pool.connection, otp_key),
+                         SqliteSessionStore(pool.connection), pool.connection)
+        self.pool = pool
+
+    def init_db(self):
+        from app.migrations import migrate
+        with self.pool.connection() as conn:
+            migrate(conn)
+
+
+def build_stores(config, db_pool, otp_key):
+    """Stores selected by STORE_BACKEND ('sqlite' shares ``db_pool``), with
+    OTP codes in memory when OTP_STORE=memory"""
+    backend = config['STORE_BACKEND']
+    if backend == 'sqlite':
+        stores = SqliteStores(db_pool, otp_key)
+    elif backend == 'postgres':
+        from app.pg_stores import PostgresStores
+        stores = PostgresStores(
+            config['POSTGRES_DSN'],
+            min_size=config['POSTGRES_POOL_MIN'],
+            max_size=config['POSTGRES_POOL_MAX'],
+            otp_key=otp_key,
+        )
+    else:
+        raise ValueError(f"Unknown STORE_BACKEND {backend!r}; expected 'sqlite' or 'postgres'")
+    if config['OTP_STORE'] == 'memory':
+        stores.otps = MemoryOtpStore(otp_key, max_entries=config['OTP_MEMORY_MAX_ENTRIES'])
+    elif config['OTP_STORE'] != 'database':
+        raise ValueError(f"Unknown OTP_STORE {config['OTP_STORE']!r}; expected 'database' or 'memory'")
+    return stores
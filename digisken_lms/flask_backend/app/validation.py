@@ -0,0 +1,25 @@
+"""
+DigiSken LMS - Input validation
+Phone number and password rules shared by the API and the admin tools
+"""
+
+
+def validate_phone_number(phone_number):
+    """Validate phone number format (basic validation)"""
+    # Remove common formatting characters
+    cleaned = ''.join(c for c in phone_number if c.isdigit())
+    # Check if it's 10-15 digits (international standard)
+    return len(cleaned) >= 10 and len(cleaned) <= 15
+
+
+def validate_password(password):
+    """Validate password strength"""
+    if len(password) < 8:
+        return False, "Password must be at least 8 characters"
+    if not any(c.isupper() for c in password):
+        return False, "Password must contain uppercase letter"
+    if not any(c.isdigit() for c in password):
+        return False, "Password must contain number"
+    if not any(c in "!@#$%^&*()_+-=[]{}|;:,.<>?" for c in password):
+        return False, "Password must contain special character"
+    return True, "Password valid"
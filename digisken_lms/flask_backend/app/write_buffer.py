@@ -0,0 +1,122 @@
+"""
+DigiSken LMS - Write-coalescing buffer
+Collects non-critical writes (last_login, login audit events) off the
+request path and flushes them in one transaction
+"""
+
+import atexit
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class WriteBuffer:
+    """Buffers login bookkeeping and flushes it in batches.
+
+    ``record_login`` only appends to memory. A daemon thread flushes every
+    ``flush_interval`` seconds, or sooner once ``max_events`` are queued,
+    through ``write(last_login, events)`` (``UserStore.record_logins``),
+    which applies the batch in a single transaction.
+    Repeated logins of one user between flushes collapse into a single
+    ``last_login`` update. ``close`` (also registered with atexit) drains
+    whatever is left on shutdown.
+    """
+
+    def __init__(self, write, flush_interval=0.25, max_events=500, log=print):
+        self.write = write
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        self.log = log
+        self.flushed = 0
+        self.dropped = 0
+        self._last_login = {}
+        self._events = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._atexit = False
+
+    def record_login(self, phone_number, ip_address=None, user_agent=None, method='password', now=None):
+        """Queue a last_login update and a login_events row"""
+        now = time.time() if now is None else now
+        # Same format as CURRENT_TIMESTAMP, which last_login used before
+        stamp = datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            self._last_login[phone_number] = stamp
+            self._events.append((phone_number, ip_address, user_agent, method, now))
+            full = len(self._events) >= self.max_events
+        self.start()
+        if full:
+            self._wakeup.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._events)
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of events written"""
+        with self._flush_lock:
+            with self._lock:
+                last_login, self._last_login = self._last_login, {}
+                events, self._events = self._events, []
+            if not events and not last_login:
+                return 0
+            try:
+                self.write(last_login, events)
+            except Exception:
+                self._requeue(last_login, events)
+                raise
+            self.flushed += len(events)
+            return len(events)
+
+    def _requeue(self, last_login, events):
+        """Put a failed batch back, keeping newer values and a bounded backlog"""
+        with self._lock:
+            for phone, stamp in last_login.items():
+                self._last_login.setdefault(phone, stamp)
+            events = events + self._events
+            limit = self.max_events * 10
+            if len(events) > limit:
+                self.dropped += len(events) - limit
+                events = events[-limit:]
+            self._events = events
+
+    def start(self):
+        """Start the flusher thread once per process"""
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='write-buffer', daemon=True)
+            self._thread.start()
+            if not self._atexit:
+                atexit.register(self.close)
+                self._atexit = True
+
+    def close(self, timeout=5.0):
+        """Stop the flusher and write out anything still buffered"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            self.log(f"Write buffer final flush failed: {e}")
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.log(f"Write buffer flush failed: {e}")
@@ -0,0 +1,17 @@
+"""
+ASGI entry point for the async auth API (/api/* auth endpoints only).
+
+    uvicorn asgi:app --workers 4 --port 5000
+
+uvicorn --workers starts every worker from scratch (imports, migrations
+check, bcrypt calibration). Under gunicorn the app is preloaded once and
+workers are forked from it (see gunicorn.conf.py):
+
+    WEB_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi:app
+"""
+
+import os
+
+from app.async_auth import create_asgi_app
+
+app = create_asgi_app(os.environ.get('FLASK_CONFIG', 'production'))
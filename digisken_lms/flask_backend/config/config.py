@@ -3,18 +3,146 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# digisken_lms/ - where backend.py has always kept digisken_lms.db
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() == 'true'
+
 class Config:
     DEBUG = False
     TESTING = False
-    
+
+    # ============ Databases ============
+    AUTH_DATABASE = os.environ.get('AUTH_DATABASE', os.path.join(BASE_DIR, 'digisken_lms.db'))
+    # None = <instance folder>/lms_catalog.db
+    LMS_DATABASE = os.environ.get('LMS_DATABASE')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+    DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', '5000'))
+    DB_STATEMENT_CACHE = int(os.environ.get('DB_STATEMENT_CACHE', '128'))
+    # Where users/OTP codes/sessions live: 'sqlite' (AUTH_DATABASE) or
+    # 'postgres' (POSTGRES_DSN, shared by every app node)
+    STORE_BACKEND = os.environ.get('STORE_BACKEND', 'sqlite').lower()
+    POSTGRES_DSN = os.environ.get('POSTGRES_DSN', 'postgresql://digisken@localhost/digisken_lms')
+    POSTGRES_POOL_MIN = int(os.environ.get('POSTGRES_POOL_MIN', '1'))
+    POSTGRES_POOL_MAX = int(os.environ.get('POSTGRES_POOL_MAX', '10'))
+
+    # ============ Web server (gunicorn.conf.py) ============
+    WEB_WORKERS = int(os.environ.get('WEB_WORKERS', '0')) or (os.cpu_count() or 1) * 2 + 1
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', '4'))
+    WEB_BIND = os.environ.get('WEB_BIND', '0.0.0.0:5000')
+    # 'gthread' for wsgi:app; 'uvicorn.workers.UvicornWorker' for asgi:app
+    WEB_WORKER_CLASS = os.environ.get('WEB_WORKER_CLASS', 'gthread')
+
+    # ============ Password hashing ============
+    # BCRYPT_ROUNDS pins the cost; otherwise it is calibrated to BCRYPT_TARGET_MS
+    # Hashing processes per web worker; by default the web workers share the
+    # host's CPUs instead of each starting one process per CPU
+    BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', '0')) or max(1, (os.cpu_count() or 1) // WEB_WORKERS)
+    BCRYPT_MAX_PENDING = int(os.environ.get('BCRYPT_MAX_PENDING', '0')) or None
+    BCRYPT_TARGET_MS = int(os.environ.get('BCRYPT_TARGET_MS', '250'))
+    BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '0')) or None
+    BCRYPT_MIN_ROUNDS = int(os.environ.get('BCRYPT_MIN_ROUNDS', '10'))
+
+    # ============ Sessions ============
+    SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', '10000'))
+    SESSION_CACHE_TTL = float(os.environ.get('SESSION_CACHE_TTL', '60'))
+    SESSION_CACHE_NEGATIVE_TTL = float(os.environ.get('SESSION_CACHE_NEGATIVE_TTL', '5'))
+    # Most tokens accepted by one /api/verify-sessions call
+    SESSION_BATCH_MAX_TOKENS = int(os.environ.get('SESSION_BATCH_MAX_TOKENS', '256'))
+    # 'opaque' (random token looked up in the sessions table) or 'signed'
+    # (HMAC-signed token validated without I/O)
+    SESSION_TOKEN_MODE = os.environ.get('SESSION_TOKEN_MODE', 'opaque').lower()
+    # kid:secret[,kid:secret...]; the first key signs, the rest only verify
+    SESSION_SIGNING_KEYS = os.environ.get('SESSION_SIGNING_KEYS', '')
+    # Seconds between reloads of revoked signed tokens from the database
+    SESSION_REVOCATION_REFRESH = float(os.environ.get('SESSION_REVOCATION_REFRESH', '5'))
+
+    # ============ OTP codes ============
+    # 'database' (the STORE_BACKEND's otp_attempts table) or 'memory'
+    # (per process: only when a single process serves every auth request)
+    OTP_STORE = os.environ.get('OTP_STORE', 'database').lower()
+    OTP_MEMORY_MAX_ENTRIES = int(os.environ.get('OTP_MEMORY_MAX_ENTRIES', '100000'))
+    # Codes are stored as HMAC digests under this key; every worker and node
+    # must share it. Unset: a key generated once in OTP_KEY_FILE
+    # (default: .otp_hmac_key next to AUTH_DATABASE)
+    OTP_HMAC_KEY = os.environ.get('OTP_HMAC_KEY', '')
+    OTP_KEY_FILE = os.environ.get('OTP_KEY_FILE')
+
+    # ============ Write buffer ============
+    # last_login/login audit writes are batched: flushed every N ms or N events
+    WRITE_BUFFER_INTERVAL_MS = float(os.environ.get('WRITE_BUFFER_INTERVAL_MS', '250'))
+    WRITE_BUFFER_MAX_EVENTS = int(os.environ.get('WRITE_BUFFER_MAX_EVENTS', '500'))
+
+    # ============ Maintenance ============
+    # Seconds between expiry sweeps of sessions/otp_attempts (0 disables)
+    MAINTENANCE_INTERVAL = float(os.environ.get('MAINTENANCE_INTERVAL', '300'))
+    MAINTENANCE_BATCH_SIZE = int(os.environ.get('MAINTENANCE_BATCH_SIZE', '500'))
+
+    # ============ Rate limiting ============
+    # 'memory' (per process) or 'sqlite' (shared by every worker on the host)
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory').lower()
+    RATE_LIMIT_ENABLED = env_bool('RATE_LIMIT_ENABLED', True)
+
+    # ============ Metrics ============
+    # Prometheus text format at /metrics (per worker process)
+    METRICS_ENABLED = env_bool('METRICS_ENABLED', True)
+    # Log requests slower than this with their top SQL statements (0 disables)
+    SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '500'))
+
+    # ============ Lesson media ============
+    # Lesson files (lesson_media.path is relative to it); None = <instance folder>/media
+    MEDIA_ROOT = os.environ.get('MEDIA_ROOT')
+    # Browser/CDN cache lifetime of media files (revalidated by ETag afterwards)
+    MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE', '3600'))
+
+    # ============ Learner progress ============
+    # Events are queued per worker and written in one transaction every
+    # PROGRESS_FLUSH_INTERVAL_MS or PROGRESS_FLUSH_MAX_EVENTS events
+    PROGRESS_FLUSH_INTERVAL_MS = float(os.environ.get('PROGRESS_FLUSH_INTERVAL_MS', '1000'))
+    PROGRESS_FLUSH_MAX_EVENTS = int(os.environ.get('PROGRESS_FLUSH_MAX_EVENTS', '5000'))
+    # Queued events above which POST /api/lms/progress answers 503
+    PROGRESS_MAX_PENDING = int(os.environ.get('PROGRESS_MAX_PENDING', '100000'))
+    # Most events accepted by one request
+    PROGRESS_BATCH_MAX_EVENTS = int(os.environ.get('PROGRESS_BATCH_MAX_EVENTS', '100'))
+    # How long event ids are remembered to drop replayed duplicates
+    PROGRESS_KEY_RETENTION_DAYS = float(os.environ.get('PROGRESS_KEY_RETENTION_DAYS', '30'))
+
+    # ============ Responses ============
+    # gzip (or brotli, if installed) for JSON/text responses of at least
+    # COMPRESS_MIN_BYTES, negotiated with Accept-Encoding
+    COMPRESSION_ENABLED = env_bool('COMPRESSION_ENABLED', True)
+    COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '512'))
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', '6'))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', '5'))
+    # Serialized (and compressed) catalog responses kept per worker, keyed by ETag
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '512'))
+
+    # ============ SMS ============
+    TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID', 'your_account_sid')
+    TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN', 'your_auth_token')
+    TWILIO_PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER', '+1234567890')
+    # Print OTPs to the console instead of sending SMS
+    DEBUG_MODE = env_bool('DEBUG_MODE', True)
+    # Provider override for load testing: 'console', 'fake' or 'twilio'
+    SMS_PROVIDER = os.environ.get('SMS_PROVIDER', '').lower()
+    SMS_SENDERS = int(os.environ.get('SMS_SENDERS', '2'))
+    SMS_MAX_ATTEMPTS = int(os.environ.get('SMS_MAX_ATTEMPTS', '5'))
+
 class DevelopmentConfig(Config):
     DEBUG = True
-    
+
 class ProductionConfig(Config):
     DEBUG = False
-    
+    DEBUG_MODE = env_bool('DEBUG_MODE', False)
+    # Several gunicorn workers must share one set of limits
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'sqlite').lower()
+
 class TestingConfig(Config):
     TESTING = True
+    BCRYPT_ROUNDS = 4
+    MAINTENANCE_INTERVAL = 0
+    SMS_PROVIDER = 'fake'
 
 config = {
     'development': DevelopmentConfig,
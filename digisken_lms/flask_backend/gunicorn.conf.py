@@ -0,0 +1,44 @@
+"""
+Gunicorn settings for the unified DigiSken LMS app.
+
+The app is preloaded in the master so imports, schema migrations and
+bcrypt calibration run once before workers fork; DB pools, hashing
+processes and background threads are created lazily inside each worker,
+so a worker added under load only has to fork.
+
+The async auth API uses the same settings with uvicorn workers:
+
+    WEB_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi:app
+"""
+
+import os
+
+# Imported under another name: gunicorn reads every module-level name that
+# matches a setting, and ``config`` is one (the config file path)
+from config.config import config as app_configs
+
+settings = app_configs[os.environ.get('FLASK_CONFIG', 'production')]
+
+bind = settings.WEB_BIND
+workers = settings.WEB_WORKERS
+threads = settings.WEB_THREADS
+worker_class = settings.WEB_WORKER_CLASS
+preload_app = True
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then to bound memory growth
+max_requests = 10000
+max_requests_jitter = 1000
+accesslog = '-'
+
+
+def worker_exit(server, worker):
+    """Flush buffered last_login/audit and progress writes before the worker goes away"""
+    extensions = getattr(worker.wsgi, 'extensions', {})
+    progress = extensions.get('progress')
+    if progress is not None:
+        progress.close()
+    services = extensions.get('auth')
+    if services is not None:
+        services.shutdown()
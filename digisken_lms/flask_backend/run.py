@@ -1,5 +1,7 @@
+import os
+
 from app import create_app
 
 if __name__ == '__main__':
-    app = create_app()
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app = create_app(os.environ.get('FLASK_CONFIG', 'development'))
+    app.run(debug=app.config['DEBUG'], host='0.0.0.0', port=5000)
@@ -0,0 +1,12 @@
+"""
+WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app          (Linux/macOS)
+    waitress-serve --threads=8 --port=5000 wsgi:app (Windows)
+"""
+
+import os
+
+from app import create_app
+
+app = create_app(os.environ.get('FLASK_CONFIG', 'production'))
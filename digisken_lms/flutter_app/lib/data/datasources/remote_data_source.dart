@@ -1,4 +1,5 @@
 import '../../core/services/http_client_service.dart';
+import '../models/catalog_changes.dart';
 import '../models/course.dart';
 import '../models/lesson.dart';
 
@@ -45,4 +46,13 @@ class RemoteDataSource {
       rethrow;
     }
   }
+
+  Future<CatalogChanges> syncCatalog(int since) async {
+    try {
+      final response = await httpClient.get('/api/lms/sync?since=$since');
+      return CatalogChanges.fromJson(response.data);
+    } catch (e) {
+      rethrow;
+    }
+  }
 }
@@ -0,0 +1,48 @@
+import 'course.dart';
+import 'lesson.dart';
+
+/// One page of `/api/lms/sync`: records changed after a cursor and the
+/// ids deleted since.
+class CatalogChanges {
+  final int cursor;
+  final bool more;
+  final bool reset;
+  final List<Course> courses;
+  final Map<int, Lesson> lessons;
+  final Map<int, int> lessonCourseIds;
+  final List<int> deletedCourses;
+  final List<int> deletedLessons;
+
+  CatalogChanges({
+    required this.cursor,
+    required this.more,
+    required this.reset,
+    required this.courses,
+    required this.lessons,
+    required this.lessonCourseIds,
+    required this.deletedCourses,
+    required this.deletedLessons,
+  });
+
+  factory CatalogChanges.fromJson(Map<String, dynamic> json) {
+    final List<dynamic> lessons = json['lessons'] ?? [];
+    final Map<String, dynamic> deleted = json['deleted'] ?? {};
+    return CatalogChanges(
+      cursor: json['cursor'],
+      more: json['more'] ?? false,
+      reset: json['reset'] ?? false,
+      courses: (json['courses'] as List<dynamic>? ?? [])
+          .map((course) => Course.fromJson(course))
+          .toList(),
+      lessons: {
+        for (final lesson in lessons) lesson['id'] as int: Lesson.fromJson(lesson)
+      },
+      lessonCourseIds: {
+        for (final lesson in lessons)
+          lesson['id'] as int: lesson['courseId'] as int
+      },
+      deletedCourses: List<int>.from(deleted['courses'] ?? []),
+      deletedLessons: List<int>.from(deleted['lessons'] ?? []),
+    );
+  }
+}
@@ -1,5 +1,6 @@
 class Lesson {
   final int id;
+  final int position; // order within the course
   final String title;
   final String content;
   final String? videoUrl;
@@ -9,6 +10,7 @@ class Lesson {
 
   Lesson({
     required this.id,
+    this.position = 0,
     required this.title,
     required this.content,
     this.videoUrl,
@@ -20,6 +22,7 @@ class Lesson {
   factory Lesson.fromJson(Map<String, dynamic> json) {
     return Lesson(
       id: json['id'],
+      position: json['position'] ?? 0,
       title: json['title'],
       content: json['content'],
       videoUrl: json['videoUrl'],
@@ -32,6 +35,7 @@ class Lesson {
   Map<String, dynamic> toJson() {
     return {
       'id': id,
+      'position': position,
       'title': title,
       'content': content,
       'videoUrl': videoUrl,
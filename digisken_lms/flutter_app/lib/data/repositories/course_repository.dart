@@ -1,16 +1,65 @@
 import '../datasources/remote_data_source.dart';
 import '../models/course.dart';
+import '../models/lesson.dart';
 
+/// Keeps a local copy of the catalog and refreshes it from the server's
+/// change feed, so a refresh downloads only what changed since the last
+/// sync instead of every course and lesson.
 class CourseRepository {
   final RemoteDataSource remoteDataSource;
 
+  final Map<int, Course> _courses = {};
+  final Map<int, Lesson> _lessons = {};
+  final Map<int, int> _lessonCourseIds = {};
+  int _cursor = 0;
+
   CourseRepository({required this.remoteDataSource});
 
+  /// Apply every change since the last sync
+  Future<void> sync() async {
+    while (true) {
+      final changes = await remoteDataSource.syncCatalog(_cursor);
+      if (changes.reset) {
+        _courses.clear();
+        _lessons.clear();
+        _lessonCourseIds.clear();
+      }
+      for (final course in changes.courses) {
+        _courses[course.id] = course;
+      }
+      _lessons.addAll(changes.lessons);
+      _lessonCourseIds.addAll(changes.lessonCourseIds);
+      for (final id in changes.deletedCourses) {
+        _courses.remove(id);
+      }
+      for (final id in changes.deletedLessons) {
+        _lessons.remove(id);
+        _lessonCourseIds.remove(id);
+      }
+      _cursor = changes.cursor;
+      if (!changes.more) {
+        return;
+      }
+    }
+  }
+
   Future<List<Course>> getCourses() async {
-    return await remoteDataSource.getCourses();
+    await sync();
+    return _courses.values.toList()..sort((a, b) => a.id.compareTo(b.id));
   }
 
   Future<Course> getCourseDetail(int courseId) async {
-    return await remoteDataSource.getCourseDetail(courseId);
+    await sync();
+    return _courses[courseId] ?? await remoteDataSource.getCourseDetail(courseId);
+  }
+
+  Future<List<Lesson>> getCourseLessons(int courseId) async {
+    await sync();
+    return [
+      for (final entry in _lessons.entries)
+        if (_lessonCourseIds[entry.key] == courseId) entry.value
+    ]..sort((a, b) => a.position != b.position
+        ? a.position.compareTo(b.position)
+        : a.id.compareTo(b.id));
   }
 }
@@ -1,26 +1,55 @@
 // Service Worker for DigiSken LMS
 // Enables offline functionality and app-like behavior
 
-const CACHE_NAME = 'digisken-lms-v1';
-const urlsToCache = [
-  '/',
-  '/index.html',
-  '/css/styles.css',
-  '/css/responsive.css',
-  '/js/app.js',
-  '/js/pwa.js',
-  '/manifest.json'
-];
+// Content-hashed precache list, written by build_asset_manifest.py
+// <asset-manifest>
+const ASSET_MANIFEST = {
+  "version": "6347303d7776",
+  "assets": {
+    "/index.html": "db1fb14edd2cb998",
+    "/login.html": "031800b453a59890",
+    "/digikesen.html": "db1fb14edd2cb998",
+    "/manifest.json": "872b82cad935a629"
+  }
+};
+// </asset-manifest>
+
+// One cache per asset version; files whose hash did not change are copied
+// from the previous version's cache instead of being downloaded again
+const CACHE_PREFIX = 'digisken-lms-';
+const CACHE_NAME = CACHE_PREFIX + ASSET_MANIFEST.version;
+const RUNTIME_CACHE = CACHE_PREFIX + 'runtime';
+
+// Cache key of a precached file: its path plus content hash
+function assetKey(path) {
+  return path + '?v=' + ASSET_MANIFEST.assets[path];
+}
+
+function assetPath(url) {
+  const path = url.pathname === '/' ? '/index.html' : url.pathname;
+  return url.origin === self.location.origin && ASSET_MANIFEST.assets[path] ? path : null;
+}
 
-// Install event - cache assets
+// Install event - cache changed assets, reuse unchanged ones
 self.addEventListener('install', event => {
   event.waitUntil(
     caches.open(CACHE_NAME).then(cache => {
-      return cache.addAll(urlsToCache).catch(err => {
-        console.log('Cache addAll error:', err);
-        // Continue even if some files fail to cache
-        return Promise.resolve();
-      });
+      return Promise.all(Object.keys(ASSET_MANIFEST.assets).map(path => {
+        const key = assetKey(path);
+        return caches.match(key).then(cached => {
+          if (cached) {
+            return cache.put(key, cached);
+          }
+          return fetch(path, { cache: 'no-cache' }).then(response => {
+            if (response.ok) {
+              return cache.put(key, response);
+            }
+          });
+        }).catch(err => {
+          console.log('Cache error:', path, err);
+          // Continue even if some files fail to cache
+        });
+      }));
     }).catch(err => {
       console.log('Cache.open error:', err);
     })
@@ -34,7 +63,7 @@ self.addEventListener('activate', event => {
     caches.keys().then(cacheNames => {
       return Promise.all(
         cacheNames.map(cacheName => {
-          if (cacheName !== CACHE_NAME) {
+          if (cacheName !== CACHE_NAME && cacheName !== RUNTIME_CACHE) {
             return caches.delete(cacheName);
           }
         })
@@ -51,6 +80,21 @@ self.addEventListener('fetch', event => {
     return;
   }
 
+  const url = new URL(event.request.url);
+  // API responses are revalidated by the browser cache (ETags) and
+  // /api/lms/sync; never serve them from here
+  if (url.pathname.startsWith('/api/')) {
+    return;
+  }
+
+  const path = assetPath(url);
+  if (path) {
+    event.respondWith(
+      caches.match(assetKey(path)).then(response => response || fetch(event.request))
+    );
+    return;
+  }
+
   event.respondWith(
     caches.match(event.request).then(response => {
       // Return cached response if available
@@ -69,7 +113,7 @@ self.addEventListener('fetch', event => {
         const responseToCache = response.clone();
 
         // Cache successful responses
-        caches.open(CACHE_NAME).then(cache => {
+        caches.open(RUNTIME_CACHE).then(cache => {
           cache.put(event.request, responseToCache);
         });
 
@@ -0,0 +1,29 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask_backend'))
+
+from app.db import ConnectionPool
+from app.maintenance import DEFAULT_BATCH_SIZE, DEFAULT_VACUUM_PAGES, format_report, run_sweep
+
+parser = argparse.ArgumentParser(description='Delete expired sessions and OTPs')
+parser.add_argument('--db', default='digisken_lms.db')
+parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+parser.add_argument('--vacuum-pages', type=int, default=DEFAULT_VACUUM_PAGES)
+parser.add_argument('--full-vacuum', action='store_true',
+                    help='switch to incremental auto-vacuum and rebuild the file (one-off)')
+args = parser.parse_args()
+
+pool = ConnectionPool(args.db, size=1)
+
+report = run_sweep(pool.connection, args.batch_size, args.vacuum_pages)
+print(f'✓ {format_report(report)}')
+
+if args.full_vacuum:
+    with pool.connection() as conn:
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+    print('✓ Database rebuilt with incremental auto-vacuum enabled')
+
+pool.close()